@@ -1,13 +1,39 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, has_request_context, jsonify, request
 from flask_cors import CORS
 import mysql.connector
 from datetime import datetime, timedelta 
-import bcrypt  
 import jwt     
 import traceback  
+import base64
+import csv
+import io
+import time
+from contextlib import contextmanager
 from functools import wraps  
+from catalog_cache import CatalogCache
+from compression import choose_encoding, compress_response
+from customer_stats import CustomerLeaderboard, apply_customer_stats
+from dashboard_stats import DashboardStats, StatsUnavailable
+from db_pool import ConnectionPool, PoolError
+from db_router import DatabaseRouter
+from event_hub import EventHub, HubFull
+from json_stream import iter_json_array
+from metrics import Metrics, pool_collector, router_collector
+from migrations import SchemaOutdated, check_schema, migrate
+from password_hasher import HasherBusy, PasswordHasher
+from rollups import (apply_rollups, payment_method_totals, product_series, revenue_series,
+                     top_products)
+from serializers import (CUSTOMER, PRODUCT, SALE, SALE_ITEM, SALE_ITEM_LISTING, SALE_LISTING,
+                         FastJSONProvider, dumps_bytes, format_date)
+from search_index import SearchService, SearchUnavailable
+from slow_query_log import SlowQueryLog
+from stock_ledger import (StockCompactor, adjust_stock_levels, append_movements, current_stock,
+                          list_movements, record_movements, set_stock_levels)
+from stock_velocity import StockVelocity, VelocityUnavailable
+from token_cache import TokenCache, TokenRevoked
 app = Flask(__name__)
-CORS(app)
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=['X-Write-Marker'])
 
 # Secret key untuk JWT - ganti dengan random string di production
 app.config['SECRET_KEY'] = 'bakery-system-secret-key-2024'
@@ -22,30 +48,202 @@ def get_db_config():
         'port': 3306
     }
 
-def get_db_connection():
+# Pengaturan connection pool (lihat db_pool.ConnectionPool)
+def get_pool_config():
+    return {
+        'size': 5,             # Koneksi idle yang dipertahankan
+        'max_overflow': 10,    # Koneksi tambahan saat jam ramai
+        'timeout': 10,         # Detik menunggu koneksi kosong
+        'ping_interval': 5,    # Ping koneksi yang idle lebih dari N detik
+        'leak_timeout': 60     # Laporkan koneksi yang dipinjam lebih dari N detik
+    }
+
+# Read replica (opsional). Tiap entry menimpa get_db_config(), contoh untuk
+# replica lokal kedua: [{'host': 'localhost', 'port': 3307}]
+def get_replica_configs():
+    return []
+
+# Routing baca ke replica (lihat db_router.DatabaseRouter)
+def get_router_config():
+    return {
+        'read_your_writes': 5,   # Detik bacaan klien ke primary setelah ia menulis
+        'max_lag': 10,           # Replica yang tertinggal lebih dari N detik tidak dipakai
+        'check_interval': 5,     # Detik antar health check replica
+        'checkout_timeout': 1    # Detik menunggu koneksi replica sebelum pindah ke primary
+    }
+
+db_pool = ConnectionPool(get_db_config(), **get_pool_config())
+db_router = DatabaseRouter(
+    db_pool,
+    [(f"replica{index + 1}", ConnectionPool(dict(get_db_config(), **config), **get_pool_config()))
+     for index, config in enumerate(get_replica_configs())],
+    secret=app.config['SECRET_KEY'],
+    **get_router_config()
+)
+
+# Instrumentasi request & query (GET /api/metrics)
+def get_metrics_config():
+    return {
+        'query_threshold': 20   # Request dengan query lebih dari ini ditandai (N+1)
+    }
+
+# Log query lambat (GET /api/admin/slow-queries)
+def get_slow_query_config():
+    return {
+        'threshold': 0.2,           # Detik; statement lebih lama dari ini dicatat
+        'sample_rate': 1.0,         # Fraksi query lambat yang dicatat
+        'explain_interval': 60,     # Bentuk query yang sama di-EXPLAIN maks. sekali per N detik
+        'max_bytes': 5 * 1024 * 1024,
+        'backup_count': 5
+    }
+
+metrics = Metrics(**get_metrics_config())
+metrics.add_collector(pool_collector(db_pool))
+metrics.add_collector(router_collector(db_router))
+
+# Marker read-your-writes dari db_router.note_write(); browser membawanya lewat
+# cookie, klien lain cukup mengirim balik header yang sama
+WRITE_MARKER_COOKIE = 'bakery_write'
+WRITE_MARKER_HEADER = 'X-Write-Marker'
+
+def request_write_marker():
+    """Marker tulis terakhir yang dibawa klien pada request ini (jika ada)"""
+    if not has_request_context():
+        return None
+    return request.cookies.get(WRITE_MARKER_COOKIE) or request.headers.get(WRITE_MARKER_HEADER)
+
+# Route membaca stok lewat view products_current & rollup bershard, jadi schema
+# harus sudah dimigrasi. python app.py menjalankan migrasi sendiri; di bawah
+# WSGI server (gunicorn dll.) jalankan dulu: python migrations.py
+# Dicek sekali per proses pada koneksi pertama; selama belum, semua route 503.
+schema_ready = False
+
+def require_schema(conn):
+    global schema_ready
+    check_schema(conn)
+    schema_ready = True
+
+@contextmanager
+def db_connection(readonly=False, shared=False):
+    """Pinjam koneksi dari pool, selalu dikembalikan saat keluar blok.
+
+    readonly=True: boleh dilayani replica. shared=True untuk hasil yang
+    di-cache untuk semua klien (tetap ke primary sesaat setelah ada tulisan).
+    Menghasilkan None jika database tidak bisa dihubungi; raise
+    SchemaOutdated jika migrasi belum dijalankan.
+    """
     try:
-        conn = mysql.connector.connect(**get_db_config())
-        return conn
-    except Exception as e:
+        if readonly:
+            pool, conn = db_router.acquire_read(request_write_marker(), shared)
+        else:
+            pool, conn = db_pool, db_pool.acquire()
+    except PoolError as e:
         print(f"❌ Database error: {e}")
+        yield None
+        return
+    try:
+        if not schema_ready:
+            require_schema(conn)
+        yield metrics.instrument(conn, db_router.role_of(pool), pool)
+    finally:
+        pool.release(conn)
+
+slow_query_log = SlowQueryLog(db_connection, **get_slow_query_config())
+metrics.slow_log = slow_query_log
+
+@app.before_request
+def start_request_metrics():
+    metrics.begin_request(request.url_rule.rule if request.url_rule else None)
+
+@app.after_request
+def record_request_metrics(response):
+    """Catat latency & jumlah query; dijalankan terakhir (setelah kompresi)"""
+    stats = metrics.end_request(request.method, response.status_code)
+    if stats is not None:
+        response.headers['X-Query-Count'] = str(stats.query_count)
+        response.headers['Server-Timing'] = f'db;dur={stats.db_time * 1000:.1f}'
+    return response
+
+@app.after_request
+def remember_client_writes(response):
+    """Bacaan klien yang baru menulis diarahkan ke primary sementara"""
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400:
+        marker = db_router.note_write()
+        if marker:
+            response.set_cookie(WRITE_MARKER_COOKIE, marker, max_age=int(db_router.read_your_writes) + 1,
+                                httponly=True, samesite='Lax')
+            response.headers[WRITE_MARKER_HEADER] = marker
+    return response
+
+# Push perubahan dashboard/stok ke tablet lewat SSE (/api/events)
+event_hub = EventHub(buffer_size=512, heartbeat=15, max_subscribers=500)
+
+# Statistik dashboard di memori, dicocokkan ulang ke database tiap 60 detik
+dashboard_stats = DashboardStats(db_connection, low_stock_threshold=10, reconcile_interval=60,
+                                 listener=event_hub.publish)
+
+# Agregat pelanggan untuk leaderboard di customer_report
+customer_leaderboard = CustomerLeaderboard(db_connection, max_window_days=365, reconcile_interval=300)
+
+# Velocity penjualan per produk untuk saran reorder (butuh numpy)
+stock_velocity = StockVelocity(db_connection, history_days=365, lead_time_days=2, cover_days=7,
+                               refresh_interval=300)
+
+# Index pencarian produk & pelanggan; dibangun ulang tiap 5 menit untuk perubahan dari worker lain
+search_index = SearchService(db_connection, refresh_interval=300)
+
+# Lipat delta stok (counter shard) ke products.stock tiap 5 detik
+stock_compactor = StockCompactor(db_connection, interval=5)
+
+# Cache JSON katalog produk; TTL untuk perubahan dari worker lain
+catalog_cache = CatalogCache(ttl=30)
+
+# Pagination untuk GET /api/sales
+SALES_PAGE_SIZE = 100
+SALES_PAGE_MAX = 500
+
+def encode_sale_cursor(sale_date, sale_id):
+    """Cursor opaque dari (sale_date, id) baris terakhir di halaman"""
+    raw = f"{sale_date.isoformat()}|{sale_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_sale_cursor(value):
+    if not value:
         return None
+    try:
+        raw = base64.urlsafe_b64decode(value.encode()).decode()
+        sale_date, sale_id = raw.split('|')
+        return datetime.fromisoformat(sale_date), int(sale_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
 
-# Helper function untuk format tanggal yang konsisten
-def format_date(date_obj):
-    if date_obj is None:
+def parse_date_param(value):
+    """Parse parameter tanggal YYYY-MM-DD, None jika kosong"""
+    if not value:
         return None
-    if isinstance(date_obj, datetime):
-        return date_obj.isoformat() + 'Z'  # Format ISO dengan timezone
-    return str(date_obj)
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'Invalid date "{value}", expected YYYY-MM-DD')
 
 # 🔐 AUTH MIDDLEWARE & HELPERS
 
+# Cache token yang sudah diverifikasi, entry hilang saat exp token lewat.
+# Juga menyimpan denylist token yang dicabut (logout, revoke_user); denylist
+# ditulis ke tabel token_revocations supaya berlaku di semua worker, dan
+# max_ttl membatasi berapa lama worker lain masih memakai entry cache lama
+TOKEN_LIFETIME = timedelta(days=7)
+USER_ROLES = ('admin', 'kasir')
+token_cache = TokenCache(db_connection, maxsize=10000, max_ttl=60,
+                         token_lifetime=TOKEN_LIFETIME.total_seconds())
+
 def generate_token(user_data):
     """Generate JWT token"""
     try:
         payload = {
             'user': user_data,
-            'exp': datetime.utcnow() + timedelta(days=7)
+            'iat': time.time(),    # Dibandingkan dengan token_cache.revoke_user()
+            'exp': datetime.utcnow() + TOKEN_LIFETIME
         }
         return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
     except Exception as e:
@@ -54,162 +252,179 @@ def generate_token(user_data):
         return f"simple-token-{user_data['id']}-{datetime.utcnow().timestamp()}"
   
 
+# bcrypt dijalankan di process pool terbatas (lihat password_hasher.py)
+password_hasher = PasswordHasher(workers=2, max_pending=8, rounds=12, timeout=5)
+
 def hash_password(password):
     """Hash password menggunakan bcrypt"""
-    try:
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
-    except Exception as e:
-        print(f"Hash error: {e}")
-        # Fallback ke hashlib jika bcrypt error
-        import hashlib
-        return hashlib.sha256(password.encode()).hexdigest()
+    return password_hasher.hash(password)
 
 def check_password(password, hashed):
-    """Check password dengan hash"""
-    try:
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-    except:
-        # Fallback
-        import hashlib
-        return hashlib.sha256(password.encode()).hexdigest() == hashed
+    """Check password dengan hash (bcrypt atau sha256 lama)"""
+    return password_hasher.verify(password, hashed)
+
+def hasher_busy_response():
+    return jsonify({
+        'success': False,
+        'message': 'Server sedang sibuk, silakan coba lagi sebentar'
+    }), 503, {'Retry-After': '1'}
 
 # 🔐 AUTH ROUTES
 
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """Register user baru"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     
-    try:
-        data = request.get_json()
-        name = data.get('name', '').strip()
-        email = data.get('email', '').strip().lower()
-        password = data.get('password', '')
-        role = data.get('role', 'kasir')  # Default role: kasir
+        try:
+            data = request.get_json()
+            name = data.get('name', '').strip()
+            email = data.get('email', '').strip().lower()
+            password = data.get('password', '')
+            role = data.get('role', 'kasir')  # Default role: kasir
 
-        # Validasi input
-        if not name or not email or not password:
-            return jsonify({'success': False, 'message': 'Nama, email, dan password harus diisi!'}), 400
+            # Validasi input
+            if not name or not email or not password:
+                return jsonify({'success': False, 'message': 'Nama, email, dan password harus diisi!'}), 400
         
-        if len(password) < 6:
-            return jsonify({'success': False, 'message': 'Password minimal 6 karakter!'}), 400
+            if len(password) < 6:
+                return jsonify({'success': False, 'message': 'Password minimal 6 karakter!'}), 400
 
-        cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor(dictionary=True)
         
-        # Cek apakah email sudah terdaftar
-        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-        if cursor.fetchone():
-            cursor.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Email sudah terdaftar!'}), 400
+            # Cek apakah email sudah terdaftar
+            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+            if cursor.fetchone():
+                cursor.close()
+                return jsonify({'success': False, 'message': 'Email sudah terdaftar!'}), 400
 
-        # Hash password
-        hashed_password = hash_password(password)
+            # Hash password
+            hashed_password = hash_password(password)
 
-        # Insert user baru
-        insert_query = """
-            INSERT INTO users (name, email, password, role) 
-            VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (name, email, hashed_password, role))
-        conn.commit()
-        user_id = cursor.lastrowid
+            # Insert user baru
+            insert_query = """
+                INSERT INTO users (name, email, password, role) 
+                VALUES (%s, %s, %s, %s)
+            """
+            cursor.execute(insert_query, (name, email, hashed_password, role))
+            conn.commit()
+            user_id = cursor.lastrowid
 
-        # Get user data untuk response
-        cursor.execute("SELECT id, name, email, role, created_at FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
+            # Get user data untuk response
+            cursor.execute("SELECT id, name, email, role, created_at FROM users WHERE id = %s", (user_id,))
+            user = cursor.fetchone()
         
-        # Format tanggal
-        user['created_at'] = format_date(user['created_at'])
+            # Format tanggal
+            user['created_at'] = format_date(user['created_at'])
 
-        cursor.close()
-        conn.close()
-
-        # Generate token
-        token = generate_token({
-            'id': user['id'],
-            'name': user['name'],
-            'email': user['email'],
-            'role': user['role']
-        })
+            cursor.close()
 
-        return jsonify({
-            'success': True,
-            'message': 'Registrasi berhasil!',
-            'data': {
-                'user': user,
-                'token': token
-            }
-        })
+            # Generate token
+            token = generate_token({
+                'id': user['id'],
+                'name': user['name'],
+                'email': user['email'],
+                'role': user['role']
+            })
 
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+            return jsonify({
+                'success': True,
+                'message': 'Registrasi berhasil!',
+                'data': {
+                    'user': user,
+                    'token': token
+                }
+            })
+
+        except HasherBusy:
+            return hasher_busy_response()
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     """Login user"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     
-    try:
-        data = request.get_json()
-        email = data.get('email', '').strip().lower()
-        password = data.get('password', '')
+        try:
+            data = request.get_json()
+            email = data.get('email', '').strip().lower()
+            password = data.get('password', '')
 
-        # Validasi input
-        if not email or not password:
-            return jsonify({'success': False, 'message': 'Email dan password harus diisi!'}), 400
+            # Validasi input
+            if not email or not password:
+                return jsonify({'success': False, 'message': 'Email dan password harus diisi!'}), 400
 
-        cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor(dictionary=True)
         
-        # Cari user by email
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+            # Cari user by email
+            cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+            user = cursor.fetchone()
         
-        if not user:
-            cursor.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Email atau password salah!'}), 401
-
-        # Check password
-        if not check_password(password, user['password']):
-            cursor.close()
-            conn.close()
-            return jsonify({'success': False, 'message': 'Email atau password salah!'}), 401
-
-        # Remove password dari response
-        user_data = {
-            'id': user['id'],
-            'name': user['name'],
-            'email': user['email'],
-            'role': user['role'],
-            'created_at': format_date(user['created_at'])
-        }
+            if not user:
+                cursor.close()
+                return jsonify({'success': False, 'message': 'Email atau password salah!'}), 401
 
-        # Generate token
-        token = generate_token(user_data)
+            # Check password
+            if not check_password(password, user['password']):
+                cursor.close()
+                return jsonify({'success': False, 'message': 'Email atau password salah!'}), 401
 
-        cursor.close()
-        conn.close()
+            # Upgrade hash lama (sha256 / work factor berbeda) selagi password asli ada
+            if password_hasher.needs_rehash(user['password']):
+                try:
+                    cursor.execute(
+                        "UPDATE users SET password = %s WHERE id = %s",
+                        (hash_password(password), user['id'])
+                    )
+                    conn.commit()
+                except HasherBusy:
+                    pass  # Dicoba lagi pada login berikutnya
 
-        return jsonify({
-            'success': True,
-            'message': 'Login berhasil!',
-            'data': {
-                'user': user_data,
-                'token': token
+            # Remove password dari response
+            user_data = {
+                'id': user['id'],
+                'name': user['name'],
+                'email': user['email'],
+                'role': user['role'],
+                'created_at': format_date(user['created_at'])
             }
-        })
 
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+            # Generate token
+            token = generate_token(user_data)
+
+            cursor.close()
+
+            return jsonify({
+                'success': True,
+                'message': 'Login berhasil!',
+                'data': {
+                    'user': user_data,
+                    'token': token
+                }
+            })
+
+        except HasherBusy:
+            return hasher_busy_response()
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+def verify_token(token):
+    """current_user dari token; raise TokenRevoked / jwt.InvalidTokenError"""
+    token_cache.check(token)
+    # Token yang sudah pernah diverifikasi tidak perlu di-decode ulang
+    current_user = token_cache.get(token)
+    if current_user is not None:
+        return current_user
+    data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+    token_cache.check(token, data)
+    token_cache.put(token, data['user'], data['exp'], data.get('iat', 0))
+    return data['user']
 
-@app.route('/api/auth/me', methods=['GET'])
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -218,13 +433,14 @@ def token_required(f):
         if not token:
             return jsonify({'success': False, 'message': 'Token is missing!'}), 401
         
+        # Remove 'Bearer ' prefix
+        if token.startswith('Bearer '):
+            token = token[7:]
+
         try:
-            # Remove 'Bearer ' prefix
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = data['user']
+            current_user = verify_token(token)
+        except TokenRevoked:
+            return jsonify({'success': False, 'message': 'Token has been revoked!'}), 401
         except jwt.ExpiredSignatureError:
             return jsonify({'success': False, 'message': 'Token has expired!'}), 401
         except jwt.InvalidTokenError:
@@ -236,6 +452,110 @@ def token_required(f):
     
     return decorated
 
+def admin_required(f):
+    @wraps(f)
+    @token_required
+    def decorated(current_user, *args, **kwargs):
+        if current_user.get('role') != 'admin':
+            return jsonify({'success': False, 'message': 'Admin access required!'}), 403
+        return f(current_user, *args, **kwargs)
+
+    return decorated
+
+def request_user_id():
+    """id user dari token request ini jika ada & valid (untuk ledger stok), selain itu None"""
+    token = request.headers.get('Authorization') if has_request_context() else None
+    if not token:
+        return None
+    if token.startswith('Bearer '):
+        token = token[7:]
+    try:
+        return verify_token(token).get('id')
+    except (TokenRevoked, jwt.InvalidTokenError):
+        return None
+
+@app.route('/api/auth/logout', methods=['POST'])
+@token_required
+def logout(current_user):
+    """Cabut token yang dipakai request ini"""
+    token = request.headers['Authorization']
+    try:
+        token_cache.revoke(token[7:] if token.startswith('Bearer ') else token)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({'success': True, 'message': 'Logout berhasil!'})
+
+@app.route('/api/auth/password', methods=['PUT'])
+@token_required
+def change_password(current_user):
+    """Ganti password; semua token lama user ini dicabut, token baru dikembalikan"""
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        try:
+            data = request.get_json() or {}
+            old_password = data.get('current_password', '')
+            new_password = data.get('new_password', '')
+            if not old_password or not new_password:
+                return jsonify({'success': False, 'message': 'Password lama dan baru harus diisi!'}), 400
+            if len(new_password) < 6:
+                return jsonify({'success': False, 'message': 'Password minimal 6 karakter!'}), 400
+
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT password FROM users WHERE id = %s", (current_user['id'],))
+            user = cursor.fetchone()
+            if not user or not check_password(old_password, user['password']):
+                cursor.close()
+                return jsonify({'success': False, 'message': 'Password lama salah!'}), 401
+
+            cursor.execute("UPDATE users SET password = %s WHERE id = %s",
+                           (hash_password(new_password), current_user['id']))
+            token_cache.revoke_user(current_user['id'], cursor)
+            conn.commit()
+            cursor.close()
+
+            # Diterbitkan setelah revoke_user, jadi tidak ikut dicabut
+            return jsonify({
+                'success': True,
+                'message': 'Password berhasil diganti!',
+                'data': {'token': generate_token(current_user)}
+            })
+
+        except HasherBusy:
+            return hasher_busy_response()
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/users/<int:user_id>/role', methods=['PUT'])
+@admin_required
+def update_user_role(current_user, user_id):
+    """Ubah role user; token lama user tersebut dicabut supaya role lama tidak terpakai lagi"""
+    role = (request.get_json() or {}).get('role')
+    if role not in USER_ROLES:
+        return jsonify({'success': False, 'error': f'role must be one of {", ".join(USER_ROLES)}'}), 400
+
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET role = %s WHERE id = %s", (role, user_id))
+            cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
+            if not cursor.fetchone():
+                conn.rollback()
+                cursor.close()
+                return jsonify({'success': False, 'error': 'User not found'}), 404
+            token_cache.revoke_user(user_id, cursor)
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, 'message': 'Role updated successfully'})
+
 # Kemudian route untuk /api/auth/me
 @app.route('/api/auth/me', methods=['GET'])
 @token_required
@@ -265,606 +585,1635 @@ def home():
 
 @app.route('/api/health')
 def health_check():
-    conn = get_db_connection()
-    if conn:
-        conn.close()
-        return jsonify({'status': 'healthy', 'database': 'connected'})
-    else:
-        return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
+    with db_connection() as conn:
+        if conn:
+            return jsonify({
+                'status': 'healthy',
+                'database': 'connected',
+                'pool': db_pool.stats(),
+                'read_routing': db_router.stats(),
+                'token_cache': token_cache.stats(),
+                'search_index': search_index.stats(),
+                'events': event_hub.stats(),
+                'stock_compactor': stock_compactor.stats(),
+                'password_hasher': password_hasher.stats()
+            })
+        else:
+            return jsonify({'status': 'unhealthy', 'database': 'disconnected', 'pool': db_pool.stats()}), 500
+
+@app.route('/api/events')
+def stream_events():
+    """Stream SSE perubahan dashboard, stok, dan produk (pengganti polling).
+
+    Event: dashboard, stock, low_stock, product, catalog, resync. Query param
+    events=stock,low_stock untuk membatasi jenis event. State dashboard saat
+    ini dikirim paling awal.
+    """
+    events = {name for name in request.args.get('events', '').split(',') if name} or None
+    initial = []
+    if events is None or 'dashboard' in events:
+        try:
+            initial.append(('dashboard', dashboard_stats.snapshot()))
+        except Exception as e:
+            print(f"⚠️ Event stream started without dashboard state: {e}")
+
+    try:
+        stream = event_hub.stream(events, request.headers.get('Last-Event-ID'), initial,
+                                  on_heartbeat=refresh_dashboard_stats)
+    except HubFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def refresh_dashboard_stats():
+    """Reconcile berkala saat stream menganggur; perubahan dari worker lain ikut di-push"""
+    try:
+        dashboard_stats.snapshot()
+    except Exception as e:
+        print(f"⚠️ Dashboard refresh failed: {e}")
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Metrik dalam format teks Prometheus"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/admin/slow-queries')
+@admin_required
+def get_slow_queries(current_user):
+    """Query lambat terbaru beserta EXPLAIN-nya (terbaru dulu)"""
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    return jsonify({
+        'success': True,
+        'data': slow_query_log.recent(limit),
+        'stats': slow_query_log.stats()
+    })
 
 @app.route('/api/dashboard')
 def get_dashboard():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor(dictionary=True)
-        
-        # Total penjualan hari ini
-        cursor.execute("""
-            SELECT COUNT(*) as today_sales, COALESCE(SUM(total_amount), 0) as revenue 
-            FROM sales 
-            WHERE DATE(sale_date) = CURDATE()
-        """)
-        today_stats = cursor.fetchone()
-        
-        # Produk stok menipis
-        cursor.execute("SELECT COUNT(*) as low_stock FROM products WHERE stock < 10")
-        low_stock = cursor.fetchone()
-        
-        # Total produk
-        cursor.execute("SELECT COUNT(*) as total_products FROM products")
-        total_products = cursor.fetchone()
-        
-        # Total pelanggan
-        cursor.execute("SELECT COUNT(*) as total_customers FROM customers")
-        total_customers = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'today_sales': today_stats['today_sales'],
-                'today_revenue': float(today_stats['revenue']),
-                'low_stock': low_stock['low_stock'],
-                'total_products': total_products['total_products'],
-                'total_customers': total_customers['total_customers']
-            }
-        })
+        stats = dashboard_stats.snapshot()
+    except StatsUnavailable:
+        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'today_sales': stats['today_sales'],
+            'today_revenue': stats['today_revenue'],
+            'low_stock': stats['low_stock'],
+            'total_products': stats['total_products'],
+            'total_customers': stats['total_customers']
+        }
+    })
     
 @app.route('/api/dashboard/stats')
 def get_dashboard_stats():
     """Get quick stats untuk dashboard laporan"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor(dictionary=True)
-        
-        # Total penjualan hari ini
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as today_sales, 
-                COALESCE(SUM(total_amount), 0) as today_revenue 
-            FROM sales 
-            WHERE DATE(sale_date) = CURDATE()
-        """)
-        today_stats = cursor.fetchone() or {'today_sales': 0, 'today_revenue': 0}
-        
-        # Total produk
-        cursor.execute("SELECT COUNT(*) as total_products FROM products")
-        total_products = cursor.fetchone() or {'total_products': 0}
-        
-        # Total pelanggan
-        cursor.execute("SELECT COUNT(*) as total_customers FROM customers")
-        total_customers = cursor.fetchone() or {'total_customers': 0}
-        
-        # Produk hampir habis (stok < 10)
-        cursor.execute("SELECT COUNT(*) as low_stock FROM products WHERE stock < 10")
-        low_stock = cursor.fetchone() or {'low_stock': 0}
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'today_sales': today_stats['today_sales'],
-                'today_revenue': float(today_stats['today_revenue']),
-                'total_products': total_products['total_products'],
-                'total_customers': total_customers['total_customers'],
-                'low_stock_items': low_stock['low_stock']
-            }
-        })
+        stats = dashboard_stats.snapshot()
+    except StatsUnavailable:
+        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'today_sales': stats['today_sales'],
+            'today_revenue': stats['today_revenue'],
+            'total_products': stats['total_products'],
+            'total_customers': stats['total_customers'],
+            'low_stock_items': stats['low_stock']
+        }
+    })
         
-@app.route('/api/products', methods=['GET'])
-def get_all_products():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+def cached_json_response(entry):
+    """Kirim body JSON dari cache, atau 304 jika ETag klien masih sama"""
+    encoding = entry.effective_encoding(choose_encoding(request.accept_encodings))
+    etag = entry.etag_for(encoding)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.encoded(encoding), mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM products ORDER BY id DESC")
-        products = cursor.fetchall()
+def encode_json(payload):
+    """Encode seperti jsonify, untuk body yang disimpan di cache"""
+    return dumps_bytes(payload) + b'\n'
 
-        for p in products:
-            p['price'] = float(p['price'])
-            p['stock'] = int(p['stock'])
-            p['description'] = p['description'] or ""
-            p['category'] = p['category'] or ""
-            p['image_url'] = p['image_url'] or ""
-            p['created_at'] = format_date(p['created_at'])
-            p['updated_at'] = format_date(p['updated_at'])
+def load_products_json():
+    with db_connection(readonly=True, shared=True) as conn:
+        if not conn:
+            raise PoolError('Database connection failed')
 
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {PRODUCT.columns()} FROM products_current ORDER BY id DESC")
+        products = PRODUCT.load_cursor(cursor)
         cursor.close()
-        conn.close()
 
-        return jsonify({'success': True, 'data': products})
+    return encode_json({'success': True, 'data': products})
 
+@app.route('/api/products', methods=['GET'])
+def get_all_products():
+    try:
+        entry = catalog_cache.get_catalog(load_products_json)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+    return cached_json_response(entry)
+
 @app.route('/api/products/update-stock', methods=['POST'])
 def update_stock():
-    conn = None
+    data = request.get_json()
+
+    # Validasi input
+    if not data or 'product_id' not in data or 'stock_change' not in data:
+        return jsonify({'success': False, 'error': 'Missing product_id or stock_change'}), 400
+
     try:
-        data = request.get_json()
-        
-        # Validasi input
-        if not data or 'product_id' not in data or 'stock_change' not in data:
-            return jsonify({'success': False, 'error': 'Missing product_id or stock_change'}), 400
-        
-        try:
-            product_id = int(data['product_id'])
-            stock_change = int(data['stock_change'])
-        except ValueError:
-            return jsonify({'success': False, 'error': 'Invalid product_id or stock_change format'}), 400
-        
-        conn = get_db_connection()
+        product_id = int(data['product_id'])
+        stock_change = int(data['stock_change'])
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid product_id or stock_change format'}), 400
+    # Opsional untuk ledger: kind (delivery|adjustment) dan reason
+    if data.get('kind') not in (None, 'delivery', 'adjustment'):
+        return jsonify({'success': False, 'error': 'kind must be delivery or adjustment'}), 400
+
+    with db_connection() as conn:
         if not conn:
             return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Mulai transaksi
+
+        try:
+            cursor = conn.cursor()
+            
+            # Mulai transaksi
+            conn.start_transaction()
+            
+            # Kunci produk agar clamp ke 0 memakai stok yang pasti (lihat stock_ledger.py)
+            levels, missing = adjust_stock_levels(cursor, [(product_id, stock_change)], data.get('kind'),
+                                                  data.get('reason'), request_user_id())
+            
+            if missing:
+                conn.rollback()
+                return jsonify({'success': False, 'error': 'Product not found'}), 404
+            new_stock = levels[product_id]
+            
+            # Commit transaksi
+            conn.commit()
+            stock_compactor.ensure_started()
+            dashboard_stats.set_product_stock(product_id, new_stock)
+            stock_velocity.set_product_stock(product_id, new_stock)
+            catalog_cache.invalidate([product_id])
+            
+            return jsonify({
+                'success': True,
+                'message': 'Stock updated successfully',
+                'new_stock': new_stock,
+                'product_id': product_id
+            })
+            
+        except Exception as e:
+            conn.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+STOCK_BATCH_MAX = 1000
+STOCK_BATCH_RETRIES = 3
+# Deadlock (1213) & lock wait timeout (1205) aman diulang
+RETRYABLE_LOCK_ERRORS = (1205, 1213)
+
+def apply_stock_adjustments(conn, adjustments, reason=None):
+    """Terapkan banyak perubahan stok dalam satu transaksi.
+
+    adjustments berisi (product_id, stock_change) sesuai urutan request.
+    Return (levels, missing): levels = {product_id: stok_baru}.
+    """
+    cursor = conn.cursor()
+    try:
         conn.start_transaction()
-        
-        # SELECT ... FOR UPDATE untuk locking row
-        cursor.execute(
-            "SELECT stock FROM products WHERE id = %s FOR UPDATE",
-            (product_id,)
-        )
-        product = cursor.fetchone()
-        
-        if not product:
+        # Sama seperti update_stock: produk dikunci, tiap perubahan di-clamp ke 0 berurutan
+        levels, missing = adjust_stock_levels(cursor, adjustments, reason=reason, user_id=request_user_id())
+        if missing:
             conn.rollback()
-            return jsonify({'success': False, 'error': 'Product not found'}), 404
-        
-        new_stock = product['stock'] + stock_change
-        if new_stock < 0:
-            new_stock = 0
-        
-        # Update stok
-        cursor.execute(
-            "UPDATE products SET stock = %s, updated_at = NOW() WHERE id = %s",
-            (new_stock, product_id)
-        )
-        
-        # Commit transaksi
+            return None, missing
         conn.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Stock updated successfully',
-            'new_stock': new_stock,
-            'product_id': product_id
-        })
-        
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return levels, []
+    except Exception:
+        conn.rollback()
+        raise
     finally:
-        if conn:
-            conn.close()
+        cursor.close()
+
+@app.route('/api/products/update-stock/batch', methods=['POST'])
+def update_stock_batch():
+    """Update stok banyak produk sekaligus (mis. penerimaan barang).
+
+    Body: {"adjustments": [{"product_id": 1, "stock_change": 24}, ...], "reason": "..."}
+    Semua perubahan diterapkan dalam satu transaksi; jika ada produk yang
+    tidak ditemukan, tidak ada yang diubah.
+    """
+    data = request.get_json(silent=True) or {}
+    raw_adjustments = data.get('adjustments')
+    if not isinstance(raw_adjustments, list) or not raw_adjustments:
+        return jsonify({'success': False, 'error': 'Field "adjustments" harus berisi list'}), 400
+    if len(raw_adjustments) > STOCK_BATCH_MAX:
+        return jsonify({'success': False, 'error': f'Maksimal {STOCK_BATCH_MAX} item per batch'}), 400
+
+    adjustments = []
+    for index, item in enumerate(raw_adjustments):
+        try:
+            adjustments.append((int(item['product_id']), int(item['stock_change'])))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': f'Item {index}: product_id atau stock_change tidak valid'
+            }), 400
+
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        for attempt in range(1, STOCK_BATCH_RETRIES + 1):
+            try:
+                levels, missing = apply_stock_adjustments(conn, adjustments, data.get('reason'))
+                break
+            except mysql.connector.Error as e:
+                if e.errno not in RETRYABLE_LOCK_ERRORS or attempt == STOCK_BATCH_RETRIES:
+                    return jsonify({'success': False, 'error': str(e)}), 500
+                time.sleep(0.05 * attempt)
+            except Exception as e:
+                return jsonify({'success': False, 'error': str(e)}), 500
+
+    if missing:
+        return jsonify({
+            'success': False,
+            'error': f'Product not found: {", ".join(str(i) for i in missing)}'
+        }), 404
+
+    stock_compactor.ensure_started()
+    for product_id, stock in levels.items():
+        dashboard_stats.set_product_stock(product_id, stock)
+        stock_velocity.set_product_stock(product_id, stock)
+    catalog_cache.invalidate(levels)
+
+    return jsonify({
+        'success': True,
+        'message': f'Stok {len(levels)} produk berhasil diperbarui',
+        'data': [{'product_id': product_id, 'new_stock': stock}
+                 for product_id, stock in sorted(levels.items())]
+    })
 
 @app.route('/api/products/low-stock')
 def get_low_stock():
     """Get products with stock below threshold"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     
-    try:
-        threshold = request.args.get('threshold', 10, type=int)
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT * FROM products WHERE stock < %s ORDER BY stock ASC",
-            (threshold,)
-        )
-        products = cursor.fetchall()
-        
-        for p in products:
-            p['price'] = float(p['price'])
-            p['stock'] = int(p['stock'])
+        try:
+            threshold = request.args.get('threshold', 10, type=int)
+            cursor = conn.cursor()
+            # Kandidat: snapshot di bawah threshold (index stock) + produk yang punya
+            # delta belum dilipat (stock_deltas hanya berisi baris itu, lihat stock_ledger)
+            cursor.execute(f"""
+                SELECT {PRODUCT.columns('c')}
+                FROM (SELECT id FROM products WHERE stock < %s
+                      UNION SELECT product_id FROM stock_deltas) candidates
+                JOIN products_current c ON c.id = candidates.id
+                WHERE c.stock < %s
+                ORDER BY c.stock ASC
+            """, (threshold, threshold))
+            products = PRODUCT.load_cursor(cursor)
+            cursor.close()
         
-        cursor.close()
-        conn.close()
+            return jsonify({
+                'success': True, 
+                'data': products,
+                'threshold': threshold
+            })
         
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/products/reorder-suggestions')
+def get_reorder_suggestions():
+    """Produk yang perlu dipesan ulang berdasarkan velocity penjualan.
+
+    Query params: status (reorder|all), limit. Urut days_of_cover terkecil.
+    """
+    if not stock_velocity.available:
+        return jsonify({'success': False, 'error': 'Reorder suggestions require numpy'}), 503
+
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 1000)
+        suggestions = stock_velocity.suggestions(request.args.get('status', 'reorder'), limit)
         return jsonify({
-            'success': True, 
-            'data': products,
-            'threshold': threshold
+            'success': True,
+            'data': suggestions,
+            'count': len(suggestions),
+            'settings': stock_velocity.settings()
         })
-        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except VelocityUnavailable as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
     
 @app.route('/api/customers', methods=['GET'])
 def get_customers():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM customers ORDER BY name")
-        customers = cursor.fetchall()
-        
-        # Format tanggal untuk konsistensi
-        for customer in customers:
-            customer['created_at'] = format_date(customer['created_at'])
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {CUSTOMER.columns()} FROM customers ORDER BY name")
+            customers = CUSTOMER.load_cursor(cursor)
+            cursor.close()
         
+            return jsonify({
+                'success': True,
+                'data': customers,
+                'count': len(customers)
+            })
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+def load_product_json(product_id):
+    """Body JSON satu produk, None jika tidak ditemukan"""
+    with db_connection(readonly=True, shared=True) as conn:
+        if not conn:
+            raise PoolError('Database connection failed')
+
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {PRODUCT.columns()} FROM products_current WHERE id = %s", (product_id,))
+        row = cursor.fetchone()
         cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': customers,
-            'count': len(customers)
-        })
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+
+    if not row:
+        return None
+    return encode_json({'success': True, 'data': PRODUCT.load(row)})
 
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 def get_product_by_id(product_id):
     """Get produk berdasarkan ID"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM products WHERE id = %s", (product_id,))
-        product = cursor.fetchone()
-        
-        if not product:
-            return jsonify({'success': False, 'error': 'Product not found'}), 404
-        
-        # Format data
-        product['price'] = float(product['price'])
-        product['stock'] = int(product['stock'])
-        product['description'] = product['description'] or ""
-        product['category'] = product['category'] or ""
-        product['image_url'] = product['image_url'] or ""
-        product['created_at'] = format_date(product['created_at'])
-        product['updated_at'] = format_date(product['updated_at'])
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': product})
-        
+        entry = catalog_cache.get_product(product_id, lambda: load_product_json(product_id))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+    if entry is None:
+        return jsonify({'success': False, 'error': 'Product not found'}), 404
+    return cached_json_response(entry)
+
+@app.route('/api/products/<int:product_id>/stock-movements', methods=['GET'])
+def get_stock_movements(product_id):
+    """Riwayat pergerakan stok satu produk dari ledger, terbaru dulu.
+
+    Query params: limit, before (id pergerakan, untuk halaman berikutnya).
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        before = request.args.get('before', type=int)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        try:
+            cursor = conn.cursor()
+            rows = list_movements(cursor, product_id, limit, before)
+            current = current_stock(cursor, [product_id]).get(product_id)
+            cursor.close()
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    if current is None:
+        return jsonify({'success': False, 'error': 'Product not found'}), 404
+    return jsonify({
+        'success': True,
+        'product_id': product_id,
+        'stock': current,
+        'data': [{
+            'id': movement_id,
+            'quantity': quantity,
+            'kind': kind,
+            'reason': reason,
+            'user_id': user_id,
+            'sale_id': sale_id,
+            'created_at': format_date(created_at)
+        } for movement_id, quantity, kind, reason, user_id, sale_id, created_at in rows],
+        'next_before': rows[-1][0] if len(rows) == limit else None
+    })
+
 @app.route('/api/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
     """Update data produk"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     
-    try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'success': False, 'error': 'No data provided'}), 400
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Cek produk exists
-        cursor.execute("SELECT id FROM products WHERE id = %s", (product_id,))
-        if not cursor.fetchone():
-            return jsonify({'success': False, 'error': 'Product not found'}), 404
-        
-        # Build update query
-        update_fields = []
-        update_values = []
-        
-        if 'name' in data:
-            update_fields.append("name = %s")
-            update_values.append(data['name'].strip())
-        if 'description' in data:
-            update_fields.append("description = %s")
-            update_values.append(data.get('description', '').strip())
-        if 'price' in data:
-            update_fields.append("price = %s")
-            update_values.append(float(data['price']))
-        if 'stock' in data:
-            update_fields.append("stock = %s")
-            update_values.append(int(data['stock']))
-        if 'category' in data:
-            update_fields.append("category = %s")
-            update_values.append(data.get('category', '').strip())
-        
-        # Tambahkan updated_at
-        update_fields.append("updated_at = NOW()")
-        
-        # Eksekusi update
-        update_values.append(product_id)
-        query = f"UPDATE products SET {', '.join(update_fields)} WHERE id = %s"
-        
-        cursor.execute(query, update_values)
-        conn.commit()
+        try:
+            data = request.get_json()
         
-        cursor.close()
-        conn.close()
+            if not data:
+                return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+            # Normalisasi & validasi semua field sebelum menulis apa pun,
+            # supaya input yang salah jadi 400, bukan 500 setelah commit
+            changes = {}
+            for field in ('name', 'description', 'category'):
+                if field in data:
+                    value = data[field]
+                    if value is None and field != 'name':
+                        value = ''
+                    if not isinstance(value, str):
+                        return jsonify({'success': False, 'error': f'{field} must be a string'}), 400
+                    changes[field] = value.strip()
+            try:
+                if 'price' in data:
+                    changes['price'] = float(data['price'])
+                if 'stock' in data:
+                    changes['stock'] = int(data['stock'])
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'price/stock must be numeric'}), 400
+        
+            cursor = conn.cursor()
+        
+            # Cek produk exists
+            cursor.execute("SELECT id FROM products WHERE id = %s", (product_id,))
+            if not cursor.fetchone():
+                return jsonify({'success': False, 'error': 'Product not found'}), 404
+        
+            # Build update query
+            update_fields = []
+            update_values = []
+        
+            for field in ('name', 'description', 'price', 'category'):
+                if field in changes:
+                    update_fields.append(f"{field} = %s")
+                    update_values.append(changes[field])
+            if 'stock' in changes:
+                # Stok diset lewat ledger (selisihnya dicatat sebagai adjustment)
+                set_stock_levels(cursor, {product_id: changes['stock']}, 'adjustment',
+                                 data.get('reason'), request_user_id())
+        
+            # Tambahkan updated_at
+            update_fields.append("updated_at = NOW()")
+        
+            # Eksekusi update
+            update_values.append(product_id)
+            query = f"UPDATE products SET {', '.join(update_fields)} WHERE id = %s"
+        
+            cursor.execute(query, update_values)
+            conn.commit()
+            if 'stock' in changes:
+                dashboard_stats.set_product_stock(product_id, changes['stock'])
+                stock_velocity.set_product_stock(product_id, changes['stock'])
+            search_index.product_changed(product_id, {
+                field: value for field, value in changes.items() if field != 'stock'
+            })
+            catalog_cache.invalidate([product_id])
+            event_hub.publish('product', {
+                'product_id': product_id,
+                'action': 'updated',
+                'fields': [field for field in ('name', 'description', 'price', 'stock', 'category')
+                           if field in changes]
+            })
         
-        return jsonify({
-            'success': True,
-            'message': 'Product updated successfully'
-        })
+            cursor.close()
         
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+            return jsonify({
+                'success': True,
+                'message': 'Product updated successfully'
+            })
+        
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
     
 @app.route('/api/products', methods=['POST'])
 def create_product():
     """Create produk baru"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     
-    try:
-        data = request.get_json()
-        
-        # Validasi input wajib
-        required_fields = ['name', 'price', 'stock']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'success': False, 
-                    'error': f'Field "{field}" harus diisi'
-                }), 400
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        # Insert produk baru
-        insert_query = """
-            INSERT INTO products 
-            (name, description, price, stock, category, image_url) 
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        
-        cursor.execute(insert_query, (
-            data['name'].strip(),
-            data.get('description', '').strip(),
-            float(data['price']),
-            int(data['stock']),
-            data.get('category', '').strip(),
-            data.get('image_url', '')
-        ))
-        
-        conn.commit()
-        new_id = cursor.lastrowid
-        
-        # Ambil data produk yang baru dibuat
-        cursor.execute("SELECT * FROM products WHERE id = %s", (new_id,))
-        new_product = cursor.fetchone()
-        
-        # Format data untuk response
-        new_product['price'] = float(new_product['price'])
-        new_product['stock'] = int(new_product['stock'])
-        new_product['description'] = new_product['description'] or ""
-        new_product['category'] = new_product['category'] or ""
-        new_product['image_url'] = new_product['image_url'] or ""
-        new_product['created_at'] = format_date(new_product['created_at'])
-        new_product['updated_at'] = format_date(new_product['updated_at'])
+        try:
+            data = request.get_json()
+        
+            # Validasi input wajib
+            required_fields = ['name', 'price', 'stock']
+            for field in required_fields:
+                if field not in data:
+                    return jsonify({
+                        'success': False, 
+                        'error': f'Field "{field}" harus diisi'
+                    }), 400
+        
+            cursor = conn.cursor()
+        
+            # Insert produk baru
+            insert_query = """
+                INSERT INTO products 
+                (name, description, price, stock, category, image_url) 
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """
         
-        cursor.close()
-        conn.close()
+            cursor.execute(insert_query, (
+                data['name'].strip(),
+                data.get('description', '').strip(),
+                float(data['price']),
+                int(data['stock']),
+                data.get('category', '').strip(),
+                data.get('image_url', '')
+            ))
+            new_id = cursor.lastrowid
+            # Saldo awal di ledger stok
+            append_movements(cursor, [(new_id, int(data['stock']), 'opening', data.get('reason'),
+                                       request_user_id(), None)])
+        
+            conn.commit()
+            dashboard_stats.set_product_stock(new_id, int(data['stock']))
+            stock_velocity.set_product_stock(new_id, int(data['stock']))
+            search_index.product_saved(new_id, {
+                'name': data['name'].strip(),
+                'description': data.get('description', '').strip(),
+                'category': data.get('category', '').strip(),
+                'price': float(data['price'])
+            })
+            catalog_cache.invalidate([new_id])
+            event_hub.publish('product', {'product_id': new_id, 'action': 'created'})
+        
+            # Ambil data produk yang baru dibuat
+            cursor.execute(f"SELECT {PRODUCT.columns()} FROM products_current WHERE id = %s", (new_id,))
+            new_product = PRODUCT.load(cursor.fetchone())
+            cursor.close()
         
-        return jsonify({
-            'success': True,
-            'message': 'Produk berhasil ditambahkan',
-            'data': new_product
-        })
+            return jsonify({
+                'success': True,
+                'message': 'Produk berhasil ditambahkan',
+                'data': new_product
+            })
         
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+PRODUCT_IMPORT_FIELDS = ('name', 'description', 'price', 'stock', 'category', 'image_url')
+PRODUCT_IMPORT_CHUNK_SIZE = 500
+PRODUCT_IMPORT_MAX_ERRORS = 500
+
+def parse_product_row(raw):
+    """Normalisasi satu baris import produk, raise ValueError jika tidak valid.
+
+    Kolom kosong dianggap tidak diisi. Tanpa id, name/price/stock wajib ada.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('Baris harus berupa object')
+    row = {}
+    for key, value in raw.items():
+        key = (key or '').strip().lower()
+        if value is None or (isinstance(value, str) and value.strip() == ''):
+            continue
+        if key == 'id':
+            try:
+                row['id'] = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'id "{value}" tidak valid')
+        elif key == 'price':
+            try:
+                row['price'] = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'price "{value}" tidak valid')
+            if row['price'] < 0:
+                raise ValueError('price tidak boleh negatif')
+        elif key == 'stock':
+            try:
+                row['stock'] = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'stock "{value}" tidak valid')
+        elif key in PRODUCT_IMPORT_FIELDS:
+            row[key] = str(value).strip()
+
+    if 'id' not in row:
+        missing = [field for field in ('name', 'price', 'stock') if field not in row]
+        if missing:
+            raise ValueError(f'Produk baru harus berisi {", ".join(missing)}')
+    elif len(row) == 1:
+        raise ValueError('Tidak ada kolom yang diubah')
+    return row
+
+def upsert_products_chunk(conn, chunk):
+    """Upsert satu potongan import dalam satu transaksi.
+
+    chunk berisi (nomor_baris, row). Return (inserted, updated, errors).
+    """
+    cursor = conn.cursor()
+    errors = []
+    try:
+        conn.start_transaction()
+
+        # Kunci & baca produk yang sudah ada, urut id, supaya kolom yang tidak
+        # diisi di file tetap memakai nilai terbaru
+        ids = sorted({row['id'] for _, row in chunk if 'id' in row})
+        current = {}
+        if ids:
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(f"""
+                SELECT id, name, description, price, stock, category, image_url
+                FROM products WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE
+            """, ids)
+            for product_id, *values in cursor.fetchall():
+                current[product_id] = dict(zip(PRODUCT_IMPORT_FIELDS, values))
+        existing = set(current)
+
+        new_rows = []
+        stock_levels = {}
+        for line, row in chunk:
+            if 'id' in row and row['id'] in current:
+                current[row['id']].update({k: v for k, v in row.items() if k != 'id'})
+                if 'stock' in row and row['id'] in existing:
+                    stock_levels[row['id']] = row['stock']
+                continue
+            missing = [field for field in ('name', 'price', 'stock') if field not in row]
+            if missing:
+                errors.append({'row': line, 'error': f'Produk {row["id"]} tidak ditemukan'})
+                continue
+            merged = {'description': '', 'category': '', 'image_url': ''}
+            merged.update({k: v for k, v in row.items() if k != 'id'})
+            if 'id' in row:
+                current[row['id']] = merged
+            else:
+                new_rows.append(merged)
+
+        values = [(product_id,) + tuple(product[f] for f in PRODUCT_IMPORT_FIELDS)
+                  for product_id, product in sorted(current.items())]
+
+        # Stok produk lama diset lewat ledger sebelum upsert menulis nilai yang sama
+        user_id = request_user_id()
+        set_stock_levels(cursor, stock_levels, 'import', None, user_id)
+
+        if values:
+            placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(values))
+            updates = ', '.join(f"{field} = VALUES({field})" for field in PRODUCT_IMPORT_FIELDS)
+            cursor.execute(f"""
+                INSERT INTO products (id, name, description, price, stock, category, image_url)
+                VALUES {placeholders}
+                ON DUPLICATE KEY UPDATE {updates}, updated_at = NOW()
+            """, [value for row in values for value in row])
+        # Produk tanpa id: id-nya diambil dari INSERT itu sendiri, bukan dari MAX(id)
+        new_ids = insert_returning_ids(
+            cursor,
+            "INSERT INTO products (name, description, price, stock, category, image_url) VALUES ",
+            [tuple(product[f] for f in PRODUCT_IMPORT_FIELDS) for product in new_rows]
+        )
+
+        # Saldo awal produk baru (id dari file dan id auto increment)
+        created = [(product_id, product) for product_id, product in sorted(current.items())
+                   if product_id not in existing]
+        created += list(zip(new_ids, new_rows))
+        append_movements(cursor, [(product_id, int(product['stock']), 'import', None, user_id, None)
+                                  for product_id, product in created])
+        conn.commit()
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        conn.rollback()
+        return 0, 0, [{'row': line, 'error': str(e)} for line, _ in chunk]
+    finally:
+        cursor.close()
+
+    return len(created), len(existing), errors
+
+def iter_product_import_rows():
+    """Baca baris import dari upload file, JSON array, atau body CSV (streaming).
+
+    JSON juga dibaca per elemen lewat json_stream, jadi error format/encoding
+    baru muncul saat iterasi (ValueError atau csv.Error).
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig')
+        if (upload.filename or '').lower().endswith('.json'):
+            return iter_json_array(stream, key='products')
+        return csv.DictReader(stream)
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig')
+    if request.is_json:
+        return iter_json_array(stream, key='products')
+    return csv.DictReader(stream)
+
+@app.route('/api/products/import', methods=['POST'])
+def import_products():
+    """Import/upsert produk massal dari CSV atau JSON.
+
+    Baris dengan id meng-update produk tersebut (kolom yang kosong tidak diubah),
+    baris tanpa id menjadi produk baru. Baris yang gagal dilaporkan tanpa
+    membatalkan baris lain; file yang rusak di tengah menghentikan import
+    setelah baris sebelumnya tersimpan.
+    """
+    total = inserted = updated = 0
+    errors = []
+
+    def flush(chunk):
+        nonlocal inserted, updated
+        chunk_inserted, chunk_updated, chunk_errors = upsert_products_chunk(conn, chunk)
+        inserted += chunk_inserted
+        updated += chunk_updated
+        errors.extend(chunk_errors)
+
+    def summary():
+        return {
+            'total_rows': total,
+            'inserted': inserted,
+            'updated': updated,
+            'failed': len(errors),
+            'errors': errors[:PRODUCT_IMPORT_MAX_ERRORS]
+        }
+
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+
+        try:
+            rows = iter(iter_product_import_rows())
+            chunk = []
+            while True:
+                try:
+                    raw = next(rows)
+                except StopIteration:
+                    break
+                except (ValueError, csv.Error) as e:
+                    # Sisa file tidak bisa dibaca; potongan yang sudah terkumpul tetap disimpan
+                    errors.append({'row': total + 1, 'error': f'Gagal membaca data: {e}'})
+                    break
+                total += 1
+                try:
+                    chunk.append((total, parse_product_row(raw)))
+                except ValueError as e:
+                    errors.append({'row': total, 'error': str(e)})
+                if len(chunk) >= PRODUCT_IMPORT_CHUNK_SIZE:
+                    flush(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+        except Exception as e:
+            error = {'success': False, 'error': str(e), 'data': summary()}
+        else:
+            error = None
+
+    if inserted or updated:
+        dashboard_stats.invalidate()
+        stock_velocity.invalidate()
+        search_index.invalidate()
+        catalog_cache.invalidate()
+        event_hub.publish('catalog', {'action': 'imported', 'inserted': inserted, 'updated': updated})
+
+    if error:
+        return jsonify(error), 500
+    return jsonify({
+        'success': not errors,
+        'message': f'{inserted} produk ditambahkan, {updated} produk diperbarui',
+        'data': summary()
+    })
 
 @app.route('/api/customers', methods=['POST'])
 def add_customer():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
     
-    try:
-        data = request.get_json()
-        cursor = conn.cursor()
+        try:
+            data = request.get_json()
+            cursor = conn.cursor()
         
-        query = """
-            INSERT INTO customers (name, email, phone, address) 
-            VALUES (%s, %s, %s, %s)
-        """
-        values = (
-            data.get('name', '').strip(),
-            data.get('email', '').strip(),
-            data.get('phone', '').strip(),
-            data.get('address', '').strip()
-        )
+            query = """
+                INSERT INTO customers (name, email, phone, address) 
+                VALUES (%s, %s, %s, %s)
+            """
+            values = (
+                data.get('name', '').strip(),
+                data.get('email', '').strip(),
+                data.get('phone', '').strip(),
+                data.get('address', '').strip()
+            )
         
-        cursor.execute(query, values)
-        conn.commit()
-        customer_id = cursor.lastrowid
+            cursor.execute(query, values)
+            conn.commit()
+            customer_id = cursor.lastrowid
+            dashboard_stats.customer_added()
+            search_index.customer_saved(customer_id, {'name': values[0], 'email': values[1], 'phone': values[2]})
         
-        cursor.close()
-        conn.close()
+            cursor.close()
         
-        return jsonify({
-            'success': True,
-            'message': 'Pelanggan berhasil ditambahkan ke database',
-            'data': {'id': customer_id}
-        })
+            return jsonify({
+                'success': True,
+                'message': 'Pelanggan berhasil ditambahkan ke database',
+                'data': {'id': customer_id}
+            })
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    """Typeahead produk & pelanggan.
+
+    Query params: q, type (all|products|customers), limit. Hasil produk
+    tanpa stok; ambil detail lewat /api/products/<id>.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Parameter q harus diisi'}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+
+    try:
+        results = search_index.search(query[:100], request.args.get('type', 'all'), limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except SearchUnavailable as e:
+        return jsonify({'success': False, 'error': f'Search index not ready: {e}'}), 503
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+    return jsonify({'success': True, 'query': query, 'data': results})
+
 @app.route('/api/customers/report', methods=['GET'])
 def customer_report():
-    """Laporan pelanggan: total pelanggan, pelanggan terbaru, transaksi terbanyak"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    """Laporan pelanggan: total pelanggan, pelanggan terbaru, transaksi terbanyak.
 
+    Query params: top (default 10), days (window N hari terakhir, default
+    sepanjang waktu), by (transactions|spend). Peringkat dari customer_leaderboard.
+    """
     try:
-        cursor = conn.cursor(dictionary=True)
+        top = min(max(int(request.args.get('top', 10)), 1), 100)
+        days = int(request.args['days']) if request.args.get('days') else None
+        top_customers = customer_leaderboard.top(top, days, request.args.get('by', 'transactions'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        # Total pelanggan
-        cursor.execute("SELECT COUNT(*) AS total_customers FROM customers")
-        total_customers = cursor.fetchone()['total_customers']
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
 
-        # Daftar pelanggan terbaru
-        cursor.execute("""
-            SELECT id, name, phone, created_at 
-            FROM customers
-            ORDER BY created_at DESC
-            LIMIT 20
-        """)
-        latest_customers = cursor.fetchall()
+        try:
+            cursor = conn.cursor()
 
-        for c in latest_customers:
-            c['created_at'] = format_date(c['created_at'])
+            # Total pelanggan
+            cursor.execute("SELECT COUNT(*) AS total_customers FROM customers")
+            total_customers = cursor.fetchone()[0]
 
-        cursor.close()
-        conn.close()
+            # Daftar pelanggan terbaru
+            cursor.execute(f"""
+                SELECT {CUSTOMER.columns()} 
+                FROM customers
+                ORDER BY created_at DESC
+                LIMIT 20
+            """)
+            latest_customers = CUSTOMER.load_all(cursor.fetchall())
 
-        return jsonify({
-            'success': True,
-            'data': {
-                'total_customers': total_customers,
-                'latest_customers': latest_customers
-            }
-        })
+            # Nama & telepon untuk leaderboard (lookup primary key, maks. `top` baris)
+            if top_customers:
+                ids = [entry['customer_id'] for entry in top_customers]
+                cursor.execute(
+                    f"SELECT id, name, phone FROM customers WHERE id IN ({', '.join(['%s'] * len(ids))})",
+                    ids
+                )
+                names = {customer_id: (name, phone) for customer_id, name, phone in cursor.fetchall()}
+                top_customers = [
+                    dict(entry, name=names.get(entry['customer_id'], (None, None))[0],
+                         phone=names.get(entry['customer_id'], (None, None))[1])
+                    for entry in top_customers
+                ]
 
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+            cursor.close()
+
+            return jsonify({
+                'success': True,
+                'data': {
+                    'total_customers': total_customers,
+                    'latest_customers': latest_customers,
+                    'top_customers': top_customers,
+                    'top_window_days': days
+                }
+            })
+
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+# 📈 REPORTS (dibaca dari tabel rollup, lihat rollups.py)
+
+def report_range(default_days=30):
+    """(from, to) sebagai date dari query params; to inklusif, default hari ini"""
+    end = parse_date_param(request.args.get('to'))
+    end = end.date() if end else datetime.now().date()
+    start = parse_date_param(request.args.get('from'))
+    start = start.date() if start else end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValueError('"from" must not be after "to"')
+    return start, end
+
+@app.route('/api/reports/revenue', methods=['GET'])
+def report_revenue():
+    """Omzet per jam/hari/bulan. Query params: granularity (hour|day|month), from, to"""
+    granularity = request.args.get('granularity', 'day')
+    try:
+        start, end = report_range({'hour': 1, 'month': 365}.get(granularity, 30))
+        if granularity == 'month' and not request.args.get('from'):
+            start = start.replace(day=1)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+        try:
+            cursor = conn.cursor()
+            series = revenue_series(cursor, granularity, start, end)
+            cursor.close()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'data': {
+            'granularity': granularity,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'total_revenue': round(sum(point['revenue'] for point in series), 2),
+            'total_sales': sum(point['sale_count'] for point in series),
+            'series': series
+        }
+    })
+
+@app.route('/api/reports/products', methods=['GET'])
+def report_products():
+    """Produk terlaris (limit) atau seri harian satu produk (product_id). Params: from, to"""
+    try:
+        start, end = report_range()
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        product_id = request.args.get('product_id')
+        product_id = int(product_id) if product_id else None
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+        try:
+            cursor = conn.cursor()
+            if product_id is None:
+                data = top_products(cursor, start, end, limit)
+            else:
+                data = product_series(cursor, product_id, start, end)
+            cursor.close()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, 'from': start.isoformat(), 'to': end.isoformat(), 'data': data})
+
+@app.route('/api/reports/payment-methods', methods=['GET'])
+def report_payment_methods():
+    """Jumlah transaksi & omzet per metode pembayaran. Params: from, to"""
+    try:
+        start, end = report_range()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+        try:
+            cursor = conn.cursor()
+            data = payment_method_totals(cursor, start, end)
+            cursor.close()
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, 'from': start.isoformat(), 'to': end.isoformat(), 'data': data})
 
 
 @app.route('/api/sales', methods=['GET'])
 def get_sales():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-    
+    """Daftar penjualan per halaman (keyset pagination pada sale_date, id).
+
+    Query params: limit, cursor (dari next_cursor), date_from, date_to (YYYY-MM-DD)
+    """
     try:
-        cursor = conn.cursor(dictionary=True)
+        limit = min(max(request.args.get('limit', SALES_PAGE_SIZE, type=int), 1), SALES_PAGE_MAX)
+        after = decode_sale_cursor(request.args.get('cursor'))
+        date_from = parse_date_param(request.args.get('date_from'))
+        date_to = parse_date_param(request.args.get('date_to'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    
+        try:
+            cursor = conn.cursor()
+
+            conditions = []
+            params = []
+            if date_from:
+                conditions.append("s.sale_date >= %s")
+                params.append(date_from)
+            if date_to:
+                # date_to inklusif -> sebelum hari berikutnya
+                conditions.append("s.sale_date < %s")
+                params.append(date_to + timedelta(days=1))
+            if after:
+                conditions.append("(s.sale_date < %s OR (s.sale_date = %s AND s.id < %s))")
+                params.extend([after[0], after[0], after[1]])
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+            # Get sales dengan customer name (ambil 1 ekstra untuk cek halaman berikutnya)
+            cursor.execute(f"""
+                SELECT {SALE.columns()}, c.name as customer_name 
+                FROM sales s 
+                LEFT JOIN customers c ON s.customer_id = c.id 
+                {where}
+                ORDER BY s.sale_date DESC, s.id DESC
+                LIMIT %s
+            """, params + [limit + 1])
+            rows = cursor.fetchall()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = encode_sale_cursor(last[SALE.index('sale_date')], last[SALE.index('id')])
+
+            sales = SALE_LISTING.load_all(rows)
+            del rows
+
+            # Get sale items untuk seluruh halaman dalam satu query
+            items_by_sale = {sale.id: [] for sale in sales}
+            if items_by_sale:
+                placeholders = ', '.join(['%s'] * len(items_by_sale))
+                cursor.execute(f"""
+                    SELECT {SALE_ITEM.columns()}, p.name as product_name 
+                    FROM sale_items si 
+                    JOIN products p ON si.product_id = p.id 
+                    WHERE si.sale_id IN ({placeholders})
+                """, list(items_by_sale))
+                for item in SALE_ITEM_LISTING.load_cursor(cursor):
+                    items_by_sale[item.sale_id].append(item)
+
+            for sale in sales:
+                sale.items = items_by_sale[sale.id]
         
-        # Get sales dengan customer name
-        cursor.execute("""
-            SELECT s.*, c.name as customer_name 
-            FROM sales s 
-            LEFT JOIN customers c ON s.customer_id = c.id 
-            ORDER BY s.sale_date DESC
-        """)
-        sales = cursor.fetchall()
-        
-        # Convert data untuk JSON
-        for sale in sales:
-            sale['total_amount'] = float(sale['total_amount'])
-            sale['sale_date'] = format_date(sale['sale_date'])
-        
-        # Get sale items untuk setiap sale
-        for sale in sales:
-            cursor.execute("""
-                SELECT si.*, p.name as product_name 
-                FROM sale_items si 
-                JOIN products p ON si.product_id = p.id 
-                WHERE si.sale_id = %s
-            """, (sale['id'],))
-            items = cursor.fetchall()
-            
-            # Convert decimal to float untuk items
-            for item in items:
-                item['unit_price'] = float(item['unit_price'])
-                item['subtotal'] = float(item['subtotal'])
-            
-            sale['items'] = items
+            cursor.close()
         
+            return jsonify({
+                'success': True,
+                'data': sales,
+                'count': len(sales),
+                'next_cursor': next_cursor
+            })
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+SALES_EXPORT_FETCH_SIZE = 500
+SALES_EXPORT_CSV_HEADER = [
+    'sale_id', 'sale_date', 'customer_id', 'customer_name', 'payment_method', 'total_amount',
+    'product_id', 'product_name', 'quantity', 'unit_price', 'subtotal'
+]
+
+def stream_sales_export(fmt, date_from=None, date_to=None):
+    """Generator export penjualan + item dalam satu query, lewat cursor unbuffered.
+
+    Yield pertama (None) menandakan query sudah berjalan; setelah itu
+    yield potongan NDJSON (bytes, satu sale per baris, di-encode dengan
+    serializers.dumps_bytes seperti response API) atau teks CSV (satu item per baris).
+    """
+    with db_connection(readonly=True) as conn:
+        if not conn:
+            raise PoolError('Database connection failed')
+
+        conditions = []
+        params = []
+        if date_from:
+            conditions.append("s.sale_date >= %s")
+            params.append(date_from)
+        if date_to:
+            conditions.append("s.sale_date < %s")
+            params.append(date_to + timedelta(days=1))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # Unbuffered: baris diambil dari server sedikit demi sedikit
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(f"""
+            SELECT s.id, s.sale_date, s.customer_id, c.name, s.payment_method, s.total_amount,
+                   si.product_id, p.name, si.quantity, si.unit_price, si.subtotal
+            FROM sales s
+            LEFT JOIN customers c ON s.customer_id = c.id
+            LEFT JOIN sale_items si ON si.sale_id = s.id
+            LEFT JOIN products p ON si.product_id = p.id
+            {where}
+            ORDER BY s.sale_date, s.id
+        """, params)
+        yield None
+
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(SALES_EXPORT_CSV_HEADER)
+        else:
+            buffer = io.BytesIO()
+
+        current = None
+        while True:
+            rows = cursor.fetchmany(SALES_EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            for (sale_id, sale_date, customer_id, customer_name, payment_method, total_amount,
+                 product_id, product_name, quantity, unit_price, subtotal) in rows:
+                if fmt == 'csv':
+                    writer.writerow([
+                        sale_id, format_date(sale_date), customer_id, customer_name or '',
+                        payment_method, float(total_amount), product_id, product_name or '',
+                        quantity, None if unit_price is None else float(unit_price),
+                        None if subtotal is None else float(subtotal)
+                    ])
+                    continue
+
+                # NDJSON: baris item berurutan per sale, gabungkan ke satu objek
+                if current is None or current['id'] != sale_id:
+                    if current is not None:
+                        buffer.write(dumps_bytes(current) + b'\n')
+                    # Tanggal & Decimal diformat oleh dumps_bytes, sama seperti API
+                    current = {
+                        'id': sale_id,
+                        'sale_date': sale_date,
+                        'customer_id': customer_id,
+                        'customer_name': customer_name,
+                        'payment_method': payment_method,
+                        'total_amount': total_amount,
+                        'items': []
+                    }
+                if product_id is not None:
+                    current['items'].append({
+                        'product_id': product_id,
+                        'product_name': product_name,
+                        'quantity': quantity,
+                        'unit_price': unit_price,
+                        'subtotal': subtotal
+                    })
+
+            chunk = buffer.getvalue()
+            if chunk:
+                yield chunk
+                buffer.seek(0)
+                buffer.truncate()
+
+        if current is not None:
+            buffer.write(dumps_bytes(current) + b'\n')
+        if buffer.getvalue():
+            yield buffer.getvalue()
         cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'success': True,
-            'data': sales,
-            'count': len(sales)
-        })
+
+@app.route('/api/sales/export', methods=['GET'])
+def export_sales():
+    """Export seluruh riwayat penjualan sebagai stream NDJSON atau CSV"""
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'success': False, 'error': 'format harus ndjson atau csv'}), 400
+    try:
+        date_from = parse_date_param(request.args.get('date_from'))
+        date_to = parse_date_param(request.args.get('date_to'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    stream = stream_sales_export(fmt, date_from, date_to)
+    try:
+        # Jalankan query dulu agar error database masih bisa dijawab dengan JSON
+        next(stream)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/sales', methods=['POST'])
-def create_sale():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'success': False, 'error': 'Database connection failed'}), 500
-    
+    if fmt == 'csv':
+        mimetype = 'text/csv'
+        filename = 'sales-export.csv'
+    else:
+        mimetype = 'application/x-ndjson'
+        filename = 'sales-export.ndjson'
+
+    response = Response(stream, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def find_products(cursor, product_ids):
+    """Set id produk yang ada, tanpa lock.
+
+    Baris produk tidak lagi dikunci saat checkout: stok dikurangi lewat ledger
+    dan counter shard (stock_ledger.record_movements), bukan UPDATE products.
+    """
+    ids = sorted(set(product_ids))
+    if not ids:
+        return set()
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"SELECT id FROM products WHERE id IN ({placeholders})", ids)
+    return {row[0] for row in cursor.fetchall()}
+
+def find_customers(cursor, customer_ids):
+    """Set id pelanggan yang ada, tanpa lock"""
+    ids = sorted(set(customer_ids))
+    if not ids:
+        return set()
+    cursor.execute(f"SELECT id FROM customers WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+    return {row[0] for row in cursor.fetchall()}
+
+# (innodb_autoinc_lock_mode, auto_increment_increment), dibaca sekali per proses
+autoinc_settings = None
+
+def autoinc_step(cursor):
+    """Langkah id untuk INSERT multi-row, atau None jika id-nya tidak dijamin berurutan.
+
+    LAST_INSERT_ID() (cursor.lastrowid) setelah INSERT multi-row = id baris
+    pertama; baris berikutnya berurutan per auto_increment_increment hanya
+    jika innodb_autoinc_lock_mode <= 1. Mode 2 (default MySQL 8) boleh
+    menyelipkan id insert lain, jadi pemanggil harus insert per baris.
+    """
+    global autoinc_settings
+    if autoinc_settings is None:
+        cursor.execute("SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment")
+        lock_mode, increment = cursor.fetchone()
+        autoinc_settings = (int(lock_mode), int(increment))
+    lock_mode, increment = autoinc_settings
+    return increment if lock_mode <= 1 else None
+
+def insert_returning_ids(cursor, sql, rows):
+    """Jalankan "INSERT ... VALUES " untuk rows, return id auto increment sesuai urutan.
+
+    Satu INSERT multi-row jika id-nya bisa diturunkan dari LAST_INSERT_ID()
+    (lihat autoinc_step), selain itu satu INSERT per baris.
+    """
+    if not rows:
+        return []
+    placeholders = '(' + ', '.join(['%s'] * len(rows[0])) + ')'
+    step = autoinc_step(cursor)
+    if step is None:
+        ids = []
+        for row in rows:
+            cursor.execute(sql + placeholders, row)
+            ids.append(cursor.lastrowid)
+        return ids
+    cursor.execute(sql + ', '.join([placeholders] * len(rows)), [value for row in rows for value in row])
+    first_id = cursor.lastrowid
+    return [first_id + offset * step for offset in range(len(rows))]
+
+def insert_sale_items(cursor, rows):
+    """Insert banyak baris sale_items dalam satu statement multi-row.
+
+    rows berisi tuple (sale_id, product_id, quantity, unit_price, subtotal)
+    """
+    if not rows:
+        return
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    cursor.execute(
+        f"INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, subtotal) VALUES {placeholders}",
+        [value for row in rows for value in row]
+    )
+
+SALE_RETRIES = 3
+
+def sales_committed(sales, quantities):
+    """Perbarui state di memori setelah sale di-commit; tidak pernah raise.
+
+    sales: list (total_amount, {product_id: quantity}, sale_date, customer_id).
+    Sale sudah tersimpan, jadi kegagalan di sini tidak boleh menjadi 500
+    (POS offline akan mengirim ulang dan sale tercatat dobel); state di
+    memori cukup dipaksa reconcile dari database.
+    """
+    try:
+        stock_compactor.ensure_started()
+        for total_amount, sale_quantities, sale_date, customer_id in sales:
+            dashboard_stats.record_sale(total_amount, sale_quantities.items(), sale_date)
+            stock_velocity.record_sale(sale_quantities.items(), sale_date)
+            customer_leaderboard.record_sale(customer_id, total_amount, sale_date)
+        catalog_cache.invalidate(quantities)
+    except Exception as e:
+        print(f"⚠️ In-memory update after sale failed, reconciling from database: {e}")
+        dashboard_stats.invalidate()
+        stock_velocity.invalidate()
+        customer_leaderboard.invalidate()
+        catalog_cache.invalidate()
+
+def write_sale(conn, sale_values, items, quantities):
+    """Tulis satu sale dalam satu transaksi.
+
+    sale_values = (customer_id, total_amount, payment_method, sale_date).
+    Return (sale_id, missing): missing = id produk yang tidak ada (tidak ada yang ditulis).
+    """
+    cursor = conn.cursor()
     try:
-        data = request.get_json()
-        cursor = conn.cursor()
-        
-        # Start transaction
         conn.start_transaction()
-        
-        # Insert sale
-        sale_query = """
-            INSERT INTO sales (customer_id, total_amount, payment_method) 
-            VALUES (%s, %s, %s)
-        """
-        
-        customer_id = data.get('customer_id')
-        if customer_id == '' or customer_id is None:
-            customer_id = None
-            
-        sale_values = (
-            customer_id,
-            float(data.get('total_amount', 0)),
-            data.get('payment_method', 'cash')
-        )
-        
-        cursor.execute(sale_query, sale_values)
+
+        missing = set(quantities) - find_products(cursor, quantities)
+        if missing:
+            conn.rollback()
+            return None, missing
+
+        # Insert sale (sale_date diisi pemanggil agar sama dengan bucket rollup)
+        cursor.execute("""
+            INSERT INTO sales (customer_id, total_amount, payment_method, sale_date) 
+            VALUES (%s, %s, %s, %s)
+        """, sale_values)
         sale_id = cursor.lastrowid
-        
-        # Insert sale items
-        for item in data.get('items', []):
-            item_query = """
-                INSERT INTO sale_items (sale_id, product_id, quantity, unit_price, subtotal) 
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            item_values = (
-                sale_id,
-                item['product_id'],
-                int(item['quantity']),
-                float(item['unit_price']),
-                float(item['subtotal'])
-            )
-            cursor.execute(item_query, item_values)
-            
-            # Update stock di database
-            update_query = "UPDATE products SET stock = stock - %s WHERE id = %s"
-            cursor.execute(update_query, (int(item['quantity']), item['product_id']))
-        
-        # Commit transaction
+
+        # Item urut product_id: cek foreign key mengunci baris products dengan
+        # urutan yang sama seperti update stok & compaction (tidak deadlock)
+        insert_sale_items(cursor, [(sale_id,) + item for item in sorted(items)])
+        user_id = request_user_id()
+        record_movements(cursor, [(product_id, -quantity, 'sale', None, user_id, sale_id)
+                                  for product_id, quantity in sorted(quantities.items())])
+        # Rollup terakhir: baris shard rollup dikunci sesingkat mungkin
+        apply_rollups(cursor, [(sale_values[3], sale_values[1], sale_values[2],
+                                [(product_id, quantity, subtotal)
+                                 for product_id, quantity, _, subtotal in items])])
+        apply_customer_stats(cursor, [(sale_values[0], sale_values[3], sale_values[1])])
         conn.commit()
+        return sale_id, set()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         cursor.close()
-        conn.close()
-        
+
+@app.route('/api/sales', methods=['POST'])
+def create_sale():
+    with db_connection() as conn:
+        if not conn:
+            return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+    
+        try:
+            data = request.get_json()
+
+            items = [
+                (int(item['product_id']), int(item['quantity']),
+                 float(item['unit_price']), float(item['subtotal']))
+                for item in data.get('items', [])
+            ]
+            # Total pengurangan stok per produk (produk bisa muncul dua kali di keranjang)
+            quantities = {}
+            for product_id, quantity, _, _ in items:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+            customer_id = data.get('customer_id')
+            if customer_id == '' or customer_id is None:
+                customer_id = None
+            else:
+                customer_id = int(customer_id)
+            
+            sale_values = (
+                customer_id,
+                float(data.get('total_amount', 0)),
+                data.get('payment_method', 'cash'),
+                datetime.now().replace(microsecond=0)
+            )
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+        for attempt in range(1, SALE_RETRIES + 1):
+            try:
+                sale_id, missing = write_sale(conn, sale_values, items, quantities)
+                break
+            except mysql.connector.Error as e:
+                if e.errno not in RETRYABLE_LOCK_ERRORS or attempt == SALE_RETRIES:
+                    return jsonify({'success': False, 'error': str(e)}), 500
+                time.sleep(0.05 * attempt)
+            except Exception as e:
+                return jsonify({'success': False, 'error': str(e)}), 500
+
+    if missing:
         return jsonify({
-            'success': True,
-            'message': 'Transaksi penjualan berhasil disimpan di database',
-            'data': {'sale_id': sale_id}
-        })
-    except Exception as e:
+            'success': False,
+            'error': f'Product not found: {", ".join(str(i) for i in sorted(missing))}'
+        }), 400
+
+    sales_committed([(sale_values[1], quantities, sale_values[3], customer_id)], quantities)
+
+    return jsonify({
+        'success': True,
+        'message': 'Transaksi penjualan berhasil disimpan di database',
+        'data': {'sale_id': sale_id}
+    })
+
+SALES_BATCH_MAX = 1000
+SALES_BATCH_GROUP_SIZE = 100
+
+def parse_sale_payload(data):
+    """Validasi & normalisasi satu sale dari payload, raise ValueError jika tidak valid"""
+    if not isinstance(data, dict):
+        raise ValueError('Sale harus berupa object')
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError('Sale harus punya minimal satu item')
+
+    parsed_items = []
+    for item in items:
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item['quantity'])
+            unit_price = float(item['unit_price'])
+            subtotal = float(item['subtotal'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Item harus berisi product_id, quantity, unit_price, subtotal yang valid')
+        if quantity <= 0:
+            raise ValueError(f'Quantity produk {product_id} harus lebih dari 0')
+        parsed_items.append((product_id, quantity, unit_price, subtotal))
+
+    customer_id = data.get('customer_id')
+    if customer_id == '':
+        customer_id = None
+    try:
+        total_amount = float(data.get('total_amount', 0))
+        if customer_id is not None:
+            customer_id = int(customer_id)
+    except (TypeError, ValueError):
+        raise ValueError('customer_id atau total_amount tidak valid')
+
+    sale_date = data.get('sale_date')
+    if sale_date:
+        try:
+            sale_date = datetime.fromisoformat(str(sale_date).rstrip('Z'))
+        except ValueError:
+            raise ValueError(f'sale_date "{sale_date}" bukan format ISO')
+    else:
+        sale_date = None
+
+    return {
+        'customer_id': customer_id,
+        'total_amount': total_amount,
+        'payment_method': data.get('payment_method', 'cash'),
+        'sale_date': sale_date,
+        'items': parsed_items
+    }
+
+def insert_sales(cursor, sales):
+    """Insert baris sales, return sale_id sesuai urutan"""
+    rows = [(sale['customer_id'], sale['total_amount'], sale['payment_method'], sale['sale_date'])
+            for sale in sales]
+    return insert_returning_ids(
+        cursor, "INSERT INTO sales (customer_id, total_amount, payment_method, sale_date) VALUES ", rows
+    )
+
+def insert_sales_group(conn, group):
+    """Transaksi satu kelompok sale. Return (results sale yang ditolak, written, quantities)"""
+    cursor = conn.cursor()
+    results = {}
+    now = datetime.now().replace(microsecond=0)
+    user_id = request_user_id()
+    try:
+        conn.start_transaction()
+
+        product_ids = {item[0] for _, sale in group for item in sale['items']}
+        found = find_products(cursor, product_ids)
+        # Pelanggan dicek di sini: foreign key yang gagal saat insert akan
+        # membatalkan seluruh kelompok, bukan hanya sale yang salah
+        customers = find_customers(cursor, {sale['customer_id'] for _, sale in group
+                                            if sale['customer_id'] is not None})
+
+        accepted = []
+        for index, sale in group:
+            missing = {item[0] for item in sale['items']} - found
+            if missing:
+                error = f'Product not found: {", ".join(str(i) for i in sorted(missing))}'
+            elif sale['customer_id'] is not None and sale['customer_id'] not in customers:
+                error = f'Customer not found: {sale["customer_id"]}'
+            else:
+                sale['sale_date'] = sale['sale_date'] or now
+                accepted.append((index, sale))
+                continue
+            results[index] = {'index': index, 'success': False, 'error': error}
+
+        sale_ids = insert_sales(cursor, [sale for _, sale in accepted])
+
+        item_rows = []
+        quantities = {}
+        stock_rows = []
+        written = []
+        for (index, sale), sale_id in zip(accepted, sale_ids):
+            sale_quantities = {}
+            for product_id, quantity, unit_price, subtotal in sale['items']:
+                item_rows.append((sale_id, product_id, quantity, unit_price, subtotal))
+                sale_quantities[product_id] = sale_quantities.get(product_id, 0) + quantity
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+            stock_rows += [(product_id, -quantity, 'sale', None, user_id, sale_id)
+                           for product_id, quantity in sorted(sale_quantities.items())]
+            written.append((index, sale, sale_id))
+
+        # Urut product_id seperti create_sale (urutan lock products lewat foreign key)
+        insert_sale_items(cursor, sorted(item_rows, key=lambda row: (row[1], row[0])))
+        record_movements(cursor, stock_rows)
+        apply_rollups(cursor, [
+            (sale['sale_date'], sale['total_amount'], sale['payment_method'],
+             [(product_id, quantity, subtotal) for product_id, quantity, _, subtotal in sale['items']])
+            for _, sale, _ in written
+        ])
+        apply_customer_stats(cursor, [
+            (sale['customer_id'], sale['sale_date'], sale['total_amount']) for _, sale, _ in written
+        ])
+        conn.commit()
+        return results, written, quantities
+    except Exception:
         conn.rollback()
-        return jsonify({'success': False, 'error': str(e)}), 500
+        raise
+    finally:
+        cursor.close()
+
+def write_sales_group(conn, group):
+    """Tulis satu kelompok sale dalam satu transaksi (diulang jika deadlock).
+
+    group berisi (index, sale) hasil parse_sale_payload. Return dict index -> hasil.
+    """
+    for attempt in range(1, SALE_RETRIES + 1):
+        try:
+            results, written, quantities = insert_sales_group(conn, group)
+            break
+        except mysql.connector.Error as e:
+            if e.errno not in RETRYABLE_LOCK_ERRORS or attempt == SALE_RETRIES:
+                return {index: {'index': index, 'success': False, 'error': str(e)} for index, _ in group}
+            time.sleep(0.05 * attempt)
+        except Exception as e:
+            return {index: {'index': index, 'success': False, 'error': str(e)} for index, _ in group}
+
+    committed = []
+    for index, sale, sale_id in written:
+        sale_quantities = {}
+        for product_id, quantity, _, _ in sale['items']:
+            sale_quantities[product_id] = sale_quantities.get(product_id, 0) + quantity
+        committed.append((sale['total_amount'], sale_quantities, sale['sale_date'], sale['customer_id']))
+        results[index] = {'index': index, 'success': True, 'sale_id': sale_id}
+    if committed:
+        sales_committed(committed, quantities)
+    return results
+
+@app.route('/api/sales/batch', methods=['POST'])
+def create_sales_batch():
+    """Sinkron banyak sale sekaligus (antrian offline POS).
+
+    Body: {"sales": [ {customer_id, total_amount, payment_method, sale_date?, items: [...]}, ... ]}
+    Setiap sale dilaporkan berhasil/gagal sendiri-sendiri sesuai urutan di payload.
+    """
+    data = request.get_json(silent=True) or {}
+    sales = data.get('sales')
+    if not isinstance(sales, list) or not sales:
+        return jsonify({'success': False, 'error': 'Field "sales" harus berisi list sale'}), 400
+    if len(sales) > SALES_BATCH_MAX:
+        return jsonify({'success': False, 'error': f'Maksimal {SALES_BATCH_MAX} sale per batch'}), 400
+
+    # Validasi semua sale dulu sebelum menyentuh database
+    results = {}
+    valid = []
+    for index, raw in enumerate(sales):
+        try:
+            valid.append((index, parse_sale_payload(raw)))
+        except ValueError as e:
+            results[index] = {'index': index, 'success': False, 'error': str(e)}
+
+    if valid:
+        with db_connection() as conn:
+            if not conn:
+                return jsonify({'success': False, 'error': 'Database connection failed'}), 500
+            for start in range(0, len(valid), SALES_BATCH_GROUP_SIZE):
+                results.update(write_sales_group(conn, valid[start:start + SALES_BATCH_GROUP_SIZE]))
+
+    ordered = [results[index] for index in range(len(sales))]
+    created = sum(1 for result in ordered if result['success'])
+    return jsonify({
+        'success': created == len(sales),
+        'message': f'{created} dari {len(sales)} transaksi berhasil disimpan',
+        'data': ordered
+    })
+
+@app.after_request
+def compress_large_response(response):
+    """Kompres respon JSON/CSV/NDJSON besar sesuai Accept-Encoding"""
+    return compress_response(response, choose_encoding(request.accept_encodings))
+
+@app.errorhandler(SchemaOutdated)
+def schema_outdated(error):
+    return jsonify({'success': False, 'error': str(error)}), 503
 
 # Error handlers untuk handle 404
 @app.errorhandler(404)
@@ -877,6 +2226,21 @@ def internal_error(error):
 
 if __name__ == '__main__':
     print("🚀 Bakery System - MySQL Connected")
+    # Langsung dari pool: db_connection() menolak schema yang belum dimigrasi
+    try:
+        conn = db_pool.acquire()
+    except PoolError as e:
+        print(f"❌ Database error: {e}")
+    else:
+        try:
+            migrate(conn)
+        finally:
+            db_pool.release(conn)
+    try:
+        search_index.rebuild()
+        print(f"🔎 Search index ready: {search_index.stats()}")
+    except Exception as e:
+        print(f"⚠️ Search index will be built on first search: {e}")
     print("📊 Database: bakery_system")
     print("🌐 API: http://localhost:5000")
     print("🔐 AUTH Endpoints:")
@@ -886,11 +2250,19 @@ if __name__ == '__main__':
     print("   GET  /api/auth/check")
     print("✅ All endpoints ready:")
     print("   GET  /api/health")
+    print("   GET  /api/metrics")
+    print("   GET  /api/events")
+    print("   GET  /api/admin/slow-queries")
     print("   GET  /api/dashboard")
     print("   GET  /api/products")
     print("   POST /api/products")
+    print("   GET  /api/products/<id>/stock-movements")
     print("   GET  /api/customers")
     print("   POST /api/customers")
+    print("   GET  /api/search")
     print("   GET  /api/sales")
     print("   POST /api/sales")
+    print("   GET  /api/reports/revenue")
+    print("   GET  /api/reports/products")
+    print("   GET  /api/reports/payment-methods")
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""Generator data toko roti yang deterministik (seeded) untuk benchmark.
+
+Semua fungsi menghasilkan tuple siap insert sesuai kolom tabel di
+migrations.py, dengan seed yang sama selalu menghasilkan data yang sama.
+"""
+import random
+from datetime import datetime, timedelta
+
+BASE_PRODUCTS = [
+    ('Roti Tawar', 'Roti', 15000), ('Roti Gandum', 'Roti', 22000),
+    ('Roti Manis Coklat', 'Roti', 8000), ('Roti Manis Keju', 'Roti', 9000),
+    ('Roti Sobek', 'Roti', 18000), ('Roti Abon', 'Roti', 10000),
+    ('Croissant', 'Pastry', 14000), ('Pain au Chocolat', 'Pastry', 17000),
+    ('Danish Blueberry', 'Pastry', 16000), ('Cheese Stick', 'Pastry', 12000),
+    ('Donat Gula', 'Donat', 6000), ('Donat Coklat', 'Donat', 7000),
+    ('Bolu Pandan', 'Kue', 45000), ('Brownies Panggang', 'Kue', 55000),
+    ('Lapis Legit', 'Kue', 150000), ('Black Forest', 'Kue', 180000),
+    ('Cheesecake', 'Kue', 160000), ('Kue Sus', 'Kue', 5000),
+    ('Kopi Susu', 'Minuman', 18000), ('Teh Manis', 'Minuman', 8000),
+]
+VARIANTS = ['', ' Mini', ' Jumbo', ' Spesial', ' Premium', ' Isi 6', ' Isi 12']
+FIRST_NAMES = ['Andi', 'Budi', 'Citra', 'Dewi', 'Eko', 'Fitri', 'Gilang', 'Hana', 'Indra',
+               'Joko', 'Kartika', 'Lestari', 'Made', 'Nur', 'Putri', 'Rizky', 'Sari',
+               'Taufik', 'Wulan', 'Yusuf']
+LAST_NAMES = ['Saputra', 'Wijaya', 'Santoso', 'Lestari', 'Pratama', 'Hidayat', 'Kusuma',
+              'Nugroho', 'Siregar', 'Harahap', 'Simanjuntak', 'Wibowo']
+PAYMENT_METHODS = ['cash'] * 6 + ['qris'] * 3 + ['debit', 'transfer']
+# Jam ramai: pagi & makan siang
+OPENING_HOURS = [7, 7, 8, 8, 8, 9, 10, 11, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 20]
+
+
+def generate_products(rng, count, now):
+    products = []
+    for index in range(count):
+        name, category, price = BASE_PRODUCTS[index % len(BASE_PRODUCTS)]
+        variant = VARIANTS[(index // len(BASE_PRODUCTS)) % len(VARIANTS)]
+        batch = index // (len(BASE_PRODUCTS) * len(VARIANTS))
+        full_name = f"{name}{variant}" + (f" #{batch + 1}" if batch else '')
+        created = now - timedelta(days=rng.randint(30, 900))
+        products.append((
+            index + 1,
+            full_name,
+            f"{full_name} segar dari oven",
+            round(price * rng.uniform(0.8, 1.5), -2),
+            rng.choice([0, 3, 8] + [rng.randint(10, 300)] * 7),
+            category,
+            '',
+            created,
+            created,
+        ))
+    return products
+
+
+def generate_customers(rng, count, now):
+    customers = []
+    for index in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        customers.append((
+            index + 1,
+            f"{first} {last}",
+            f"{first.lower()}.{last.lower()}{index}@example.com",
+            f"08{rng.randint(1000000000, 9999999999)}",
+            f"Jl. {rng.choice(LAST_NAMES)} No. {rng.randint(1, 200)}",
+            now - timedelta(days=rng.randint(0, 700)),
+        ))
+    return customers
+
+
+def generate_sales(rng, count, products, customer_count, now, days=365):
+    """Return (sales, sale_items); laris-tidaknya produk mengikuti distribusi miring"""
+    weights = [1.0 / (rank + 1) for rank in range(len(products))]
+    sales = []
+    items = []
+    item_id = 1
+    start = now - timedelta(days=days)
+    for index in range(count):
+        day = start + timedelta(days=days * index / max(count, 1))
+        sale_date = day.replace(hour=rng.choice(OPENING_HOURS), minute=rng.randint(0, 59),
+                                second=rng.randint(0, 59), microsecond=0)
+        sale_id = index + 1
+        basket = rng.choices(products, weights=weights, k=rng.randint(1, 6))
+        total = 0.0
+        for product in basket:
+            quantity = rng.randint(1, 5)
+            subtotal = product[3] * quantity
+            total += subtotal
+            items.append((item_id, sale_id, product[0], quantity, product[3], subtotal))
+            item_id += 1
+        customer_id = rng.randint(1, customer_count) if customer_count and rng.random() < 0.4 else None
+        sales.append((sale_id, customer_id, total, rng.choice(PAYMENT_METHODS), sale_date))
+    return sales, items
+
+
+def generate(seed=42, products=500, customers=2000, sales=20000, now=None):
+    """Semua data benchmark: dict nama tabel -> list tuple"""
+    rng = random.Random(seed)
+    now = (now or datetime.now()).replace(microsecond=0)
+    product_rows = generate_products(rng, products, now)
+    sale_rows, item_rows = generate_sales(rng, sales, product_rows, customers, now)
+    return {
+        'products': product_rows,
+        'customers': generate_customers(rng, customers, now),
+        'sales': sale_rows,
+        'sale_items': item_rows,
+    }
+
+
+COLUMNS = {
+    'products': ('id', 'name', 'description', 'price', 'stock', 'category', 'image_url',
+                 'created_at', 'updated_at'),
+    'customers': ('id', 'name', 'email', 'phone', 'address', 'created_at'),
+    'sales': ('id', 'customer_id', 'total_amount', 'payment_method', 'sale_date'),
+    'sale_items': ('id', 'sale_id', 'product_id', 'quantity', 'unit_price', 'subtotal'),
+}
+
+
+def seed_statements(data):
+    """(sql dengan %s, baris atau None) untuk mengisi database kosong dengan data generate().
+
+    Selain tabel dasar juga rollup, agregat pelanggan dan saldo awal ledger
+    stok, sama seperti isi database yang sudah dimigrasi dan berjalan.
+    """
+    from customer_stats import aggregate as aggregate_customers
+    from rollups import ROLLUP_COLUMNS, aggregate, rollup_rows
+
+    statements = []
+    for table in ('products', 'customers', 'sales', 'sale_items'):
+        columns = COLUMNS[table]
+        statements.append((f"INSERT INTO {table} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join(['%s'] * len(columns))})", data[table]))
+
+    items = {}
+    for _, sale_id, product_id, quantity, _, subtotal in data['sale_items']:
+        items.setdefault(sale_id, []).append((product_id, quantity, subtotal))
+    sales = [(sale_date, total, method, items.get(sale_id, []))
+             for sale_id, _, total, method, sale_date in data['sales']]
+    for table, rows in aggregate(sales).items():
+        keys, values = ROLLUP_COLUMNS[table]
+        columns = keys + values
+        statements.append((f"INSERT INTO {table} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join(['%s'] * len(columns))})", rollup_rows(rows)))
+
+    lifetime, daily = aggregate_customers(
+        (customer_id, sale_date, total) for _, customer_id, total, _, sale_date in data['sales'])
+    statements.append((
+        "INSERT INTO customer_stats (customer_id, sale_count, total_spent, first_purchase, last_purchase) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        [(customer_id,) + tuple(row) for customer_id, row in lifetime.items()]
+    ))
+    statements.append((
+        "INSERT INTO customer_sales_daily (day, customer_id, sale_count, revenue) VALUES (%s, %s, %s, %s)",
+        [key + tuple(row) for key, row in daily.items()]
+    ))
+    statements.append((
+        "INSERT INTO stock_movements (product_id, quantity, kind, reason) "
+        "SELECT id, stock, 'opening', 'Saldo awal ledger stok' FROM products",
+        None
+    ))
+    return statements
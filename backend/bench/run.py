@@ -0,0 +1,425 @@
+"""Benchmark backend Bakery System.
+
+Mengisi database dengan data toko roti yang seeded (bench/datagen.py), lalu
+menjalankan setiap route lewat Flask test client: dulu satu per satu
+(latensi murni), lalu beban campuran dari beberapa thread sekaligus.
+Hasil disimpan sebagai JSON supaya bisa dibandingkan antar commit.
+
+    python bench/run.py                                  # SQLite stand-in
+    python bench/run.py --mysql --database bakery_bench  # MySQL lokal
+    python bench/run.py --products 2000 --sales 100000 --threads 16
+    python bench/run.py --compare bench/results/a.json bench/results/b.json
+
+Jalankan dari folder backend/.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from bench import datagen  # noqa: E402
+
+BENCH_USER = ('Bench Kasir', 'bench@example.com', 'bench-password')
+# Ketikan typeahead: prefix produk & pelanggan dari datagen
+SEARCH_TERMS = ['ro', 'roti', 'roti co', 'kue', 'bro', 'spesial', 'and', 'budi sa', '0812']
+
+
+# Persiapan database
+
+def setup_sqlite(data):
+    from bench import sqlite_standin
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bakery-bench-'), 'bench.db')
+    sqlite_standin.create_database(path, data)
+    return lambda: sqlite_standin.StandInConnection(path)
+
+
+def setup_mysql(data, database, force=False):
+    import mysql.connector
+    from app import get_db_config
+    from migrations import migrate
+
+    if database == get_db_config()['database'] and not force:
+        sys.exit(f"Refusing to wipe '{database}'; use a separate --database or pass --force")
+
+    config = dict(get_db_config(), database=database)
+    server = {key: value for key, value in config.items() if key != 'database'}
+    conn = mysql.connector.connect(**server)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+    cursor.close()
+    conn.close()
+
+    conn = mysql.connector.connect(**config)
+    migrate(conn)
+    cursor = conn.cursor()
+    # Kosongkan semua tabel (ledger, rollup, agregat ikut) kecuali versi schema
+    cursor.execute("SHOW FULL TABLES WHERE Table_type = 'BASE TABLE'")
+    tables = [row[0] for row in cursor.fetchall() if row[0] != 'schema_migrations']
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in tables:
+        cursor.execute(f"TRUNCATE TABLE `{table}`")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    for query, rows in datagen.seed_statements(data):
+        if rows is None:
+            cursor.execute(query)
+            continue
+        for start in range(0, len(rows), 1000):
+            cursor.executemany(query, rows[start:start + 1000])
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return lambda: mysql.connector.connect(**config)
+
+
+def prepare_app(connect):
+    """Arahkan app ke database benchmark dan buat user untuk login"""
+    import app as bakery
+    from catalog_cache import CatalogCache
+    from customer_stats import CustomerLeaderboard
+    from dashboard_stats import DashboardStats
+    from db_pool import ConnectionPool
+    from db_router import DatabaseRouter
+    from search_index import SearchService
+    from stock_ledger import StockCompactor
+    from stock_velocity import StockVelocity
+
+    bakery.db_pool = ConnectionPool({}, connect=connect, **bakery.get_pool_config())
+    bakery.db_router = DatabaseRouter(bakery.db_pool)
+    bakery.dashboard_stats = DashboardStats(bakery.db_connection, listener=bakery.event_hub.publish)
+    bakery.customer_leaderboard = CustomerLeaderboard(bakery.db_connection)
+    bakery.stock_velocity = StockVelocity(bakery.db_connection)
+    bakery.search_index = SearchService(bakery.db_connection)
+    bakery.stock_compactor = StockCompactor(bakery.db_connection, interval=bakery.stock_compactor.interval)
+    bakery.catalog_cache = CatalogCache(ttl=bakery.catalog_cache.ttl)
+    bakery.token_cache.clear()
+
+    name, email, password = BENCH_USER
+    with bakery.db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM users WHERE email = %s", (email,))
+        cursor.execute(
+            "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)",
+            (name, email, bakery.hash_password(password), 'admin')
+        )
+        conn.commit()
+        cursor.close()
+    # Seperti startup app: index dibangun sebelum request pertama
+    bakery.search_index.rebuild()
+    return bakery.app
+
+
+# Skenario
+
+def build_scenarios(data):
+    """(nama, bobot beban campuran, fungsi(client, rng) -> response)"""
+    from flask import Response
+
+    products = data['products']
+    product_ids = [product[0] for product in products]
+    customer_ids = [customer[0] for customer in data['customers']]
+    _, email, password = BENCH_USER
+    serial = itertools.count(1)
+    tokens = []
+
+    def auth(client):
+        # Login sekali (bcrypt mahal), token dipakai ulang semua thread
+        if not tokens:
+            response = client.post('/api/auth/login', json={'email': email, 'password': password})
+            tokens.append(response.get_json()['data']['token'])
+        return {'Authorization': f'Bearer {tokens[0]}'}
+
+    def logout(client, rng):
+        # Token baru tiap panggilan supaya token bersama di atas tidak ikut dicabut
+        import app as bakery
+        user = client.get('/api/auth/me', headers=auth(client)).get_json()['data']
+        token = bakery.generate_token(user)
+        return client.post('/api/auth/logout', headers={'Authorization': f'Bearer {token}'})
+
+    def basket(rng):
+        items = []
+        for product in rng.sample(products, rng.randint(1, 4)):
+            quantity = rng.randint(1, 3)
+            items.append({
+                'product_id': product[0],
+                'quantity': quantity,
+                'unit_price': product[3],
+                'subtotal': product[3] * quantity
+            })
+        return {
+            'customer_id': rng.choice(customer_ids) if rng.random() < 0.3 else None,
+            'total_amount': sum(item['subtotal'] for item in items),
+            'payment_method': rng.choice(datagen.PAYMENT_METHODS),
+            'items': items
+        }
+
+    def new_product(rng):
+        name = f"Bench Roti {next(serial)}"
+        return {'name': name, 'description': f"{name} segar dari oven", 'category': 'Roti',
+                'price': rng.randint(5, 60) * 1000, 'stock': rng.randint(0, 100)}
+
+    def new_customer(rng):
+        number = next(serial)
+        return {'name': f"Pelanggan Bench {number}", 'email': f"pelanggan{number}@example.com",
+                'phone': f"0812{rng.randint(10000000, 99999999)}", 'address': 'Jl. Bench'}
+
+    def events(client, rng):
+        # Stream SSE tidak pernah selesai: baca frame awal lalu tutup koneksinya
+        response = client.get('/api/events')
+        frames = list(itertools.islice(response.response, 2))
+        response.close()
+        return Response(b''.join(frames), status=response.status_code)
+
+    return [
+        ('GET /api/health', 1, lambda c, r: c.get('/api/health')),
+        ('GET /api/metrics', 1, lambda c, r: c.get('/api/metrics')),
+        ('GET /api/events', 1, events),
+        ('GET /api/dashboard', 15, lambda c, r: c.get('/api/dashboard')),
+        ('GET /api/dashboard/stats', 5, lambda c, r: c.get('/api/dashboard/stats')),
+        ('GET /api/products', 20, lambda c, r: c.get('/api/products')),
+        ('GET /api/products/<id>', 10, lambda c, r: c.get(f'/api/products/{r.choice(product_ids)}')),
+        ('GET /api/products/<id>/stock-movements', 2,
+         lambda c, r: c.get(f'/api/products/{r.choice(product_ids)}/stock-movements')),
+        ('GET /api/products/low-stock', 3, lambda c, r: c.get('/api/products/low-stock')),
+        ('GET /api/products/reorder-suggestions', 2,
+         lambda c, r: c.get('/api/products/reorder-suggestions')),
+        ('GET /api/search', 5, lambda c, r: c.get(f'/api/search?q={r.choice(SEARCH_TERMS)}')),
+        ('GET /api/customers', 5, lambda c, r: c.get('/api/customers')),
+        ('GET /api/customers/report', 2, lambda c, r: c.get('/api/customers/report')),
+        ('GET /api/sales', 5, lambda c, r: c.get('/api/sales?limit=100')),
+        ('GET /api/reports/revenue', 2, lambda c, r: c.get('/api/reports/revenue?granularity=month')),
+        ('GET /api/reports/products', 1, lambda c, r: c.get('/api/reports/products?limit=10')),
+        ('GET /api/reports/payment-methods', 1, lambda c, r: c.get('/api/reports/payment-methods')),
+        ('GET /api/sales/export', 0, lambda c, r: c.get('/api/sales/export?format=ndjson')),
+        ('GET /api/auth/me', 2, lambda c, r: c.get('/api/auth/me', headers=auth(c))),
+        ('GET /api/admin/slow-queries', 0, lambda c, r: c.get('/api/admin/slow-queries', headers=auth(c))),
+        ('POST /api/sales', 10, lambda c, r: c.post('/api/sales', json=basket(r))),
+        ('POST /api/sales/batch', 2, lambda c, r: c.post('/api/sales/batch', json={
+            'sales': [basket(r) for _ in range(r.randint(2, 10))]})),
+        ('POST /api/products/update-stock', 3, lambda c, r: c.post('/api/products/update-stock', json={
+            'product_id': r.choice(product_ids), 'stock_change': r.randint(-5, 20)})),
+        ('POST /api/products/update-stock/batch', 2,
+         lambda c, r: c.post('/api/products/update-stock/batch', json={'adjustments': [
+             {'product_id': product_id, 'stock_change': r.randint(-5, 24)}
+             for product_id in r.sample(product_ids, min(len(product_ids), 5))]})),
+        ('POST /api/products', 1, lambda c, r: c.post('/api/products', json=new_product(r))),
+        ('PUT /api/products/<id>', 2, lambda c, r: c.put(f'/api/products/{r.choice(product_ids)}', json={
+            'price': r.randint(5, 60) * 1000, 'stock': r.randint(0, 200)})),
+        ('POST /api/products/import', 1, lambda c, r: c.post('/api/products/import', json=[
+            {'id': product_id, 'price': r.randint(5, 60) * 1000}
+            for product_id in r.sample(product_ids, min(len(product_ids), 20))
+        ] + [new_product(r) for _ in range(5)])),
+        ('POST /api/customers', 2, lambda c, r: c.post('/api/customers', json=new_customer(r))),
+        ('POST /api/auth/register', 0, lambda c, r: c.post('/api/auth/register', json={
+            'name': 'Bench Kasir', 'email': f"kasir{next(serial)}@example.com", 'password': 'bench-password'})),
+        ('POST /api/auth/login', 1, lambda c, r: c.post('/api/auth/login', json={
+            'email': email, 'password': password})),
+        ('POST /api/auth/logout', 1, logout),
+    ]
+
+
+# Pengukuran
+
+def summarize(latencies, errors, elapsed=None):
+    result = {'count': len(latencies), 'errors': errors}
+    if latencies:
+        ordered = sorted(latencies)
+        result.update({
+            'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+            'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+            'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+            'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+            'max_ms': round(ordered[-1] * 1000, 3),
+        })
+    if elapsed:
+        result['rps'] = round(len(latencies) / elapsed, 1)
+    return result
+
+
+def percentile(ordered, pct):
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def timed_call(fn, client, rng):
+    start = time.perf_counter()
+    response = fn(client, rng)
+    response.get_data()  # Habiskan body streaming juga
+    elapsed = time.perf_counter() - start
+    response.close()
+    return elapsed, response.status_code < 400
+
+
+def run_sequential(app, scenarios, iterations, seed):
+    client = app.test_client()
+    rng = random.Random(seed)
+    results = {}
+    for name, _, fn in scenarios:
+        slow = ('export', 'login', 'register', 'import')
+        count = max(iterations // 10, 1) if any(word in name for word in slow) else iterations
+        for _ in range(min(3, count)):
+            timed_call(fn, client, rng)  # Pemanasan (cache, pool)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(count):
+            elapsed, ok = timed_call(fn, client, rng)
+            latencies.append(elapsed)
+            errors += not ok
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+        print(f"  {name:<34} p50 {results[name].get('p50_ms', 0):>9.3f} ms")
+    return results
+
+
+def run_concurrent(app, scenarios, threads, duration, seed):
+    weighted = [(name, weight, fn) for name, weight, fn in scenarios if weight > 0]
+    names = [name for name, _, _ in weighted]
+    weights = [weight for _, weight, _ in weighted]
+    functions = {name: fn for name, _, fn in weighted}
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        client = app.test_client()
+        rng = random.Random(seed * 1000 + index)
+        local = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=weights)[0]
+            elapsed, ok = timed_call(functions[name], client, rng)
+            local.append((name, elapsed, ok))
+        with lock:
+            for name, elapsed, ok in local:
+                latencies[name].append(elapsed)
+                errors[name] += not ok
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {name: summarize(latencies[name], errors[name], elapsed) for name in names}
+    total = sum(len(values) for values in latencies.values())
+    results['__total__'] = {'count': total, 'rps': round(total / elapsed, 1),
+                            'errors': sum(errors.values())}
+    return results
+
+
+# Perbandingan
+
+def compare(old_path, new_path):
+    with open(old_path) as handle:
+        old = json.load(handle)
+    with open(new_path) as handle:
+        new = json.load(handle)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    for phase in ('sequential', 'concurrent'):
+        print(f"\n[{phase}]")
+        print(f"{'endpoint':<34} {'p50 ms':>20} {'p99 ms':>20} {'rps':>18}")
+        for name, after in new.get(phase, {}).items():
+            before = old.get(phase, {}).get(name)
+            if not before:
+                continue
+            print(f"{name:<34} {_delta(before, after, 'p50_ms'):>20} "
+                  f"{_delta(before, after, 'p99_ms'):>20} {_delta(before, after, 'rps'):>18}")
+
+
+def _delta(before, after, key):
+    if key not in before or key not in after:
+        return '-'
+    if not before[key]:
+        return f"{after[key]}"
+    change = (after[key] - before[key]) / before[key] * 100
+    return f"{after[key]} ({change:+.0f}%)"
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark backend Bakery System')
+    parser.add_argument('--mysql', action='store_true', help='pakai MySQL lokal, bukan SQLite stand-in')
+    parser.add_argument('--database', default='bakery_bench', help='nama database MySQL benchmark')
+    parser.add_argument('--force', action='store_true', help='izinkan menghapus isi database utama')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--sales', type=int, default=20000)
+    parser.add_argument('--iterations', type=int, default=200, help='request per route (fase sekuensial)')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=15.0, help='detik beban campuran')
+    parser.add_argument('--output', help='file JSON hasil (default bench/results/<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    print(f"🍞 Generating data (seed={args.seed})")
+    data = datagen.generate(args.seed, args.products, args.customers, args.sales)
+    if args.mysql:
+        connect = setup_mysql(data, args.database, args.force)
+    else:
+        connect = setup_sqlite(data)
+    app = prepare_app(connect)
+    scenarios = build_scenarios(data)
+
+    print("⏱️  Sequential")
+    sequential = run_sequential(app, scenarios, args.iterations, args.seed)
+    print(f"⏱️  Concurrent ({args.threads} threads, {args.duration:.0f}s)")
+    concurrent = run_concurrent(app, scenarios, args.threads, args.duration, args.seed)
+    print(f"  total {concurrent['__total__']['rps']} req/s, {concurrent['__total__']['errors']} errors")
+
+    commit = git_commit()
+    result = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'backend': 'mysql' if args.mysql else 'sqlite',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'sizes': {'products': args.products, 'customers': args.customers, 'sales': args.sales},
+            'iterations': args.iterations,
+            'threads': args.threads,
+            'duration': args.duration,
+        },
+        'sequential': sequential,
+        'concurrent': concurrent,
+    }
+    output = args.output or os.path.join(BACKEND_DIR, 'bench', 'results', f'{commit}.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as handle:
+        json.dump(result, handle, indent=2)
+    print(f"✅ Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""Pengganti MySQL berbasis SQLite untuk benchmark tanpa server database.
+
+Menyediakan koneksi dengan API yang dipakai app.py dari mysql.connector
+(cursor(dictionary=...), start_transaction, in_transaction, ping, ...) dan
+menerjemahkan dialek MySQL yang dipakai route (%s, NOW(), FOR UPDATE,
+ON DUPLICATE KEY UPDATE). Angka absolutnya tentu berbeda dari MySQL; gunanya
+untuk membandingkan commit dengan commit pada mesin yang sama.
+"""
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'kasir',
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    price DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    stock INTEGER NOT NULL DEFAULT 0,
+    category TEXT,
+    image_url TEXT,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+    updated_at DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT,
+    phone TEXT,
+    address TEXT,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id INTEGER REFERENCES customers (id),
+    total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    payment_method TEXT NOT NULL DEFAULT 'cash',
+    sale_date DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE TABLE IF NOT EXISTS sale_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sale_id INTEGER NOT NULL REFERENCES sales (id),
+    product_id INTEGER NOT NULL REFERENCES products (id),
+    quantity INTEGER NOT NULL,
+    unit_price DECIMAL(12, 2) NOT NULL,
+    subtotal DECIMAL(12, 2) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sales_hourly (
+    bucket DATETIME NOT NULL,
+    shard INTEGER NOT NULL DEFAULT 0,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, shard)
+);
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day DATE NOT NULL,
+    shard INTEGER NOT NULL DEFAULT 0,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    items_sold INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, shard)
+);
+CREATE TABLE IF NOT EXISTS sales_monthly (
+    month DATE NOT NULL,
+    shard INTEGER NOT NULL DEFAULT 0,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    items_sold INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, shard)
+);
+CREATE TABLE IF NOT EXISTS product_sales_daily (
+    day DATE NOT NULL,
+    product_id INTEGER NOT NULL,
+    shard INTEGER NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id, shard)
+);
+CREATE TABLE IF NOT EXISTS payment_method_daily (
+    day DATE NOT NULL,
+    payment_method TEXT NOT NULL,
+    shard INTEGER NOT NULL DEFAULT 0,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, payment_method, shard)
+);
+CREATE TABLE IF NOT EXISTS customer_stats (
+    customer_id INTEGER NOT NULL PRIMARY KEY,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    total_spent DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    first_purchase DATETIME NOT NULL,
+    last_purchase DATETIME NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customer_sales_daily (
+    day DATE NOT NULL,
+    customer_id INTEGER NOT NULL,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, customer_id)
+);
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    reason TEXT,
+    user_id INTEGER,
+    sale_id INTEGER,
+    created_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE TABLE IF NOT EXISTS stock_deltas (
+    product_id INTEGER NOT NULL,
+    shard INTEGER NOT NULL,
+    delta INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (product_id, shard)
+);
+CREATE VIEW IF NOT EXISTS products_current AS
+SELECT p.id, p.name, p.description, p.price,
+       p.stock + COALESCE((SELECT SUM(d.delta) FROM stock_deltas d WHERE d.product_id = p.id), 0) AS stock,
+       p.category, p.image_url, p.created_at, p.updated_at
+FROM products p;
+CREATE TABLE IF NOT EXISTS token_revocations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    token_digest TEXT NULL,
+    user_id INTEGER NULL,
+    revoked_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_product ON stock_movements (product_id, id);
+CREATE INDEX IF NOT EXISTS idx_token_revocations_digest ON token_revocations (token_digest);
+CREATE INDEX IF NOT EXISTS idx_token_revocations_user ON token_revocations (user_id, revoked_at);
+CREATE INDEX IF NOT EXISTS idx_token_revocations_expires ON token_revocations (expires_at);
+CREATE INDEX IF NOT EXISTS idx_sales_date_id ON sales (sale_date, id);
+CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales (customer_id);
+CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items (sale_id);
+CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items (product_id);
+CREATE INDEX IF NOT EXISTS idx_products_stock ON products (stock);
+CREATE INDEX IF NOT EXISTS idx_customers_created ON customers (created_at);
+CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name);
+CREATE INDEX IF NOT EXISTS idx_product_sales_daily_product ON product_sales_daily (product_id, day);
+"""
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter('DATETIME', lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter('DECIMAL', lambda raw: Decimal(raw.decode()))
+
+_FOR_UPDATE = re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r'ON\s+DUPLICATE\s+KEY\s+UPDATE', re.IGNORECASE)
+_VALUES_FN = re.compile(r'VALUES\((\w+)\)', re.IGNORECASE)
+
+
+def translate(sql):
+    """Terjemahkan SQL dialek MySQL yang dipakai app.py ke SQLite"""
+    sql = _FOR_UPDATE.sub('', sql)
+    # Waktu lokal seperti NOW()/CURDATE() di MySQL (CURRENT_TIMESTAMP SQLite = UTC)
+    sql = sql.replace('NOW()', "datetime('now', 'localtime')").replace('CURDATE()', "date('now', 'localtime')")
+    sql = sql.replace('LEAST(', 'MIN(').replace('GREATEST(', 'MAX(')
+    # Rowid SQLite berurutan dalam satu statement, setara autoinc_lock_mode 1
+    sql = sql.replace('@@innodb_autoinc_lock_mode', '1').replace('@@auto_increment_increment', '1')
+    match = _ON_DUPLICATE.search(sql)
+    if match:
+        head, tail = sql[:match.start()], sql[match.end():]
+        sql = head + 'ON CONFLICT DO UPDATE SET' + _VALUES_FN.sub(r'excluded.\1', tail)
+    return sql.replace('%s', '?')
+
+
+class StandInCursor:
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection._conn.cursor()
+        self._dictionary = dictionary
+        self._multi_row_insert = False
+
+    @property
+    def lastrowid(self):
+        # MySQL: id baris pertama dari INSERT multi-row (SQLite: baris terakhir)
+        lastrowid = self._cursor.lastrowid
+        if self._multi_row_insert and lastrowid:
+            return lastrowid - self._cursor.rowcount + 1
+        return lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(translate(sql), tuple(params or ()))
+        self._multi_row_insert = sql.lstrip()[:6].upper() == 'INSERT' and self._cursor.rowcount > 1
+
+    def executemany(self, sql, seq_params):
+        self._cursor.executemany(translate(sql), [tuple(params) for params in seq_params])
+
+    def _wrap(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._wrap(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._wrap(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._wrap(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._wrap(row) for row in self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    unread_result = False
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                     isolation_level=None, check_same_thread=False,
+                                     timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+
+    def cursor(self, dictionary=False, buffered=None):
+        return StandInCursor(self, dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def start_transaction(self, isolation_level=None):
+        # IMMEDIATE: ambil write lock di awal, mirip efek FOR UPDATE
+        self._conn.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute('COMMIT')
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute('ROLLBACK')
+
+    def ping(self, reconnect=False):
+        self._conn.execute('SELECT 1')
+
+    def close(self):
+        self._conn.close()
+
+
+def create_database(path, data):
+    """Buat schema dan isi data hasil datagen.generate() (termasuk rollup)"""
+    from bench.datagen import seed_statements
+    from migrations import MIGRATIONS
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        # SCHEMA setara dengan migrasi terakhir
+        conn.executemany("INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                         [(number, description) for number, description, _ in MIGRATIONS])
+        for sql, rows in seed_statements(data):
+            if rows is None:
+                conn.execute(translate(sql))
+            else:
+                conn.executemany(translate(sql), rows)
+        conn.commit()
+    finally:
+        conn.close()
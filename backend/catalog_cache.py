@@ -0,0 +1,116 @@
+"""Cache respon katalog produk (JSON yang sudah di-encode + ETag).
+
+Katalog jarang berubah tetapi dibaca terus oleh setiap kasir, jadi body
+JSON disimpan apa adanya dan dibuang oleh route yang mengubah produk/stok.
+TTL menjaga worker lain tetap konsisten karena invalidasi hanya berlaku
+di proses ini. Varian terkompresi (gzip/br/zstd) disimpan bersama entry
+sehingga katalog hanya dikompres sekali per encoding.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from compression import MIN_SIZE, compress
+
+
+class CacheEntry:
+    __slots__ = ('body', 'etag', 'created', 'variants')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.created = time.monotonic()
+        self.variants = {}
+
+    def effective_encoding(self, encoding):
+        """Encoding yang benar-benar dipakai (None untuk body kecil)"""
+        return encoding if encoding and len(self.body) >= MIN_SIZE else None
+
+    def etag_for(self, encoding):
+        # ETag kuat harus berbeda untuk tiap representasi
+        return self.etag if encoding is None else f"{self.etag}-{encoding}"
+
+    def encoded(self, encoding):
+        """Body untuk encoding ini; dikompres sekali lalu disimpan"""
+        if encoding is None:
+            return self.body
+        body = self.variants.get(encoding)
+        if body is None:
+            body = self.variants[encoding] = compress(self.body, encoding, cached=True)
+        return body
+
+
+class CatalogCache:
+    def __init__(self, ttl=30, max_products=5000):
+        self.ttl = ttl
+        self.max_products = max_products
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._catalog = None
+        self._products = OrderedDict()   # product_id -> CacheEntry (LRU)
+        self._hits = 0
+        self._misses = 0
+
+    def get_catalog(self, build):
+        """Entry daftar produk; build() -> bytes dipanggil jika cache kosong/basi"""
+        with self._lock:
+            entry = self._catalog
+            if self._fresh(entry):
+                self._hits += 1
+                return entry
+            self._misses += 1
+            generation = self._generation
+
+        entry = CacheEntry(build())
+        with self._lock:
+            # Jangan simpan hasil yang dibangun sebelum invalidasi terbaru
+            if generation == self._generation:
+                self._catalog = entry
+        return entry
+
+    def get_product(self, product_id, build):
+        """Entry satu produk; build() -> bytes atau None jika produk tidak ada"""
+        with self._lock:
+            entry = self._products.get(product_id)
+            if self._fresh(entry):
+                self._products.move_to_end(product_id)
+                self._hits += 1
+                return entry
+            self._misses += 1
+            generation = self._generation
+
+        body = build()
+        if body is None:
+            return None
+        entry = CacheEntry(body)
+        with self._lock:
+            if generation == self._generation:
+                self._products[product_id] = entry
+                self._products.move_to_end(product_id)
+                while len(self._products) > self.max_products:
+                    self._products.popitem(last=False)
+        return entry
+
+    def invalidate(self, product_ids=None):
+        """Buang daftar produk dan entry produk tertentu (semua jika None)"""
+        with self._lock:
+            self._generation += 1
+            self._catalog = None
+            if product_ids is None:
+                self._products.clear()
+            else:
+                for product_id in product_ids:
+                    self._products.pop(product_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'catalog_cached': self._catalog is not None,
+                'products_cached': len(self._products)
+            }
+
+    def _fresh(self, entry):
+        return entry is not None and time.monotonic() - entry.created < self.ttl
@@ -0,0 +1,102 @@
+"""Kompresi respon sesuai Accept-Encoding (zstd, br, gzip).
+
+gzip selalu tersedia; brotli dan zstandard dipakai jika paketnya terpasang.
+Body di bawah MIN_SIZE tidak dikompres karena overhead header lebih besar
+dari penghematannya.
+"""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - opsional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - opsional
+    zstandard = None
+
+MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv'}
+
+# Urutan preferensi server jika klien memberi bobot yang sama
+ENCODINGS = [name for name, available in (
+    ('zstd', zstandard is not None),
+    ('br', brotli is not None),
+    ('gzip', True),
+) if available]
+
+
+def choose_encoding(accept_encodings):
+    """Encoding terbaik dari request.accept_encodings, None jika tidak ada"""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compress(body, encoding, cached=False):
+    """Kompres body utuh; cached=True memakai level lebih tinggi (dikompres sekali)"""
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9 if cached else 6, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(body, quality=9 if cached else 5)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=10 if cached else 3).compress(body)
+    raise ValueError(f'Unsupported encoding {encoding}')
+
+
+def _stream_compressor(encoding):
+    """(compress(chunk), flush(), finish()) untuk kompresi bertahap"""
+    if encoding == 'gzip':
+        obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return obj.compress, lambda: obj.flush(zlib.Z_SYNC_FLUSH), obj.flush
+    if encoding == 'br':
+        obj = brotli.Compressor(quality=4)
+        return obj.process, obj.flush, obj.finish
+    if encoding == 'zstd':
+        obj = zstandard.ZstdCompressor(level=3).compressobj()
+        return (obj.compress,
+                lambda: obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                lambda: obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH))
+    raise ValueError(f'Unsupported encoding {encoding}')
+
+
+def compress_stream(chunks, encoding):
+    """Bungkus iterator body; tiap chunk di-flush agar klien langsung menerima data"""
+    process, flush, finish = _stream_compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response, encoding):
+    """Kompres response Flask di tempat (after_request)"""
+    if (encoding is None
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    body = response.get_data()
+    if len(body) < MIN_SIZE:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,339 @@
+"""Agregat per pelanggan dan leaderboard pelanggan teratas.
+
+Tabel (migrations.py versi 4), diperbarui di transaksi create_sale:
+- customer_stats: jumlah transaksi, total belanja, pembelian pertama/terakhir
+- customer_sales_daily: transaksi & belanja per pelanggan per hari (untuk window)
+
+CustomerLeaderboard menyimpan salinannya di memori sehingga laporan
+"pelanggan dengan transaksi terbanyak" tidak perlu GROUP BY atas tabel sales.
+Riwayat yang sudah ada diisi saat migrasi; hitung ulang dengan:
+
+    python customer_stats.py --backfill
+"""
+import bisect
+import heapq
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from serializers import format_date
+
+RANKINGS = {'transactions': 0, 'spend': 1}
+
+
+def aggregate(sales):
+    """sales: iterable (customer_id, sale_date, total_amount); sale tanpa pelanggan dilewati.
+
+    Return (lifetime, daily): {customer_id: [count, spent, first, last]},
+    {(day, customer_id): [count, spent]}.
+    """
+    lifetime = {}
+    daily = {}
+    for customer_id, sale_date, total_amount in sales:
+        if customer_id is None:
+            continue
+        sale_date = sale_date.replace(tzinfo=None)
+        total_amount = float(total_amount)
+        row = lifetime.get(customer_id)
+        if row is None:
+            lifetime[customer_id] = [1, total_amount, sale_date, sale_date]
+        else:
+            row[0] += 1
+            row[1] += total_amount
+            row[2] = min(row[2], sale_date)
+            row[3] = max(row[3], sale_date)
+        key = (sale_date.date(), customer_id)
+        day_row = daily.get(key)
+        if day_row is None:
+            daily[key] = [1, total_amount]
+        else:
+            day_row[0] += 1
+            day_row[1] += total_amount
+    return lifetime, daily
+
+
+def apply_customer_stats(cursor, sales):
+    """Tambahkan sales ke agregat pelanggan (dalam transaksi pemanggil, urut customer_id)"""
+    lifetime, daily = aggregate(sales)
+    if not lifetime:
+        return
+    rows = sorted(lifetime.items())
+    cursor.execute(
+        "INSERT INTO customer_stats (customer_id, sale_count, total_spent, first_purchase, last_purchase) "
+        f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))} "
+        "ON DUPLICATE KEY UPDATE sale_count = sale_count + VALUES(sale_count), "
+        "total_spent = total_spent + VALUES(total_spent), "
+        "first_purchase = LEAST(first_purchase, VALUES(first_purchase)), "
+        "last_purchase = GREATEST(last_purchase, VALUES(last_purchase))",
+        [value for customer_id, (count, spent, first, last) in rows
+         for value in (customer_id, count, round(spent, 2), first, last)]
+    )
+    day_rows = sorted(daily.items())
+    cursor.execute(
+        "INSERT INTO customer_sales_daily (day, customer_id, sale_count, revenue) "
+        f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(day_rows))} "
+        "ON DUPLICATE KEY UPDATE sale_count = sale_count + VALUES(sale_count), "
+        "revenue = revenue + VALUES(revenue)",
+        [value for (day, customer_id), (count, spent) in day_rows
+         for value in (day, customer_id, count, round(spent, 2))]
+    )
+
+
+def backfill(conn):
+    """Bangun ulang kedua tabel dari sales (satu kali GROUP BY seluruh riwayat)"""
+    cursor = conn.cursor()
+    try:
+        conn.start_transaction()
+        customers = rebuild_all(cursor)
+        conn.commit()
+        return customers
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def rebuild_all(cursor):
+    """Isi ulang kedua tabel dalam transaksi pemanggil (dipakai migrasi), return jumlah pelanggan"""
+    cursor.execute("DELETE FROM customer_stats")
+    cursor.execute("DELETE FROM customer_sales_daily")
+    cursor.execute("""
+        INSERT INTO customer_stats (customer_id, sale_count, total_spent, first_purchase, last_purchase)
+        SELECT customer_id, COUNT(*), SUM(total_amount), MIN(sale_date), MAX(sale_date)
+        FROM sales
+        WHERE customer_id IS NOT NULL
+        GROUP BY customer_id
+    """)
+    customers = cursor.rowcount
+    cursor.execute("""
+        INSERT INTO customer_sales_daily (day, customer_id, sale_count, revenue)
+        SELECT DATE(sale_date) AS day, customer_id, COUNT(*), SUM(total_amount)
+        FROM sales
+        WHERE customer_id IS NOT NULL
+        GROUP BY day, customer_id
+    """)
+    return customers
+
+
+class _Board:
+    """Top-`size` satu peringkat, urut naik: (nilai peringkat, customer_id).
+
+    Nilai pelanggan hanya bisa naik lewat record_sale(), jadi board cukup
+    diperbarui untuk pelanggan yang berubah; board window dibangun ulang
+    saat hari berganti.
+    """
+    __slots__ = ('size', 'day', 'totals', 'entries')
+
+    def __init__(self, size, day, totals, entries):
+        self.size = size
+        self.day = day
+        self.totals = totals        # customer_id -> [count, spent] (window) atau agregat lifetime
+        self.entries = entries
+
+    def offer(self, customer_id, score):
+        for index, (_, entry_id) in enumerate(self.entries):
+            if entry_id == customer_id:
+                del self.entries[index]
+                break
+        else:
+            if len(self.entries) >= self.size:
+                if (score, customer_id) <= self.entries[0]:
+                    return
+                del self.entries[0]
+        bisect.insort(self.entries, (score, customer_id))
+
+
+class CustomerLeaderboard:
+    """Agregat pelanggan di memori + top-N per window hari.
+
+    Diperbarui incremental lewat record_sale() setelah commit dan dimuat ulang
+    dari customer_stats/customer_sales_daily tiap reconcile_interval detik
+    (sale dari worker lain). Tiap kombinasi (days, by) yang pernah diminta
+    punya board top-N sendiri (maks. max_boards, LRU) yang ikut diperbarui
+    di record_sale(), jadi top() tidak perlu mengurutkan ulang semua pelanggan.
+    """
+
+    def __init__(self, connection_factory, max_window_days=365, reconcile_interval=300,
+                 board_size=100, max_boards=16):
+        self._connection_factory = connection_factory
+        self.max_window_days = max_window_days
+        self.reconcile_interval = reconcile_interval
+        self.board_size = board_size
+        self.max_boards = max_boards
+
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._loaded = False
+        self._reconciled_at = 0.0
+        self._boards = OrderedDict()    # (days, rank_index) -> _Board
+
+        self._lifetime = {}          # customer_id -> [count, spent, first, last]
+        self._daily = {}             # day -> {customer_id: [count, spent]}
+
+    def top(self, n=10, days=None, by='transactions'):
+        """Top-n pelanggan; days=None untuk sepanjang waktu, selain itu N hari terakhir"""
+        if by not in RANKINGS:
+            raise ValueError('by must be one of transactions, spend')
+        if days is not None and not 1 <= days <= self.max_window_days:
+            raise ValueError(f'days must be between 1 and {self.max_window_days}')
+        if not self._loaded or time.monotonic() - self._reconciled_at >= self.reconcile_interval:
+            try:
+                self.reconcile(blocking=not self._loaded)
+            except Exception as e:
+                if not self._loaded:
+                    raise
+                print(f"⚠️ Customer leaderboard reconcile failed, serving cached data: {e}")
+
+        key = (days, RANKINGS[by])
+        today = date.today()
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None or board.size < n or (days and board.day != today):
+                board = self._boards[key] = self._build_locked(days, RANKINGS[by], max(n, self.board_size), today)
+                while len(self._boards) > self.max_boards:
+                    self._boards.popitem(last=False)
+            self._boards.move_to_end(key)
+            result = []
+            for _, customer_id in reversed(board.entries[-n:]):
+                count, spent = board.totals[customer_id][:2]
+                lifetime = self._lifetime.get(customer_id)
+                result.append({
+                    'customer_id': customer_id,
+                    'transactions': count,
+                    'total_spent': round(spent, 2),
+                    'last_purchase': format_date(lifetime[3]) if lifetime else None
+                })
+            return result
+
+    def _build_locked(self, days, rank_index, size, today):
+        if days is None:
+            totals = self._lifetime
+        else:
+            since = today - timedelta(days=days - 1)
+            totals = {}
+            for day, customers in self._daily.items():
+                if day < since:
+                    continue
+                for customer_id, (count, spent) in customers.items():
+                    row = totals.get(customer_id)
+                    if row is None:
+                        totals[customer_id] = [count, spent]
+                    else:
+                        row[0] += count
+                        row[1] += spent
+        best = heapq.nlargest(size, ((_score(row, rank_index), customer_id)
+                                     for customer_id, row in totals.items()))
+        best.reverse()
+        return _Board(size, today, totals, best)
+
+    def reconcile(self, blocking=True):
+        """Muat ulang agregat dari tabel customer_stats & customer_sales_daily"""
+        if not self._reconcile_lock.acquire(blocking=blocking):
+            return
+        try:
+            since = date.today() - timedelta(days=self.max_window_days - 1)
+            with self._connection_factory() as conn:
+                if not conn:
+                    raise RuntimeError('Database connection failed')
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT customer_id, sale_count, total_spent, first_purchase, last_purchase "
+                    "FROM customer_stats"
+                )
+                lifetime = {customer_id: [int(count), float(spent), first, last]
+                            for customer_id, count, spent, first, last in cursor.fetchall()}
+                cursor.execute(
+                    "SELECT day, customer_id, sale_count, revenue FROM customer_sales_daily WHERE day >= %s",
+                    (since,)
+                )
+                daily = {}
+                for day, customer_id, count, revenue in cursor.fetchall():
+                    daily.setdefault(day, {})[customer_id] = [int(count), float(revenue)]
+                cursor.close()
+
+            with self._lock:
+                self._lifetime = lifetime
+                self._daily = daily
+                self._boards.clear()
+                self._loaded = True
+                self._reconciled_at = time.monotonic()
+        finally:
+            self._reconcile_lock.release()
+
+    def record_sale(self, customer_id, total_amount, sale_date):
+        """Sale baru yang sudah di-commit"""
+        if customer_id is None:
+            return
+        lifetime, daily = aggregate([(customer_id, sale_date, total_amount)])
+        count, spent, first, last = lifetime[customer_id]
+        with self._lock:
+            if not self._loaded:
+                return
+            row = self._lifetime.get(customer_id)
+            if row is None:
+                self._lifetime[customer_id] = [count, spent, first, last]
+            else:
+                row[0] += count
+                row[1] += spent
+                row[2] = min(row[2], first)
+                row[3] = max(row[3], last)
+            for (day, _), (day_count, day_spent) in daily.items():
+                customers = self._daily.setdefault(day, {})
+                day_row = customers.get(customer_id)
+                if day_row is None:
+                    customers[customer_id] = [day_count, day_spent]
+                else:
+                    day_row[0] += day_count
+                    day_row[1] += day_spent
+            self._prune_locked()
+            self._update_boards_locked(customer_id, count, spent, last.date())
+
+    def _update_boards_locked(self, customer_id, count, spent, day):
+        today = date.today()
+        for (days, rank_index), board in self._boards.items():
+            if days is None:
+                board.offer(customer_id, _score(self._lifetime[customer_id], rank_index))
+                continue
+            if board.day != today or day < today - timedelta(days=days - 1):
+                continue    # Board basi dibangun ulang di top()
+            row = board.totals.get(customer_id)
+            if row is None:
+                row = board.totals[customer_id] = [0, 0.0]
+            row[0] += count
+            row[1] += spent
+            board.offer(customer_id, _score(row, rank_index))
+
+    def invalidate(self):
+        with self._lock:
+            self._reconciled_at = 0.0
+
+    def _prune_locked(self):
+        since = date.today() - timedelta(days=self.max_window_days - 1)
+        for day in [day for day in self._daily if day < since]:
+            del self._daily[day]
+
+
+def _score(row, rank_index):
+    return (row[rank_index], row[1 - rank_index])
+
+
+def main(argv):
+    import mysql.connector
+    from app import get_db_config
+
+    if '--backfill' not in argv:
+        print(__doc__)
+        return 1
+    conn = mysql.connector.connect(**get_db_config())
+    try:
+        print(f"✅ Customer aggregates rebuilt ({backfill(conn)} customers)")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
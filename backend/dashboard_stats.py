@@ -0,0 +1,200 @@
+"""Statistik dashboard yang dijaga di memori.
+
+Route tulis (create_sale, create_product, update_product, update_stock,
+add_customer) memperbarui angka secara incremental setelah commit, dan
+secara berkala angka dicocokkan ulang (reconcile) dengan database supaya
+perubahan dari worker/proses lain tetap ikut terhitung.
+
+Jika listener diberikan, setiap perubahan dikirim sebagai event
+(listener(event, data), dipanggil di luar lock):
+- dashboard: angka dashboard terbaru (sama dengan snapshot())
+- stock: stok satu produk berubah
+- low_stock: stok produk baru saja turun di bawah low_stock_threshold
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+
+class StatsUnavailable(Exception):
+    """Statistik belum pernah dimuat dan database tidak bisa dihubungi"""
+
+
+class DashboardStats:
+    def __init__(self, connection_factory, low_stock_threshold=10, reconcile_interval=60, listener=None):
+        self._connection_factory = connection_factory
+        self.low_stock_threshold = low_stock_threshold
+        self.reconcile_interval = reconcile_interval
+        self.listener = listener
+
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._loaded = False
+        self._reconciled_at = 0.0
+        self._day = None
+
+        self._today_sales = 0
+        self._today_revenue = Decimal('0')
+        self._stock = {}            # product_id -> stock
+        self._low_stock = 0
+        self._total_customers = 0
+
+    # Baca
+
+    def snapshot(self):
+        """Angka dashboard terkini (reconcile dulu jika sudah basi)"""
+        if self._needs_reconcile():
+            try:
+                self.reconcile(blocking=not self._loaded)
+            except StatsUnavailable:
+                if not self._loaded:
+                    raise
+                print("⚠️ Dashboard reconcile failed, serving cached stats")
+
+        with self._lock:
+            self._roll_day_locked()
+            return self._snapshot_locked()
+
+    def reconcile(self, blocking=True):
+        """Muat ulang semua angka dari database"""
+        if not self._reconcile_lock.acquire(blocking=blocking):
+            return  # Thread lain sedang reconcile
+        try:
+            today = date.today()
+            start = datetime.combine(today, datetime.min.time())
+            with self._connection_factory() as conn:
+                if not conn:
+                    raise StatsUnavailable('Database connection failed')
+                cursor = conn.cursor()
+                # Range sargable agar index sales.sale_date terpakai
+                cursor.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(total_amount), 0) FROM sales "
+                    "WHERE sale_date >= %s AND sale_date < %s",
+                    (start, start + timedelta(days=1))
+                )
+                today_sales, today_revenue = cursor.fetchone()
+                cursor.execute("SELECT id, stock FROM products_current")
+                stock = {product_id: int(qty) for product_id, qty in cursor.fetchall()}
+                cursor.execute("SELECT COUNT(*) FROM customers")
+                total_customers = cursor.fetchone()[0]
+                cursor.close()
+
+            events = []
+            with self._lock:
+                was_loaded = self._loaded
+                before = self._snapshot_locked() if was_loaded else None
+                old_stock = self._stock
+                self._day = today
+                self._today_sales = int(today_sales)
+                self._today_revenue = Decimal(str(today_revenue))
+                self._stock = stock
+                self._low_stock = sum(1 for qty in stock.values() if qty < self.low_stock_threshold)
+                self._total_customers = int(total_customers)
+                self._loaded = True
+                self._reconciled_at = time.monotonic()
+                if was_loaded and self.listener is not None:
+                    # Perubahan dari worker lain sejak reconcile terakhir
+                    for product_id, qty in stock.items():
+                        old = old_stock.get(product_id)
+                        if old != qty:
+                            self._stock_events(events, product_id, old, qty)
+                    if self._snapshot_locked() != before:
+                        events.append(('dashboard', self._snapshot_locked()))
+            self._notify(events)
+        finally:
+            self._reconcile_lock.release()
+
+    # Update incremental (dipanggil setelah commit)
+
+    def record_sale(self, total_amount, items, sale_date=None):
+        """Sale baru; items berisi pasangan (product_id, quantity).
+
+        sale_date diisi untuk sale offline yang disinkron belakangan; sale dari
+        hari lain hanya mengurangi stok, tidak menambah angka hari ini.
+        """
+        events = []
+        with self._lock:
+            if not self._loaded:
+                return
+            self._roll_day_locked()
+            if sale_date is None or sale_date.date() == self._day:
+                self._today_sales += 1
+                self._today_revenue += Decimal(str(total_amount))
+            for product_id, quantity in items:
+                if product_id in self._stock:
+                    self._set_stock_locked(product_id, self._stock[product_id] - quantity, events)
+            events.append(('dashboard', self._snapshot_locked()))
+        self._notify(events)
+
+    def set_product_stock(self, product_id, stock):
+        """Produk baru atau stok produk berubah"""
+        events = []
+        with self._lock:
+            if not self._loaded:
+                return
+            self._set_stock_locked(product_id, stock, events)
+            events.append(('dashboard', self._snapshot_locked()))
+        self._notify(events)
+
+    def invalidate(self):
+        """Paksa reconcile pada snapshot berikutnya (setelah perubahan massal)"""
+        with self._lock:
+            self._reconciled_at = 0.0
+
+    def customer_added(self):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._total_customers += 1
+            events = [('dashboard', self._snapshot_locked())]
+        self._notify(events)
+
+    # Internal
+
+    def _needs_reconcile(self):
+        return (not self._loaded
+                or time.monotonic() - self._reconciled_at >= self.reconcile_interval
+                or self._day != date.today())
+
+    def _roll_day_locked(self):
+        today = date.today()
+        if self._day != today:
+            self._day = today
+            self._today_sales = 0
+            self._today_revenue = Decimal('0')
+
+    def _snapshot_locked(self):
+        return {
+            'today_sales': self._today_sales,
+            'today_revenue': float(self._today_revenue),
+            'total_products': len(self._stock),
+            'total_customers': self._total_customers,
+            'low_stock': self._low_stock
+        }
+
+    def _set_stock_locked(self, product_id, stock, events):
+        old = self._stock.get(product_id)
+        if old is not None and old < self.low_stock_threshold:
+            self._low_stock -= 1
+        self._stock[product_id] = stock
+        if stock < self.low_stock_threshold:
+            self._low_stock += 1
+        if self.listener is not None:
+            self._stock_events(events, product_id, old, stock)
+
+    def _stock_events(self, events, product_id, old, stock):
+        low = stock < self.low_stock_threshold
+        events.append(('stock', {'product_id': product_id, 'stock': stock, 'low_stock': low}))
+        if low and (old is None or old >= self.low_stock_threshold):
+            events.append(('low_stock', {'product_id': product_id, 'stock': stock,
+                                         'threshold': self.low_stock_threshold}))
+
+    def _notify(self, events):
+        if self.listener is None:
+            return
+        for event, data in events:
+            try:
+                self.listener(event, data)
+            except Exception as e:
+                print(f"⚠️ Dashboard listener failed: {e}")
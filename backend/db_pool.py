@@ -0,0 +1,247 @@
+"""Connection pool MySQL untuk backend Bakery System.
+
+Menggantikan pola connect-per-request: koneksi dipinjam dari pool,
+di-ping sebelum dipakai, dan selalu dikembalikan lewat context manager.
+"""
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+
+
+class PoolError(Exception):
+    """Error umum pool (gagal connect, pool ditutup, dll)"""
+
+
+class PoolTimeout(PoolError):
+    """Tidak ada koneksi yang tersedia dalam batas waktu checkout"""
+
+
+class _Checkout:
+    __slots__ = ('started', 'stack', 'warned')
+
+    def __init__(self, started, stack):
+        self.started = started
+        self.stack = stack
+        self.warned = False
+
+
+class ConnectionPool:
+    """Pool koneksi thread-safe dengan overflow, timeout, ping dan deteksi leak.
+
+    - ``size``: jumlah koneksi yang dipertahankan saat idle
+    - ``max_overflow``: koneksi tambahan yang boleh dibuat saat ramai,
+      ditutup lagi begitu dikembalikan
+    - ``timeout``: detik maksimal menunggu koneksi sebelum PoolTimeout
+    - ``ping_interval``: koneksi yang idle lebih lama dari ini di-ping dulu
+    - ``leak_timeout``: checkout yang lebih lama dari ini dilaporkan sebagai leak
+    """
+
+    def __init__(self, db_config, size=5, max_overflow=10, timeout=10.0,
+                 ping_interval=5.0, leak_timeout=60.0, connect=None):
+        self._db_config = dict(db_config)
+        self._connect = connect or (lambda: mysql.connector.connect(**self._db_config))
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.leak_timeout = leak_timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()            # (conn, last_used)
+        self._checked_out = {}          # id(conn) -> _Checkout
+        self._total = 0
+        self._waiting = 0
+        self._closed = False
+
+        # Statistik
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._leaks = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # Checkout / checkin
+
+    def acquire(self, timeout=None):
+        """Pinjam satu koneksi dari pool"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        with self._cond:
+            self._check_leaks_locked()
+            while True:
+                if self._closed:
+                    raise PoolError('Connection pool is closed')
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._total < self.size + self.max_overflow:
+                    # Reservasi slot, koneksi dibuat di luar lock
+                    self._total += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f'No database connection available after {timeout:.1f}s '
+                        f'({self._total} in use)'
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            if conn is None:
+                conn = self._new_connection()
+            elif not self._is_alive(conn, last_used):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._discarded += 1
+                conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checked_out[id(conn)] = _Checkout(
+                time.monotonic(),
+                traceback.format_stack(limit=8)[:-2] if self.leak_timeout else None,
+            )
+            self._checkouts += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+        return conn
+
+    def release(self, conn):
+        """Kembalikan koneksi ke pool (rollback transaksi yang tertinggal)"""
+        healthy = True
+        try:
+            if getattr(conn, 'unread_result', False):
+                # Streaming yang dihentikan di tengah jalan: sisa hasil query
+                # bisa jutaan baris, lebih murah membuang koneksinya
+                healthy = False
+            elif conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if self._checked_out.pop(id(conn), None) is None:
+                # Bukan milik pool atau sudah dikembalikan
+                return
+            keep = (healthy and not self._closed
+                    and len(self._idle) + len(self._checked_out) < self.size)
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._total -= 1
+                if not healthy:
+                    self._discarded += 1
+            self._cond.notify()
+
+        if not keep:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager: ``with pool.connection() as conn: ...``"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Tutup semua koneksi idle; koneksi yang dipinjam ditutup saat kembali"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    # Statistik & leak detection
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'total': self._total,
+                'in_use': len(self._checked_out),
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'leaks_detected': self._leaks,
+                'checkout_wait_avg_ms': round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                'checkout_wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+    def check_leaks(self):
+        """Daftar checkout yang melewati leak_timeout"""
+        with self._cond:
+            return self._check_leaks_locked()
+
+    def _check_leaks_locked(self):
+        if not self.leak_timeout:
+            return []
+        now = time.monotonic()
+        leaks = []
+        for checkout in self._checked_out.values():
+            held = now - checkout.started
+            if held < self.leak_timeout:
+                continue
+            leaks.append({'held_seconds': round(held, 1), 'stack': checkout.stack})
+            if not checkout.warned:
+                checkout.warned = True
+                self._leaks += 1
+                print(f"⚠️ Possible connection leak: held for {held:.1f}s, checked out at:\n"
+                      + ''.join(checkout.stack or []))
+        return leaks
+
+    # Internal
+
+    def _new_connection(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            raise PoolError(f'Cannot connect to database: {e}') from e
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_alive(self, conn, last_used):
+        if time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,232 @@
+"""Routing baca/tulis: tulis ke primary, baca ke replica.
+
+- Setiap role (primary, tiap replica) punya ConnectionPool sendiri.
+- Replica dipilih bergiliran (round robin) di antara yang sehat.
+- Read-your-writes: setelah klien menulis, bacaannya diarahkan ke primary
+  selama ``read_your_writes`` detik agar perubahannya langsung terlihat.
+  Batas waktunya dibawa klien sendiri (marker bertanda tangan HMAC dari
+  note_write(), dikirim balik lewat cookie/header), jadi tetap berlaku
+  walaupun request berikutnya mendarat di worker atau server lain. Marker
+  memakai jam dinding, jadi jam antar server perlu disinkronkan (NTP).
+- Replica yang gagal connect, atau tertinggal lebih dari ``max_lag`` detik,
+  dikeluarkan dari rotasi sampai health check berikutnya berhasil; selama
+  itu bacaan jatuh ke primary.
+
+Untuk mencoba di lokal cukup dua instance MySQL, mis. primary di port 3306
+dan replica di 3307 (lihat get_replica_configs() di app.py). Instance yang
+bukan replica (SHOW REPLICA STATUS kosong) dianggap sehat tanpa lag.
+"""
+import hashlib
+import hmac
+import itertools
+import threading
+import time
+
+from db_pool import PoolError, PoolTimeout
+
+
+class Replica:
+    __slots__ = ('name', 'pool', 'healthy', 'lag', 'last_error', 'checked_at', 'reads')
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = True
+        self.lag = None
+        self.last_error = None
+        self.checked_at = None
+        self.reads = 0
+
+
+class DatabaseRouter:
+    def __init__(self, primary, replicas=(), read_your_writes=5.0, max_lag=10.0,
+                 check_interval=5.0, checkout_timeout=1.0, secret=''):
+        """replicas: list (nama, ConnectionPool); secret untuk menandatangani marker tulis"""
+        self.primary = primary
+        self.replicas = [Replica(name, pool) for name, pool in replicas]
+        self.read_your_writes = read_your_writes
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.checkout_timeout = checkout_timeout
+        self._secret = secret.encode() if isinstance(secret, str) else secret
+
+        self._lock = threading.Lock()
+        self._rotation = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._last_write = 0.0
+        self._checker = None
+
+        # Statistik
+        self._primary_reads = 0
+        self._pinned_reads = 0
+        self._fallbacks = 0
+
+    # Read-your-writes
+
+    def note_write(self):
+        """Dipanggil setelah request tulis berhasil.
+
+        Mengembalikan marker untuk klien (None jika tanpa replica); selama
+        marker itu dikirim balik dan belum lewat batas waktunya, bacaan
+        klien dilayani primary.
+        """
+        now = time.time()
+        with self._lock:
+            self._last_write = now
+        if not self.replicas:
+            return None
+        deadline = f'{now + self.read_your_writes:.3f}'
+        return f'{deadline}.{self._signature(deadline)}'
+
+    def _signature(self, deadline):
+        return hmac.new(self._secret, deadline.encode(), hashlib.sha256).hexdigest()
+
+    def write_deadline(self, marker):
+        """Batas waktu (epoch detik) dari marker klien; None jika kosong atau palsu"""
+        deadline, _, signature = (marker or '').rpartition('.')
+        if not deadline or not hmac.compare_digest(signature, self._signature(deadline)):
+            return None
+        try:
+            return float(deadline)
+        except ValueError:
+            return None
+
+    def _pinned_to_primary(self, marker, shared, now):
+        if shared:
+            # Hasil yang di-cache untuk semua klien harus melihat tulisan siapa pun
+            return now - self._last_write < self.read_your_writes
+        deadline = self.write_deadline(marker)
+        return deadline is not None and now < deadline
+
+    # Checkout
+
+    def acquire_read(self, marker=None, shared=False):
+        """(pool, conn) untuk query baca; pool dipakai lagi untuk release.
+
+        marker: hasil note_write() yang dikirim balik klien (boleh None).
+        """
+        if not self.replicas:
+            return self.primary, self.primary.acquire()
+        self._ensure_checker()
+
+        now = time.time()
+        with self._lock:
+            if self._pinned_to_primary(marker, shared, now):
+                self._pinned_reads += 1
+                candidates = []
+            else:
+                start = next(self._rotation)
+                order = self.replicas[start:] + self.replicas[:start]
+                candidates = [replica for replica in order if replica.healthy]
+
+        for replica in candidates:
+            try:
+                conn = replica.pool.acquire(timeout=self.checkout_timeout)
+            except PoolTimeout:
+                continue    # Replica sibuk; coba yang lain lalu primary
+            except PoolError as e:
+                self._mark(replica, False, str(e))
+                continue
+            with self._lock:
+                replica.reads += 1
+            return replica.pool, conn
+
+        with self._lock:
+            self._primary_reads += 1
+            if candidates or not any(replica.healthy for replica in self.replicas):
+                self._fallbacks += 1
+        return self.primary, self.primary.acquire()
+
+    def role_of(self, pool):
+        """Nama role pemilik pool: 'primary' atau nama replica"""
+        if pool is self.primary:
+            return 'primary'
+        for replica in self.replicas:
+            if replica.pool is pool:
+                return replica.name
+        return None
+
+    # Health check
+
+    def _ensure_checker(self):
+        if self._checker is not None:
+            return
+        with self._lock:
+            if self._checker is None:
+                self._checker = threading.Thread(target=self._check_loop, name='replica-health', daemon=True)
+                self._checker.start()
+
+    def _check_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.check_replicas()
+
+    def check_replicas(self):
+        for replica in self.replicas:
+            try:
+                conn = replica.pool.acquire(timeout=self.checkout_timeout)
+            except PoolTimeout:
+                continue    # Semua koneksi sedang dipakai: jelas masih hidup
+            except PoolError as e:
+                self._mark(replica, False, str(e))
+                continue
+            try:
+                lag = self._replication_lag(conn)
+            except Exception as e:
+                # Koneksi hidup tapi lag tidak bisa dibaca (mis. tanpa hak REPLICATION CLIENT)
+                self._mark(replica, True, f'Replication lag unknown: {e}')
+            else:
+                if lag is False:
+                    self._mark(replica, False, 'Replication is not running')
+                elif lag is not None and lag > self.max_lag:
+                    self._mark(replica, False, f'Replica is {lag}s behind', lag)
+                else:
+                    self._mark(replica, True, None, lag)
+            finally:
+                replica.pool.release(conn)
+
+    @staticmethod
+    def _replication_lag(conn):
+        """Detik tertinggal; None jika bukan replica/tidak diketahui, False jika replikasi berhenti"""
+        cursor = conn.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except Exception:
+                cursor.execute("SHOW SLAVE STATUS")    # MySQL < 8.0.22 / MariaDB
+            row = cursor.fetchone()
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        if not row:
+            return None
+        if 'Seconds_Behind_Source' in row:
+            lag = row['Seconds_Behind_Source']
+        else:
+            lag = row.get('Seconds_Behind_Master')
+        return False if lag is None else int(lag)
+
+    def _mark(self, replica, healthy, error=None, lag=None):
+        with self._lock:
+            if replica.healthy != healthy:
+                state = 'back in rotation' if healthy else f'out of rotation: {error}'
+                print(f"{'✅' if healthy else '⚠️ '} Replica {replica.name} {state}")
+            replica.healthy = healthy
+            replica.last_error = error
+            replica.lag = lag
+            replica.checked_at = time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'primary_reads': self._primary_reads,
+                'pinned_reads': self._pinned_reads,
+                'fallbacks': self._fallbacks,
+                'replicas': [{
+                    'name': replica.name,
+                    'healthy': replica.healthy,
+                    'lag_seconds': replica.lag,
+                    'reads': replica.reads,
+                    'last_error': replica.last_error,
+                    'pool': replica.pool.stats(),
+                } for replica in self.replicas],
+            }
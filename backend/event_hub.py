@@ -0,0 +1,174 @@
+"""Hub Server-Sent Events (SSE) di dalam proses.
+
+Event disimpan sekali di ring buffer bernomor urut; setiap subscriber hanya
+memegang nomor event terakhir yang sudah dikirim dan menunggu di satu
+Condition bersama. publish() cukup append + notify_all, tanpa antrean per
+subscriber, sehingga ratusan koneksi yang menganggur hampir tidak memakan
+memori maupun CPU. Frame SSE di-encode sekali saat publish dan dibagi ke
+semua subscriber.
+
+Klien yang reconnect mengirim Last-Event-ID dan menerima event yang
+terlewat dari buffer. Jika yang terlewat sudah tergeser dari buffer
+(atau server restart), klien menerima event ``resync`` dan harus memuat
+ulang datanya sekali.
+
+Catatan deploy: setiap stream memegang satu thread selama terbuka, jadi
+jalankan dengan worker thread/gevent (mis. gunicorn -k gthread --threads
+256) dan matikan buffering proxy (X-Accel-Buffering: no sudah dikirim).
+Hub hanya melihat tulisan dari worker-nya sendiri; perubahan dari worker
+lain masuk lewat reconcile DashboardStats.
+"""
+import itertools
+import threading
+import time
+from collections import deque
+
+from serializers import dumps_bytes
+
+
+class HubFull(Exception):
+    """Jumlah subscriber sudah mencapai max_subscribers"""
+
+
+class Subscription:
+    """Iterable frame SSE satu subscriber yang memegang satu slot hub.
+
+    Slot dilepas sekali saja: oleh finally generator, atau oleh close()
+    (dipanggil server WSGI saat response selesai) jika stream tidak pernah
+    mulai dibaca.
+    """
+
+    def __init__(self, hub):
+        self._hub = hub
+        self._frames = None    # Generator EventHub._frames, diisi oleh stream()
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._frames)
+
+    def close(self):
+        if self._frames is not None:
+            self._frames.close()
+        self.release()
+
+    def release(self):
+        with self._hub._condition:
+            if not self._released:
+                self._released = True
+                self._hub._subscribers -= 1
+
+    __del__ = close
+
+
+class EventHub:
+    def __init__(self, buffer_size=512, heartbeat=15.0, max_subscribers=1000, retry_ms=3000):
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.retry_ms = retry_ms
+
+        self._condition = threading.Condition()
+        self._buffer = deque(maxlen=buffer_size)    # (seq, event, frame)
+        self._seq = 0
+        # Penanda per proses agar Last-Event-ID dari proses lain/lama terdeteksi
+        self._epoch = format(int(time.time() * 1000), 'x')
+        self._subscribers = 0
+        self._published = 0
+
+    def publish(self, event, data):
+        """Kirim event ke semua subscriber; aman dipanggil dari thread mana pun"""
+        payload = dumps_bytes(data).decode()
+        with self._condition:
+            self._seq += 1
+            frame = f"id: {self._epoch}-{self._seq}\nevent: {event}\ndata: {payload}\n\n".encode()
+            self._buffer.append((self._seq, event, frame))
+            self._published += 1
+            self._condition.notify_all()
+
+    def _parse_last_event_id(self, last_event_id):
+        """Nomor urut dari Last-Event-ID; None jika tidak dikenali (perlu resync)"""
+        epoch, _, seq = (last_event_id or '').partition('-')
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def stream(self, events=None, last_event_id=None, initial=(), on_heartbeat=None):
+        """Subscription (iterable frame SSE) untuk satu subscriber; raise HubFull jika penuh.
+
+        events: set nama event yang diinginkan (None = semua). initial: pasangan
+        (event, data) yang dikirim paling awal, mis. state saat ini.
+        on_heartbeat: dipanggil tiap heartbeat selama koneksi menganggur.
+        """
+        with self._condition:
+            if self._subscribers >= self.max_subscribers:
+                raise HubFull(f'Too many subscribers ({self.max_subscribers})')
+            # Slot dipesan di sini, di bawah lock yang sama dengan pengecekannya
+            self._subscribers += 1
+            subscription = Subscription(self)
+            cursor = self._seq
+            missed = False
+            if last_event_id:
+                seq = self._parse_last_event_id(last_event_id)
+                oldest = self._buffer[0][0] if self._buffer else self._seq + 1
+                if seq is None or seq < oldest - 1 or seq > self._seq:
+                    missed = True
+                else:
+                    cursor = seq
+        subscription._frames = self._frames(subscription, cursor, events, missed, initial, on_heartbeat)
+        return subscription
+
+    def _frames(self, subscription, cursor, events, missed, initial, on_heartbeat):
+        try:
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            if missed:
+                yield self._frame('resync', {'reason': 'missed events'})
+            for event, data in initial:
+                yield self._frame(event, data)
+
+            while True:
+                with self._condition:
+                    if self._seq == cursor:
+                        self._condition.wait(self.heartbeat)
+                    latest = self._seq
+                    if not self._buffer or cursor == latest:
+                        pending = []
+                    elif cursor < self._buffer[0][0] - 1:
+                        # Subscriber terlalu lambat; event di antaranya sudah hilang
+                        pending = None
+                    else:
+                        # Nomor urut berurutan, jadi posisi di buffer bisa dihitung langsung
+                        start = cursor - self._buffer[0][0] + 1
+                        pending = list(itertools.islice(self._buffer, start, None))
+
+                if pending is None:
+                    cursor = latest
+                    yield self._frame('resync', {'reason': 'missed events'})
+                    continue
+                if not pending:
+                    if on_heartbeat is not None:
+                        on_heartbeat()
+                    yield b": ping\n\n"
+                    continue
+                cursor = pending[-1][0]
+                chunk = b''.join(frame for _, event, frame in pending
+                                 if events is None or event in events)
+                if chunk:
+                    yield chunk
+        finally:
+            subscription.release()
+
+    @staticmethod
+    def _frame(event, data):
+        # Tanpa id: event awal/resync bukan bagian dari urutan buffer
+        return b"event: " + event.encode() + b"\ndata: " + dumps_bytes(data) + b"\n\n"
+
+    def stats(self):
+        with self._condition:
+            return {
+                'subscribers': self._subscribers,
+                'published': self._published,
+                'buffered': len(self._buffer),
+                'last_event_id': f"{self._epoch}-{self._seq}",
+            }
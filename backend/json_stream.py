@@ -0,0 +1,85 @@
+"""Baca JSON array besar elemen demi elemen tanpa memuat seluruh dokumen.
+
+Dipakai import produk: body ``[{...}, {...}]`` atau ``{"products": [...]}``
+dibaca per potongan dari stream teks, dan setiap elemen di-decode dengan
+json.JSONDecoder.raw_decode begitu lengkap. Memori yang dipakai sebesar
+elemen terbesar, bukan sebesar file.
+"""
+import json
+
+CHUNK_SIZE = 64 * 1024
+MAX_ELEMENT_SIZE = 1024 * 1024
+_WHITESPACE = ' \t\n\r'
+
+
+class _Reader:
+    def __init__(self, stream, chunk_size):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Karakter berikutnya selain spasi, None di akhir stream"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'JSON tidak valid: "{char}" diharapkan')
+        self.pos += 1
+
+    def value(self):
+        """Decode satu nilai JSON; baca potongan berikutnya selama belum lengkap"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof or len(self.buffer) - self.pos > MAX_ELEMENT_SIZE:
+                    raise ValueError(f'JSON tidak valid: {e.msg}')
+                self._fill()
+                continue
+            # Angka di ujung buffer mungkin masih berlanjut di potongan berikutnya
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(stream, key=None, chunk_size=CHUNK_SIZE):
+    """Yield elemen array teratas; key untuk array di dalam object, mis. {"products": [...]}.
+
+    stream: file teks (sudah di-decode). Raise ValueError jika bentuknya tidak sesuai
+    atau JSON rusak (elemen sebelumnya sudah ter-yield).
+    """
+    reader = _Reader(stream, chunk_size)
+    if key is not None and reader.peek() == '{':
+        reader.expect('{')
+        if reader.value() != key:
+            raise ValueError(f'Object JSON harus berisi "{key}" sebagai field pertama')
+        reader.expect(':')
+    reader.expect('[')
+    if reader.peek() == ']':
+        return
+    while True:
+        yield reader.value()
+        if reader.peek() == ']':
+            return
+        reader.expect(',')
@@ -0,0 +1,388 @@
+"""Instrumentasi request dan query database, diekspor dalam format teks Prometheus.
+
+Koneksi dari db_connection() dibungkus InstrumentedConnection, sehingga setiap
+execute()/fetch*() di route mana pun ikut tercatat: jumlah query, total waktu
+DB, dan statement paling lambat per request. Request yang menjalankan query
+lebih dari query_threshold (gejala N+1) ditandai dan dilaporkan.
+"""
+import bisect
+import contextvars
+import re
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# Query di luar request (thread reconcile, sisa generator streaming)
+NO_ROUTE = 'none'
+
+_current = contextvars.ContextVar('bakery_request_stats', default=None)
+_whitespace = re.compile(r'\s+')
+
+
+def normalize_sql(sql, limit=300):
+    """SQL satu baris, dipotong agar aman untuk log"""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _whitespace.sub(' ', str(sql)).strip()
+    return sql if len(sql) <= limit else sql[:limit] + '...'
+
+
+class RequestStats:
+    __slots__ = ('route', 'started', 'query_count', 'db_time', 'slowest_sql', 'slowest_time')
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+
+    def note(self, sql, statement_time):
+        if statement_time > self.slowest_time:
+            self.slowest_time = statement_time
+            self.slowest_sql = sql
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # + bucket +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """(le, jumlah kumulatif) untuk setiap bucket"""
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else _format_value(bound)), total
+
+
+class InstrumentedCursor:
+    """Cursor proxy yang mengukur execute dan fetch.
+
+    Statement dianggap selesai saat hasilnya habis dibaca, cursor ditutup
+    atau execute berikutnya; saat itu durasi totalnya diperiksa untuk slow log.
+    """
+
+    def __init__(self, cursor, metrics, source=None):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._source = source    # (role, pool) yang melayani koneksi ini
+        self._sql = None
+        self._params = None
+        self._many = False
+        self._elapsed = 0.0    # Waktu statement terakhir (execute + fetch)
+        self._finished = True
+
+    def _run(self, method, operation, params, many, *args, **kwargs):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return method(operation, params, *args, **kwargs)
+        finally:
+            self._sql = operation
+            self._params = params
+            self._many = many
+            self._elapsed = time.perf_counter() - start
+            self._finished = False
+            self._metrics.record_query(operation, self._elapsed)
+            if getattr(self._cursor, 'description', None) is None:
+                self._finish()    # Tidak ada result set (INSERT/UPDATE/...)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._run(self._cursor.execute, operation, params, False, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._run(self._cursor.executemany, operation, seq_params, True, *args, **kwargs)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._elapsed += elapsed
+            self._metrics.record_fetch(self._sql, self._elapsed, elapsed)
+
+    def _finish(self):
+        if not self._finished:
+            self._finished = True
+            self._metrics.statement_finished(self._sql, self._params, self._elapsed, self._many,
+                                             self._source)
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._fetch(self._cursor.fetchmany, size)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy; hanya cursor() yang dibungkus, sisanya diteruskan"""
+
+    def __init__(self, conn, metrics, source=None):
+        self._conn = conn
+        self._metrics = metrics
+        self._source = source
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._metrics, self._source)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class Metrics:
+    def __init__(self, query_threshold=20, slow_log=None, prefix='bakery'):
+        self.query_threshold = query_threshold
+        self.slow_log = slow_log     # slow_query_log.SlowQueryLog (opsional)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._requests = {}          # (method, route, status) -> count
+        self._latency = {}           # (method, route) -> Histogram
+        self._queries_per_request = {}   # route -> Histogram
+        self._queries = {}           # route -> [query_count, db_seconds]
+        self._flagged = {}           # route -> request yang melewati query_threshold
+        self._statement_latency = Histogram(QUERY_BUCKETS)
+        self._collectors = []
+
+    # Per request
+
+    def begin_request(self, route):
+        stats = RequestStats(route or 'unmatched')
+        _current.set(stats)
+        return stats
+
+    def current(self):
+        return _current.get()
+
+    def end_request(self, method, status):
+        """Catat request yang sedang berjalan; return RequestStats (atau None)"""
+        stats = _current.get()
+        if stats is None:
+            return None
+        _current.set(None)
+        elapsed = time.perf_counter() - stats.started
+        flagged = stats.query_count > self.query_threshold
+        with self._lock:
+            key = (method, stats.route, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            latency = self._latency.get((method, stats.route))
+            if latency is None:
+                latency = self._latency[(method, stats.route)] = Histogram(LATENCY_BUCKETS)
+            latency.observe(elapsed)
+            counts = self._queries_per_request.get(stats.route)
+            if counts is None:
+                counts = self._queries_per_request[stats.route] = Histogram(QUERY_COUNT_BUCKETS)
+            counts.observe(stats.query_count)
+            if flagged:
+                self._flagged[stats.route] = self._flagged.get(stats.route, 0) + 1
+
+        if flagged:
+            print(f"⚠️  {method} {stats.route}: {stats.query_count} queries "
+                  f"(threshold {self.query_threshold}), DB {stats.db_time * 1000:.1f} ms, "
+                  f"slowest {stats.slowest_time * 1000:.1f} ms: {normalize_sql(stats.slowest_sql or '')}")
+        return stats
+
+    # Per query
+
+    def instrument(self, conn, role=None, pool=None):
+        """role/pool: asal koneksi (primary/replica), diteruskan ke slow log untuk EXPLAIN"""
+        return InstrumentedConnection(conn, self, (role, pool))
+
+    def record_query(self, sql, seconds):
+        stats = _current.get()
+        route = stats.route if stats is not None else NO_ROUTE
+        if stats is not None:
+            stats.query_count += 1
+            stats.db_time += seconds
+            stats.note(sql, seconds)
+        with self._lock:
+            self._statement_latency.observe(seconds)
+            totals = self._queries.get(route)
+            if totals is None:
+                totals = self._queries[route] = [0, 0.0]
+            totals[0] += 1
+            totals[1] += seconds
+
+    def record_fetch(self, sql, statement_time, seconds):
+        """Waktu fetch dihitung sebagai waktu DB milik statement terakhir cursor"""
+        stats = _current.get()
+        route = stats.route if stats is not None else NO_ROUTE
+        if stats is not None:
+            stats.db_time += seconds
+            stats.note(sql, statement_time)
+        with self._lock:
+            totals = self._queries.get(route)
+            if totals is None:
+                totals = self._queries[route] = [0, 0.0]
+            totals[1] += seconds
+
+    def statement_finished(self, sql, params, seconds, many=False, source=None):
+        """Durasi total satu statement (execute + semua fetch)"""
+        if self.slow_log is None or seconds < self.slow_log.threshold:
+            return
+        stats = _current.get()
+        role, pool = source or (None, None)
+        self.slow_log.record(sql, params, seconds, stats.route if stats is not None else NO_ROUTE, many,
+                             role=role, pool=pool)
+
+    # Ekspor
+
+    def add_collector(self, collector):
+        """collector() -> iterable (nama, tipe, help, nilai) dibaca saat render"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """Semua metrik dalam format teks Prometheus (0.0.4)"""
+        p = self.prefix
+        lines = []
+        with self._lock:
+            _family(lines, f'{p}_http_requests_total', 'counter', 'HTTP requests by route and status')
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'{p}_http_requests_total'
+                             f'{_labels(method=method, route=route, status=status)} {count}')
+
+            _family(lines, f'{p}_http_request_duration_seconds', 'histogram', 'HTTP request latency')
+            for (method, route), histogram in sorted(self._latency.items()):
+                _histogram(lines, f'{p}_http_request_duration_seconds', histogram,
+                           method=method, route=route)
+
+            _family(lines, f'{p}_db_queries_per_request', 'histogram', 'Database queries executed per request')
+            for route, histogram in sorted(self._queries_per_request.items()):
+                _histogram(lines, f'{p}_db_queries_per_request', histogram, route=route)
+
+            _family(lines, f'{p}_db_queries_total', 'counter', 'Database statements executed')
+            for route, (count, _) in sorted(self._queries.items()):
+                lines.append(f'{p}_db_queries_total{_labels(route=route)} {count}')
+
+            _family(lines, f'{p}_db_time_seconds_total', 'counter', 'Time spent in execute and fetch')
+            for route, (_, seconds) in sorted(self._queries.items()):
+                lines.append(f'{p}_db_time_seconds_total{_labels(route=route)} {_format_value(seconds)}')
+
+            _family(lines, f'{p}_db_statement_duration_seconds', 'histogram', 'Duration of a single execute')
+            _histogram(lines, f'{p}_db_statement_duration_seconds', self._statement_latency)
+
+            _family(lines, f'{p}_query_threshold_exceeded_total', 'counter',
+                    f'Requests running more than {self.query_threshold} queries (possible N+1)')
+            for route, count in sorted(self._flagged.items()):
+                lines.append(f'{p}_query_threshold_exceeded_total{_labels(route=route)} {count}')
+
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                print(f"❌ Metrics collector error: {e}")
+                continue
+            for name, kind, help_text, value in samples:
+                _family(lines, name, kind, help_text)
+                lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def pool_collector(pool, prefix='bakery'):
+    """Collector untuk db_pool.ConnectionPool.stats()"""
+    gauges = {
+        'size': 'Idle connections kept by the pool',
+        'max_overflow': 'Extra connections allowed above size',
+        'total': 'Open connections',
+        'in_use': 'Connections checked out',
+        'idle': 'Idle connections',
+        'waiting': 'Threads waiting for a connection',
+    }
+    counters = {
+        'checkouts': 'Connections handed out',
+        'timeouts': 'Checkouts that timed out',
+        'created': 'Connections opened',
+        'discarded': 'Connections closed as broken or surplus',
+        'leaks_detected': 'Checkouts held longer than leak_timeout',
+    }
+
+    def collect():
+        stats = pool.stats()
+        for key, help_text in gauges.items():
+            yield f'{prefix}_db_pool_{key}', 'gauge', help_text, stats[key]
+        for key, help_text in counters.items():
+            yield f'{prefix}_db_pool_{key}_total', 'counter', help_text, stats[key]
+        yield (f'{prefix}_db_pool_checkout_wait_avg_seconds', 'gauge', 'Average checkout wait',
+               stats['checkout_wait_avg_ms'] / 1000)
+        yield (f'{prefix}_db_pool_checkout_wait_max_seconds', 'gauge', 'Longest checkout wait',
+               stats['checkout_wait_max_ms'] / 1000)
+    return collect
+
+
+def router_collector(router, prefix='bakery'):
+    """Collector untuk db_router.DatabaseRouter.stats()"""
+    def collect():
+        stats = router.stats()
+        replicas = stats['replicas']
+        yield (f'{prefix}_db_replica_reads_total', 'counter', 'Reads served by a replica',
+               sum(replica['reads'] for replica in replicas))
+        yield (f'{prefix}_db_primary_reads_total', 'counter', 'Reads served by the primary',
+               stats['primary_reads'])
+        yield (f'{prefix}_db_read_your_writes_reads_total', 'counter',
+               'Reads pinned to the primary after a recent write', stats['pinned_reads'])
+        yield (f'{prefix}_db_read_fallbacks_total', 'counter',
+               'Reads sent to the primary because no replica was usable', stats['fallbacks'])
+        yield (f'{prefix}_db_replicas_healthy', 'gauge', 'Replicas currently in rotation',
+               sum(1 for replica in replicas if replica['healthy']))
+    return collect
+
+
+def _family(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def _histogram(lines, name, histogram, **labels):
+    for le, count in histogram.samples():
+        lines.append(f'{name}_bucket{_labels(**labels, le=le)} {count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {_format_value(histogram.sum)}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,389 @@
+"""Migrasi schema database bakery_system.
+
+Setiap migrasi punya nomor versi dan dijalankan sekali; versi yang sudah
+diterapkan dicatat di tabel schema_migrations.
+
+    python migrations.py                # terapkan migrasi yang belum jalan
+    python migrations.py --status       # tampilkan versi schema
+
+Query plan setiap route dicek oleh tests/test_query_plans.py (butuh MySQL),
+yang mengisi database benchmark dengan data realistis lebih dulu; pada tabel
+kosong optimizer MySQL memang memilih full scan.
+"""
+import sys
+
+
+class SchemaOutdated(Exception):
+    """Schema database lebih lama dari migrasi terakhir yang dibutuhkan app"""
+
+
+def ensure_index(cursor, table, name, columns, unique=False):
+    """Buat index jika belum ada index lain dengan kolom awal yang sama"""
+    cursor.execute("""
+        SELECT index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index) AS cols
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name
+    """, (table,))
+    wanted = ','.join(columns).lower()
+    for index_name, cols in cursor.fetchall():
+        if index_name == name or (cols or '').lower().startswith(wanted):
+            return False
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+    return True
+
+
+def _create_base_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            email VARCHAR(150) NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            role VARCHAR(20) NOT NULL DEFAULT 'kasir',
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_users_email (email)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(150) NOT NULL,
+            description TEXT,
+            price DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            stock INT NOT NULL DEFAULT 0,
+            category VARCHAR(100),
+            image_url VARCHAR(255),
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS customers (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(150) NOT NULL,
+            email VARCHAR(150),
+            phone VARCHAR(30),
+            address TEXT,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            customer_id INT NULL,
+            total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            payment_method VARCHAR(30) NOT NULL DEFAULT 'cash',
+            sale_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT fk_sales_customer FOREIGN KEY (customer_id)
+                REFERENCES customers (id) ON DELETE SET NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            sale_id INT NOT NULL,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            unit_price DECIMAL(12, 2) NOT NULL,
+            subtotal DECIMAL(12, 2) NOT NULL,
+            CONSTRAINT fk_sale_items_sale FOREIGN KEY (sale_id)
+                REFERENCES sales (id) ON DELETE CASCADE,
+            CONSTRAINT fk_sale_items_product FOREIGN KEY (product_id)
+                REFERENCES products (id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def _add_hot_query_indexes(cursor):
+    # Login & cek email register
+    ensure_index(cursor, 'users', 'idx_users_email', ['email'])
+    # Dashboard hari ini, export, keyset pagination GET /api/sales
+    ensure_index(cursor, 'sales', 'idx_sales_date_id', ['sale_date', 'id'])
+    ensure_index(cursor, 'sales', 'idx_sales_customer', ['customer_id'])
+    # Item per sale (batch IN) & per produk
+    ensure_index(cursor, 'sale_items', 'idx_sale_items_sale', ['sale_id'])
+    ensure_index(cursor, 'sale_items', 'idx_sale_items_product', ['product_id'])
+    # Low stock
+    ensure_index(cursor, 'products', 'idx_products_stock', ['stock'])
+    # Laporan pelanggan terbaru & daftar pelanggan urut nama
+    ensure_index(cursor, 'customers', 'idx_customers_created', ['created_at'])
+    ensure_index(cursor, 'customers', 'idx_customers_name', ['name'])
+
+
+def _create_rollup_tables(cursor):
+    # Diisi incremental oleh rollups.apply_rollups() di create_sale / sales batch
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_hourly (
+            bucket DATETIME NOT NULL PRIMARY KEY,
+            sale_count INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14, 2) NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_daily (
+            day DATE NOT NULL PRIMARY KEY,
+            sale_count INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            items_sold INT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales_monthly (
+            month DATE NOT NULL PRIMARY KEY,
+            sale_count INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            items_sold INT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_sales_daily (
+            day DATE NOT NULL,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, product_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS payment_method_daily (
+            day DATE NOT NULL,
+            payment_method VARCHAR(30) NOT NULL,
+            sale_count INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, payment_method)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    # Grafik per produk
+    ensure_index(cursor, 'product_sales_daily', 'idx_product_sales_daily_product', ['product_id', 'day'])
+
+    _fill_rollups(cursor)
+
+
+def _fill_rollups(cursor):
+    # Riwayat sales yang sudah ada ikut dijumlahkan, agar laporan & velocity tidak nol
+    from rollups import rebuild_all
+
+    months = rebuild_all(cursor)
+    if months:
+        print(f"✅ Rollups filled from existing sales ({months} months)")
+
+
+def _fill_customer_stats(cursor):
+    from customer_stats import rebuild_all
+
+    customers = rebuild_all(cursor)
+    if customers:
+        print(f"✅ Customer aggregates filled from existing sales ({customers} customers)")
+
+
+def _create_customer_stats_tables(cursor):
+    # Diisi incremental oleh customer_stats.apply_customer_stats() di create_sale
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS customer_stats (
+            customer_id INT NOT NULL PRIMARY KEY,
+            sale_count INT NOT NULL DEFAULT 0,
+            total_spent DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            first_purchase DATETIME NOT NULL,
+            last_purchase DATETIME NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS customer_sales_daily (
+            day DATE NOT NULL,
+            customer_id INT NOT NULL,
+            sale_count INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, customer_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+    _fill_customer_stats(cursor)
+
+
+def _create_stock_ledger(cursor):
+    # Lihat stock_ledger.py: pergerakan append-only + delta per shard di atas products.stock
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            product_id INT NOT NULL,
+            quantity INT NOT NULL,
+            kind VARCHAR(20) NOT NULL,
+            reason VARCHAR(255) NULL,
+            user_id INT NULL,
+            sale_id INT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_stock_movements_product (product_id, id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_deltas (
+            product_id INT NOT NULL,
+            shard TINYINT NOT NULL,
+            delta INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (product_id, shard)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("""
+        CREATE OR REPLACE VIEW products_current AS
+        SELECT p.id, p.name, p.description, p.price,
+               p.stock + COALESCE((SELECT SUM(d.delta) FROM stock_deltas d WHERE d.product_id = p.id), 0)
+                   AS stock,
+               p.category, p.image_url, p.created_at, p.updated_at
+        FROM products p
+    """)
+    # Saldo awal supaya SUM(quantity) ledger = stok
+    cursor.execute("""
+        INSERT INTO stock_movements (product_id, quantity, kind, reason)
+        SELECT p.id, p.stock, 'opening', 'Saldo awal ledger stok' FROM products p
+        WHERE NOT EXISTS (SELECT 1 FROM stock_movements m WHERE m.product_id = p.id)
+    """)
+
+
+def _shard_rollup_tables(cursor):
+    # Sama seperti stock_deltas: tiap sale menambah ke satu dari rollups.SHARDS baris
+    # per bucket, dibaca dengan SUM, agar kasir paralel tidak antre di satu baris rollup
+    from rollups import ROLLUP_COLUMNS
+
+    for table, (keys, _) in ROLLUP_COLUMNS.items():
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = 'shard'
+        """, (table,))
+        if cursor.fetchone()[0]:
+            continue
+        cursor.execute(
+            f"ALTER TABLE {table} ADD COLUMN shard TINYINT NOT NULL DEFAULT 0, "
+            f"DROP PRIMARY KEY, ADD PRIMARY KEY ({', '.join(keys)}, shard)"
+        )
+
+
+def _fill_missing_aggregates(cursor):
+    # Versi 3/4 lama hanya mencetak perintah backfill; isi jika jumlahnya belum cocok dengan sales
+    cursor.execute("SELECT COUNT(*) FROM sales")
+    sales = cursor.fetchone()[0]
+    cursor.execute("SELECT COALESCE(SUM(sale_count), 0) FROM sales_daily")
+    if int(cursor.fetchone()[0]) != sales:
+        _fill_rollups(cursor)
+    cursor.execute("SELECT COUNT(*) FROM sales WHERE customer_id IS NOT NULL")
+    sales = cursor.fetchone()[0]
+    cursor.execute("SELECT COALESCE(SUM(sale_count), 0) FROM customer_stats")
+    if int(cursor.fetchone()[0]) != sales:
+        _fill_customer_stats(cursor)
+
+
+def _drop_folded_stock_deltas(cursor):
+    # Compactor lama hanya meng-nol-kan baris shard; sekarang baris yang dilipat dihapus
+    cursor.execute("DELETE FROM stock_deltas WHERE delta = 0")
+
+
+def _create_token_revocations(cursor):
+    # Lihat token_cache.py: denylist yang terlihat oleh semua worker, dicek saat cache miss
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS token_revocations (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            token_digest CHAR(64) NULL,
+            user_id INT NULL,
+            revoked_at DOUBLE NOT NULL,
+            expires_at DOUBLE NOT NULL,
+            KEY idx_token_revocations_digest (token_digest),
+            KEY idx_token_revocations_user (user_id, revoked_at),
+            KEY idx_token_revocations_expires (expires_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+# (versi, deskripsi, fungsi(cursor)) - JANGAN ubah migrasi yang sudah dirilis,
+# tambahkan versi baru di bawah
+MIGRATIONS = [
+    (1, 'base tables', _create_base_tables),
+    (2, 'indexes for hot route queries', _add_hot_query_indexes),
+    (3, 'sales rollup tables', _create_rollup_tables),
+    (4, 'customer aggregate tables', _create_customer_stats_tables),
+    (5, 'stock ledger and sharded stock counters', _create_stock_ledger),
+    (6, 'sharded sales rollup rows', _shard_rollup_tables),
+    (7, 'fill rollups and customer aggregates left empty', _fill_missing_aggregates),
+    (8, 'drop folded stock delta rows', _drop_folded_stock_deltas),
+    (9, 'shared token revocation list', _create_token_revocations),
+]
+
+
+def current_version(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cursor.fetchone()[0]
+
+
+def schema_version(cursor):
+    """Versi schema tanpa membuat tabel apa pun (0 jika belum pernah migrasi)"""
+    try:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        return cursor.fetchone()[0]
+    except Exception:
+        return 0
+
+
+def check_schema(conn):
+    """Raise SchemaOutdated jika masih ada migrasi yang belum dijalankan"""
+    cursor = conn.cursor()
+    try:
+        version = schema_version(cursor)
+    finally:
+        cursor.close()
+        conn.rollback()     # Akhiri transaksi baca implisit
+    latest = MIGRATIONS[-1][0]
+    if version < latest:
+        raise SchemaOutdated(f"Database schema is at version {version}, app needs {latest}; "
+                             f"run 'python migrations.py' first")
+
+
+def migrate(conn):
+    """Terapkan semua migrasi yang belum jalan, return daftar versi yang diterapkan"""
+    cursor = conn.cursor()
+    applied = []
+    try:
+        version = current_version(cursor)
+        for number, description, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            # DDL MySQL auto-commit, jadi tiap migrasi harus idempotent
+            apply(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (number, description)
+            )
+            conn.commit()
+            applied.append(number)
+            print(f"✅ Migration {number}: {description}")
+    finally:
+        cursor.close()
+    return applied
+
+
+def main(argv):
+    import mysql.connector
+    from app import get_db_config
+
+    conn = mysql.connector.connect(**get_db_config())
+    try:
+        if '--status' in argv:
+            cursor = conn.cursor()
+            print(f"Schema version: {current_version(cursor)} (latest {MIGRATIONS[-1][0]})")
+            cursor.close()
+            return 0
+        if not migrate(conn):
+            print("✅ Schema already up to date")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
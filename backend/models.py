@@ -0,0 +1,60 @@
+"""Record ringan untuk baris database.
+
+Dataclass dengan __slots__ (tanpa __dict__ per objek) jauh lebih hemat memori
+dibanding dict per baris, dan orjson bisa meng-encode dataclass langsung
+tanpa membuat dict perantara. Nilai disimpan sudah dalam bentuk siap-JSON
+(float, int, string tanggal ISO); lihat serializers.RowSchema.load.
+"""
+from dataclasses import dataclass
+
+
+@dataclass
+class Product:
+    __slots__ = ('id', 'name', 'description', 'price', 'stock', 'category',
+                 'image_url', 'created_at', 'updated_at')
+    id: int
+    name: str
+    description: str
+    price: float
+    stock: int
+    category: str
+    image_url: str
+    created_at: str
+    updated_at: str
+
+
+@dataclass
+class Customer:
+    __slots__ = ('id', 'name', 'email', 'phone', 'address', 'created_at')
+    id: int
+    name: str
+    email: str
+    phone: str
+    address: str
+    created_at: str
+
+
+@dataclass
+class SaleItem:
+    __slots__ = ('id', 'sale_id', 'product_id', 'quantity', 'unit_price', 'subtotal',
+                 'product_name')
+    id: int
+    sale_id: int
+    product_id: int
+    quantity: int
+    unit_price: float
+    subtotal: float
+    product_name: str
+
+
+@dataclass
+class Sale:
+    __slots__ = ('id', 'customer_id', 'total_amount', 'payment_method', 'sale_date',
+                 'customer_name', 'items')
+    id: int
+    customer_id: int
+    total_amount: float
+    payment_method: str
+    sale_date: str
+    customer_name: str
+    items: list
@@ -0,0 +1,146 @@
+"""Hashing password bcrypt di process pool terpisah.
+
+bcrypt sengaja berat di CPU; menjalankannya di thread request Flask membuat
+request lain ikut tertahan saat semua kasir login bersamaan. Di sini jumlah
+pekerjaan yang boleh antre dibatasi: jika penuh, HasherBusy langsung
+dilempar supaya route bisa menjawab 503 daripada menumpuk.
+
+Worker dibuat lewat forkserver (spawn di Windows), bukan fork: fork dari
+proses Flask yang sudah punya thread (pool DB, health check, SSE) bisa
+mewariskan lock yang sedang dipegang dan membuat worker macet.
+"""
+import hashlib
+import hmac
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+_BCRYPT_RE = re.compile(r'^\$2[aby]?\$(\d{2})\$')
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class HasherBusy(Exception):
+    """Antrian hashing penuh atau pekerjaan melewati batas waktu"""
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _bcrypt_hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _bcrypt_check(password, hashed):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:
+        return False
+
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=8, rounds=12, timeout=5.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def hash(self, password):
+        """Hash bcrypt dengan work factor saat ini"""
+        return self._run(_bcrypt_hash, password, self.rounds)
+
+    def verify(self, password, hashed):
+        """Cek password terhadap hash bcrypt, atau hash sha256 lama"""
+        if not hashed:
+            return False
+        if _SHA256_RE.match(hashed):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, hashed)
+        return self._run(_bcrypt_check, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """True untuk hash sha256 lama atau bcrypt dengan work factor berbeda"""
+        match = _BCRYPT_RE.match(hashed or '')
+        return match is None or int(match.group(1)) != self.rounds
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'workers': self.workers,
+                'rounds': self.rounds,
+                'max_pending': self.max_pending,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected
+            }
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._rejected += 1
+            raise HasherBusy('Password hashing queue is full')
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard_executor(executor)
+            raise HasherBusy('Password hashing worker died')
+        except Exception:
+            self._slots.release()
+            raise
+        with self._stats_lock:
+            self._in_flight += 1
+        # Slot baru dilepas saat pekerjaan benar-benar selesai di worker,
+        # termasuk pekerjaan yang sudah ditinggal karena timeout
+        future.add_done_callback(self._job_done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._stats_lock:
+                self._rejected += 1
+            raise HasherBusy('Password hashing timed out')
+        except BrokenProcessPool:
+            # Worker mati (OOM, crash): pool ini tidak bisa dipakai lagi,
+            # request berikutnya membuat pool baru
+            self._discard_executor(executor)
+            raise HasherBusy('Password hashing worker died')
+
+    def _job_done(self, future):
+        with self._stats_lock:
+            self._in_flight -= 1
+            if not future.cancelled():
+                self._completed += 1
+        self._slots.release()
+
+    def _discard_executor(self, executor):
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self):
+        # Dibuat saat pertama dipakai, agar reloader Flask tidak spawn proses dobel
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+            return self._executor
@@ -0,0 +1,366 @@
+"""Rollup penjualan yang diperbarui incremental saat sale disimpan.
+
+Tabel (migrations.py versi 3):
+- sales_hourly / sales_daily / sales_monthly: transaksi & omzet per jam/hari/bulan
+- product_sales_daily: unit & omzet per produk per hari
+- payment_method_daily: transaksi & omzet per metode pembayaran per hari
+
+apply_rollups() dijalankan di transaksi yang sama dengan INSERT sales, jadi
+rollup selalu konsisten dengan tabel sales. Seperti stock_deltas, setiap
+bucket punya hingga SHARDS baris (kolom shard, migrasi 6): satu transaksi
+menambah ke satu shard acak dan query laporan menjumlahkan semua shard,
+sehingga kasir paralel tidak antre di baris jam/hari yang sama.
+Riwayat yang sudah ada diisi saat migrasi; untuk menghitung ulang (ke shard 0):
+
+    python rollups.py --backfill                                # seluruh riwayat
+    python rollups.py --backfill --from 2024-01-01 --to 2024-06-30
+
+Backfill berjalan per bulan (satu transaksi per bulan); sebaiknya dijalankan
+saat toko sepi karena baris sales di bulan tersebut ikut terkunci.
+"""
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+SHARDS = 8
+
+# tabel -> (kolom kunci, kolom yang dijumlahkan); urutan ini juga urutan lock
+ROLLUP_COLUMNS = {
+    'sales_hourly': (('bucket',), ('sale_count', 'revenue')),
+    'sales_daily': (('day',), ('sale_count', 'revenue', 'items_sold')),
+    'sales_monthly': (('month',), ('sale_count', 'revenue', 'items_sold')),
+    'payment_method_daily': (('day', 'payment_method'), ('sale_count', 'revenue')),
+    'product_sales_daily': (('day', 'product_id'), ('quantity', 'revenue')),
+}
+
+# Batas titik per permintaan grafik
+MAX_POINTS = {'hour': 24 * 93, 'day': 3660, 'month': 1200}
+
+
+def aggregate(sales):
+    """Jumlahkan sales per bucket.
+
+    sales: iterable (sale_date, total_amount, payment_method, items) dengan
+    items berisi (product_id, quantity, subtotal). Return tabel -> {kunci: [nilai]}.
+    """
+    tables = {table: {} for table in ROLLUP_COLUMNS}
+    for sale_date, total_amount, payment_method, items in sales:
+        # Jam dinding seperti yang tersimpan di kolom DATETIME
+        sale_date = sale_date.replace(tzinfo=None)
+        day = sale_date.date()
+        total_amount = float(total_amount)
+        units = 0
+        for product_id, quantity, subtotal in items:
+            units += quantity
+            _add(tables['product_sales_daily'], (day, product_id), quantity, float(subtotal))
+        _add(tables['sales_hourly'], (sale_date.replace(minute=0, second=0, microsecond=0),), 1, total_amount)
+        _add(tables['sales_daily'], (day,), 1, total_amount, units)
+        _add(tables['sales_monthly'], (day.replace(day=1),), 1, total_amount, units)
+        _add(tables['payment_method_daily'], (day, payment_method), 1, total_amount)
+    return tables
+
+
+def _add(table, key, *values):
+    row = table.get(key)
+    if row is None:
+        table[key] = list(values)
+    else:
+        for index, value in enumerate(values):
+            row[index] += value
+
+
+def rollup_rows(rows):
+    """Baris siap insert (kunci + nilai), urut kunci"""
+    return [key + tuple(round(value, 2) if isinstance(value, float) else value for value in rows[key])
+            for key in sorted(rows)]
+
+
+def apply_rollups(cursor, sales):
+    """Tambahkan sales ke semua rollup (satu upsert per tabel, dalam transaksi pemanggil)"""
+    # Satu shard per transaksi, tabel & baris urut kunci: urutan lock selalu sama
+    shard = random.randrange(SHARDS)
+    for table, rows in aggregate(sales).items():
+        if not rows:
+            continue
+        keys, values = ROLLUP_COLUMNS[table]
+        columns = keys + ('shard',) + values
+        row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        updates = ', '.join(f"{column} = {column} + VALUES({column})" for column in values)
+        params = [value for row in rollup_rows(rows)
+                  for value in row[:len(keys)] + (shard,) + row[len(keys):]]
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES {', '.join([row_placeholder] * len(rows))} "
+            f"ON DUPLICATE KEY UPDATE {updates}",
+            params
+        )
+
+
+# Backfill
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def backfill(conn, start=None, end=None):
+    """Hitung ulang rollup dari sales untuk bulan-bulan yang mencakup [start, end].
+
+    start/end: date (inklusif), default seluruh riwayat. Return jumlah bulan.
+    """
+    cursor = conn.cursor()
+    try:
+        if start is None or end is None:
+            sales_range = _sales_range(cursor)
+            conn.commit()   # Akhiri transaksi baca implisit sebelum start_transaction
+            if sales_range is None:
+                return 0
+            start = start or sales_range[0]
+            end = end or sales_range[1]
+
+        months = 0
+        month = _month_start(start)
+        while month <= end:
+            following = _next_month(month)
+            conn.start_transaction()
+            try:
+                _backfill_month(cursor, month, following)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            months += 1
+            print(f"✅ Rollups rebuilt for {month:%Y-%m}")
+            month = following
+        return months
+    finally:
+        cursor.close()
+
+
+def rebuild_all(cursor):
+    """Hitung ulang seluruh rollup dalam transaksi pemanggil (dipakai migrasi), return jumlah bulan"""
+    sales_range = _sales_range(cursor)
+    if sales_range is None:
+        return 0
+    months = 0
+    month = _month_start(sales_range[0])
+    while month <= sales_range[1]:
+        following = _next_month(month)
+        _backfill_month(cursor, month, following)
+        months += 1
+        month = following
+    return months
+
+
+def _sales_range(cursor):
+    """(tanggal sale pertama, terakhir) atau None jika belum ada sale"""
+    cursor.execute("SELECT MIN(sale_date), MAX(sale_date) FROM sales")
+    first, last = cursor.fetchone()
+    if first is None:
+        return None
+    return first.date(), last.date()
+
+
+def _backfill_month(cursor, month, following):
+    period = (month, following)
+    for table, column in (('sales_hourly', 'bucket'), ('sales_daily', 'day'),
+                          ('payment_method_daily', 'day'), ('product_sales_daily', 'day')):
+        cursor.execute(f"DELETE FROM {table} WHERE {column} >= %s AND {column} < %s", period)
+    cursor.execute("DELETE FROM sales_monthly WHERE month = %s", (month,))
+
+    cursor.execute("""
+        INSERT INTO sales_hourly (bucket, sale_count, revenue)
+        SELECT TIMESTAMP(DATE(sale_date), MAKETIME(HOUR(sale_date), 0, 0)) AS bucket,
+               COUNT(*), SUM(total_amount)
+        FROM sales
+        WHERE sale_date >= %s AND sale_date < %s
+        GROUP BY bucket
+    """, period)
+    cursor.execute("""
+        INSERT INTO payment_method_daily (day, payment_method, sale_count, revenue)
+        SELECT DATE(sale_date) AS day, payment_method, COUNT(*), SUM(total_amount)
+        FROM sales
+        WHERE sale_date >= %s AND sale_date < %s
+        GROUP BY day, payment_method
+    """, period)
+    cursor.execute("""
+        INSERT INTO product_sales_daily (day, product_id, quantity, revenue)
+        SELECT DATE(s.sale_date) AS day, si.product_id, SUM(si.quantity), SUM(si.subtotal)
+        FROM sales s
+        JOIN sale_items si ON si.sale_id = s.id
+        WHERE s.sale_date >= %s AND s.sale_date < %s
+        GROUP BY day, si.product_id
+    """, period)
+    # Harian & bulanan diturunkan dari rollup yang lebih kecil
+    cursor.execute("""
+        INSERT INTO sales_daily (day, sale_count, revenue, items_sold)
+        SELECT h.day, h.sale_count, h.revenue, COALESCE(p.items_sold, 0)
+        FROM (
+            SELECT DATE(bucket) AS day, SUM(sale_count) AS sale_count, SUM(revenue) AS revenue
+            FROM sales_hourly
+            WHERE bucket >= %s AND bucket < %s
+            GROUP BY DATE(bucket)
+        ) h
+        LEFT JOIN (
+            SELECT day, SUM(quantity) AS items_sold
+            FROM product_sales_daily
+            WHERE day >= %s AND day < %s
+            GROUP BY day
+        ) p ON p.day = h.day
+    """, period + period)
+    cursor.execute("""
+        INSERT INTO sales_monthly (month, sale_count, revenue, items_sold)
+        SELECT %s, SUM(sale_count), SUM(revenue), SUM(items_sold)
+        FROM sales_daily
+        WHERE day >= %s AND day < %s
+        HAVING COUNT(*) > 0
+    """, (month,) + period)
+
+
+# Query laporan
+
+def _periods(granularity, start, end):
+    """Semua awal bucket dalam [start, end] (end inklusif, tanggal)"""
+    if granularity == 'hour':
+        current = datetime.combine(start, datetime.min.time())
+        stop = datetime.combine(end + timedelta(days=1), datetime.min.time())
+        while current < stop:
+            yield current
+            current += timedelta(hours=1)
+    elif granularity == 'day':
+        current = start
+        while current <= end:
+            yield current
+            current += timedelta(days=1)
+    else:
+        current = _month_start(start)
+        while current <= end:
+            yield current
+            current = _next_month(current)
+
+
+def _period_count(granularity, start, end):
+    days = (end - start).days + 1
+    if granularity == 'hour':
+        return days * 24
+    if granularity == 'day':
+        return days
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def revenue_series(cursor, granularity, start, end):
+    """Omzet per jam/hari/bulan dalam [start, end]; bucket tanpa penjualan diisi 0"""
+    if granularity not in MAX_POINTS:
+        raise ValueError('granularity must be one of hour, day, month')
+    if end < start:
+        raise ValueError('"from" must not be after "to"')
+    if _period_count(granularity, start, end) > MAX_POINTS[granularity]:
+        raise ValueError(f'Range too large for granularity "{granularity}" '
+                         f'(max {MAX_POINTS[granularity]} points)')
+
+    if granularity == 'hour':
+        cursor.execute("""
+            SELECT bucket, SUM(sale_count), SUM(revenue), NULL FROM sales_hourly
+            WHERE bucket >= %s AND bucket < %s GROUP BY bucket ORDER BY bucket
+        """, (start, end + timedelta(days=1)))
+    elif granularity == 'day':
+        cursor.execute("""
+            SELECT day, SUM(sale_count), SUM(revenue), SUM(items_sold) FROM sales_daily
+            WHERE day >= %s AND day <= %s GROUP BY day ORDER BY day
+        """, (start, end))
+    else:
+        cursor.execute("""
+            SELECT month, SUM(sale_count), SUM(revenue), SUM(items_sold) FROM sales_monthly
+            WHERE month >= %s AND month <= %s GROUP BY month ORDER BY month
+        """, (_month_start(start), end))
+    found = {period: (count, revenue, items) for period, count, revenue, items in cursor.fetchall()}
+
+    series = []
+    for period in _periods(granularity, start, end):
+        count, revenue, items = found.get(period, (0, 0, 0))
+        point = {
+            'period': period.isoformat(sep=' ') if granularity == 'hour' else period.isoformat(),
+            'sale_count': int(count),
+            'revenue': float(revenue),
+        }
+        if granularity != 'hour':
+            point['items_sold'] = int(items or 0)
+        series.append(point)
+    return series
+
+
+def top_products(cursor, start, end, limit=10):
+    cursor.execute("""
+        SELECT r.product_id, p.name, SUM(r.quantity) AS quantity, SUM(r.revenue) AS revenue
+        FROM product_sales_daily r
+        LEFT JOIN products p ON p.id = r.product_id
+        WHERE r.day >= %s AND r.day <= %s
+        GROUP BY r.product_id, p.name
+        ORDER BY revenue DESC
+        LIMIT %s
+    """, (start, end, limit))
+    return [{
+        'product_id': product_id,
+        'product_name': name,
+        'quantity': int(quantity),
+        'revenue': float(revenue)
+    } for product_id, name, quantity, revenue in cursor.fetchall()]
+
+
+def product_series(cursor, product_id, start, end):
+    if (end - start).days + 1 > MAX_POINTS['day']:
+        raise ValueError(f"Range too large (max {MAX_POINTS['day']} days)")
+    cursor.execute("""
+        SELECT day, SUM(quantity), SUM(revenue) FROM product_sales_daily
+        WHERE product_id = %s AND day >= %s AND day <= %s GROUP BY day ORDER BY day
+    """, (product_id, start, end))
+    found = {day: (quantity, revenue) for day, quantity, revenue in cursor.fetchall()}
+    series = []
+    for day in _periods('day', start, end):
+        quantity, revenue = found.get(day, (0, 0))
+        series.append({'period': day.isoformat(), 'quantity': int(quantity), 'revenue': float(revenue)})
+    return series
+
+
+def payment_method_totals(cursor, start, end):
+    cursor.execute("""
+        SELECT payment_method, SUM(sale_count) AS sale_count, SUM(revenue) AS revenue
+        FROM payment_method_daily
+        WHERE day >= %s AND day <= %s
+        GROUP BY payment_method
+        ORDER BY revenue DESC
+    """, (start, end))
+    return [{
+        'payment_method': method,
+        'sale_count': int(count),
+        'revenue': float(revenue)
+    } for method, count, revenue in cursor.fetchall()]
+
+
+def main(argv):
+    import mysql.connector
+    from app import get_db_config
+
+    if '--backfill' not in argv:
+        print(__doc__)
+        return 1
+
+    def option(name):
+        if name in argv:
+            return datetime.strptime(argv[argv.index(name) + 1], '%Y-%m-%d').date()
+        return None
+
+    conn = mysql.connector.connect(**get_db_config())
+    try:
+        months = backfill(conn, option('--from'), option('--to'))
+        print(f"✅ Backfill done ({months} months)")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
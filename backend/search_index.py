@@ -0,0 +1,314 @@
+"""Index pencarian di memori untuk produk dan pelanggan.
+
+Teks dinormalisasi (aksen dibuang, huruf kecil), dipecah menjadi token, lalu
+dimasukkan ke dua struktur:
+
+- trie prefix: setiap node menyimpan dokumen yang punya token berawalan
+  prefix tersebut (dengan bobot field terbaik), sehingga typeahead cukup
+  berjalan sepanjang query tanpa memindai subtree
+- inverted index token -> dokumen, untuk bonus kecocokan kata utuh
+
+Semua kata di query harus cocok (AND, masing-masing sebagai prefix). Hasil
+diurutkan berdasarkan skor (bobot field; kata utuh dihitung dua kali),
+lalu nama terpendek. Hasil per query di-cache sampai index berubah.
+
+Index diperbarui langsung oleh route yang membuat/mengubah data dan
+dibangun ulang dari database saat startup serta tiap refresh_interval
+detik (perubahan dari worker lain). Rebuild berkala berjalan di thread
+latar; selama itu pencarian tetap memakai index lama.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from serializers import money
+
+TOKEN = re.compile(r'[^\W_]+')
+
+PRODUCT_FIELDS = {'name': 3, 'category': 2, 'description': 1}
+PRODUCT_RESULT = ('id', 'name', 'category', 'price')
+CUSTOMER_FIELDS = {'name': 3, 'phone': 2, 'email': 2}
+CUSTOMER_RESULT = ('id', 'name', 'phone', 'email')
+KINDS = ('products', 'customers')
+RETRY_DELAY = 5.0   # Jeda sebelum rebuild yang gagal dicoba lagi
+
+
+def normalize(text):
+    """'Bolu Pandan Crème' -> 'bolu pandan creme'"""
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text):
+    if not text:
+        return []
+    tokens = TOKEN.findall(normalize(str(text)))
+    digits = ''.join(token for token in tokens if token.isdigit())
+    if len(tokens) > 1 and digits and len(digits) == sum(len(token) for token in tokens):
+        # Nomor telepon "0812-3456 789" juga bisa dicari tanpa pemisah
+        tokens.append(digits)
+    return tokens
+
+
+class TrieNode:
+    __slots__ = ('children', 'docs')
+
+    def __init__(self):
+        self.children = {}
+        self.docs = {}      # doc_id -> bobot terbaik token dengan prefix ini
+
+
+class SearchIndex:
+    def __init__(self, fields, result_fields):
+        """fields: {nama field: bobot}; result_fields: field yang dikembalikan di hasil"""
+        self.fields = fields
+        self.result_fields = result_fields
+        self._stored = tuple(dict.fromkeys((*fields, *result_fields)))
+        self._root = TrieNode()
+        self._tokens = {}       # token -> {doc_id: bobot}
+        self._docs = {}         # doc_id -> (record, hasil, {token: bobot}, panjang nama)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc_id, record):
+        """Tambah/ganti dokumen; record berisi field index + field hasil"""
+        if doc_id in self._docs:
+            self.remove(doc_id)
+        weights = {}
+        for field, weight in self.fields.items():
+            for token in tokenize(record.get(field)):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+        for token, weight in weights.items():
+            self._tokens.setdefault(token, {})[doc_id] = weight
+            node = self._root
+            for char in token:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = TrieNode()
+                node = child
+                if node.docs.get(doc_id, 0) < weight:
+                    node.docs[doc_id] = weight
+        record = {field: record.get(field) for field in self._stored}
+        record['id'] = doc_id
+        result = {field: record[field] for field in self.result_fields}
+        self._docs[doc_id] = (record, result, weights, len(record.get('name') or ''))
+
+    def update(self, doc_id, changes):
+        """Gabungkan perubahan sebagian ke dokumen yang sudah ada"""
+        entry = self._docs.get(doc_id)
+        if entry is None:
+            return False
+        self.add(doc_id, {**entry[0], **changes})
+        return True
+
+    def remove(self, doc_id):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        for token in entry[2]:
+            docs = self._tokens[token]
+            del docs[doc_id]
+            if not docs:
+                del self._tokens[token]
+            path = []
+            node = self._root
+            for char in token:
+                child = node.children[char]
+                child.docs.pop(doc_id, None)
+                path.append((node, char, child))
+                node = child
+            # Buang node yang sudah kosong (dari bawah)
+            for parent, char, child in reversed(path):
+                if child.docs or child.children:
+                    break
+                del parent.children[char]
+
+    def search(self, query, limit=10):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        matches = []
+        for term in terms:
+            node = self._root
+            for char in term:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            matches.append((term, node.docs))
+
+        docs = self._docs
+        if len(matches) == 1:
+            term, candidates = matches[0]
+            exact = self._tokens.get(term, {})
+            scores = {doc_id: weight + exact.get(doc_id, 0) for doc_id, weight in candidates.items()}
+        else:
+            matches.sort(key=lambda match: len(match[1]))
+            scores = {}
+            for doc_id in matches[0][1]:
+                score = 0
+                for term, candidates in matches:
+                    weight = candidates.get(doc_id)
+                    if weight is None:
+                        break
+                    score += weight + self._tokens.get(term, {}).get(doc_id, 0)
+                else:
+                    scores[doc_id] = score
+
+        best = heapq.nsmallest(limit, scores, key=lambda doc_id: (-scores[doc_id], docs[doc_id][3], doc_id))
+        return [docs[doc_id][1] for doc_id in best]
+
+
+class SearchUnavailable(Exception):
+    """Index belum pernah selesai dibangun (rebuild pertama masih berjalan/gagal)"""
+
+
+class SearchService:
+    """Index produk + pelanggan dengan rebuild berkala dan cache hasil query"""
+
+    def __init__(self, connection_factory, refresh_interval=300, cache_size=1024):
+        self._connection_factory = connection_factory
+        self.refresh_interval = refresh_interval
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._built_at = 0.0
+        self._indexes = None
+        self._cache = OrderedDict()     # (kind, query, limit) -> hasil (LRU)
+        self._generation = 0            # Naik tiap invalidate()
+        self._pending = None            # Update incremental selama rebuild berjalan
+        self._thread = None
+        self._retry_at = 0.0
+        self._last_error = None
+
+    def rebuild(self, blocking=True):
+        """Bangun ulang kedua index dari database lalu tukar sekaligus"""
+        if not self._rebuild_lock.acquire(blocking=blocking):
+            return
+        try:
+            with self._lock:
+                generation = self._generation
+                self._pending = []
+            try:
+                indexes = self._load()
+            except BaseException:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            with self._lock:
+                # Update dari route yang commit setelah data dibaca jangan sampai hilang
+                for kind, method, args in self._pending:
+                    getattr(indexes[kind], method)(*args)
+                self._pending = None
+                self._indexes = indexes
+                self._cache.clear()
+                # invalidate() selama rebuild: data yang dibaca mungkin sudah basi
+                self._built_at = time.monotonic() if generation == self._generation else 0.0
+                self._last_error = None
+        finally:
+            self._rebuild_lock.release()
+
+    def _load(self):
+        with self._connection_factory() as conn:
+            if not conn:
+                raise RuntimeError('Database connection failed')
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name, category, description, price FROM products")
+            products = cursor.fetchall()
+            cursor.execute("SELECT id, name, phone, email FROM customers")
+            customers = cursor.fetchall()
+            cursor.close()
+
+        indexes = {'products': SearchIndex(PRODUCT_FIELDS, PRODUCT_RESULT),
+                   'customers': SearchIndex(CUSTOMER_FIELDS, CUSTOMER_RESULT)}
+        for product_id, name, category, description, price in products:
+            indexes['products'].add(product_id, {
+                'name': name, 'category': category, 'description': description,
+                'price': money(price)})
+        for customer_id, name, phone, email in customers:
+            indexes['customers'].add(customer_id, {'name': name, 'phone': phone, 'email': email})
+        return indexes
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild(blocking=False)
+        except Exception as e:
+            with self._lock:
+                self._last_error = str(e)
+                self._retry_at = time.monotonic() + RETRY_DELAY
+            print(f"⚠️ Search index rebuild failed, serving cached index: {e}")
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        with self._lock:
+            stale = self._indexes is None or now - self._built_at >= self.refresh_interval
+            if stale and now >= self._retry_at and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._rebuild_in_background,
+                                                name='search-index-rebuild', daemon=True)
+                self._thread.start()
+            if self._indexes is None:
+                raise SearchUnavailable(self._last_error or 'Search index is being built')
+
+    def search(self, query, kind='all', limit=10):
+        """{'products': [...], 'customers': [...]} untuk kind 'all', selain itu satu kind saja"""
+        if kind != 'all' and kind not in KINDS:
+            raise ValueError('type must be one of all, products, customers')
+        self._ensure_fresh()
+        kinds = KINDS if kind == 'all' else (kind,)
+        key = (kind, normalize(query).strip(), limit)
+        with self._lock:
+            results = self._cache.get(key)
+            if results is not None:
+                self._cache.move_to_end(key)
+                return results
+            results = {name: self._indexes[name].search(query, limit) for name in kinds}
+            self._cache[key] = results
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return results
+
+    # Update incremental (dipanggil setelah commit)
+
+    def _apply(self, kind, method, *args):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((kind, method, args))
+            if self._indexes is None:
+                return
+            getattr(self._indexes[kind], method)(*args)
+            self._cache.clear()
+
+    def product_saved(self, product_id, record):
+        self._apply('products', 'add', product_id, record)
+
+    def product_changed(self, product_id, changes):
+        self._apply('products', 'update', product_id, changes)
+
+    def customer_saved(self, customer_id, record):
+        self._apply('customers', 'add', customer_id, record)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = 0.0
+            self._retry_at = 0.0
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            rebuilding = self._thread is not None and self._thread.is_alive()
+            if self._indexes is None:
+                return {'built': False, 'rebuilding': rebuilding, 'last_error': self._last_error}
+            return {
+                'built': True,
+                'rebuilding': rebuilding,
+                'products': len(self._indexes['products']),
+                'customers': len(self._indexes['customers']),
+                'cached_queries': len(self._cache),
+                'last_error': self._last_error,
+            }
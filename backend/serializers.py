@@ -0,0 +1,198 @@
+"""Serialisasi baris database ke JSON.
+
+Setiap tabel punya RowSchema: daftar kolom + konversinya + record class
+(models.py). Schema dikompilasi menjadi satu fungsi Python yang membaca
+tuple dari cursor (bukan dict) langsung ke record siap-JSON, menggantikan
+loop format per route.
+
+orjson dipakai jika terpasang (jauh lebih cepat dari json bawaan);
+tanpa orjson semuanya tetap jalan dengan json standar.
+"""
+import json
+from dataclasses import asdict, fields as record_fields, is_dataclass
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson opsional
+    orjson = None
+
+from models import Customer, Product, Sale, SaleItem
+
+
+# Helper function untuk format tanggal yang konsisten
+def format_date(date_obj):
+    if date_obj is None:
+        return None
+    if isinstance(date_obj, datetime):
+        return date_obj.isoformat() + 'Z'  # Format ISO dengan timezone
+    return str(date_obj)
+
+
+def money(value):
+    return None if value is None else float(value)
+
+
+def integer(value):
+    return None if value is None else int(value)
+
+
+def text_or_empty(value):
+    return value or ""
+
+
+# Konverter yang tidak perlu dipanggil (nilai dipakai apa adanya)
+raw = None
+
+
+class RowSchema:
+    """Kolom-kolom satu query: (nama, konverter). Urutan = urutan SELECT.
+
+    ``joined`` adalah kolom dari tabel lain (hasil JOIN) yang ikut dimuat
+    di akhir baris tetapi tidak termasuk columns(). Field record yang tidak
+    ada di schema diisi None (mis. Sale.items, diisi belakangan).
+    """
+
+    def __init__(self, table, fields, record, alias=None, joined=()):
+        self.table = table
+        self.table_fields = tuple(fields)
+        self.fields = self.table_fields + tuple(joined)
+        self.names = tuple(name for name, _ in self.fields)
+        self.record = record
+        self.alias = alias
+        self.load = self._compile()
+
+    def columns(self, alias=None):
+        """Daftar kolom tabel untuk SELECT, mis. "p.id, p.name, ..." """
+        alias = alias or self.alias
+        prefix = f"{alias}." if alias else ""
+        return ', '.join(prefix + name for name, _ in self.table_fields)
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def join(self, joined_fields):
+        """Schema baru dengan kolom JOIN tambahan di akhir baris"""
+        return RowSchema(self.table, self.table_fields, self.record, self.alias,
+                         self.fields[len(self.table_fields):] + tuple(joined_fields))
+
+    def load_all(self, rows):
+        load = self.load
+        return [load(row) for row in rows]
+
+    def load_cursor(self, cursor, batch_size=1000):
+        """Muat semua baris cursor per batch, tanpa menyimpan list tuple utuh"""
+        load = self.load
+        records = []
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return records
+            records.extend(load(row) for row in rows)
+
+    def _compile(self):
+        # Bangun satu fungsi: row -> Record(row[0], _c3(row[3]), ..., None)
+        namespace = {'_record': self.record}
+        positions = {name: index for index, name in enumerate(self.names)}
+        args = []
+        for field in record_fields(self.record):
+            index = positions.get(field.name)
+            if index is None:
+                args.append("None")
+                continue
+            convert = self.fields[index][1]
+            if convert is None:
+                args.append(f"row[{index}]")
+            else:
+                namespace[f"_c{index}"] = convert
+                args.append(f"_c{index}(row[{index}])")
+        source = "def load(row):\n    return _record(" + ", ".join(args) + ")\n"
+        exec(compile(source, f"<RowSchema {self.table}>", "exec"), namespace)
+        return namespace['load']
+
+
+PRODUCT = RowSchema('products', [
+    ('id', raw),
+    ('name', raw),
+    ('description', text_or_empty),
+    ('price', money),
+    ('stock', integer),
+    ('category', text_or_empty),
+    ('image_url', text_or_empty),
+    ('created_at', format_date),
+    ('updated_at', format_date),
+], Product)
+
+CUSTOMER = RowSchema('customers', [
+    ('id', raw),
+    ('name', raw),
+    ('email', raw),
+    ('phone', raw),
+    ('address', raw),
+    ('created_at', format_date),
+], Customer)
+
+SALE = RowSchema('sales', [
+    ('id', raw),
+    ('customer_id', raw),
+    ('total_amount', money),
+    ('payment_method', raw),
+    ('sale_date', format_date),
+], Sale, alias='s')
+
+SALE_ITEM = RowSchema('sale_items', [
+    ('id', raw),
+    ('sale_id', raw),
+    ('product_id', raw),
+    ('quantity', integer),
+    ('unit_price', money),
+    ('subtotal', money),
+], SaleItem, alias='si')
+
+# Daftar penjualan: sale + nama pelanggan, item + nama produk
+SALE_LISTING = SALE.join([('customer_name', raw)])
+SALE_ITEM_LISTING = SALE_ITEM.join([('product_name', raw)])
+
+
+# JSON encoding
+
+def _default(obj):
+    if is_dataclass(obj):
+        return asdict(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, datetime):
+        return format_date(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps_bytes(obj):
+        # Record dataclass di-encode native oleh orjson;
+        # OPT_PASSTHROUGH_DATETIME: datetime lewat _default agar formatnya sama
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps_bytes(obj):
+        return json.dumps(obj, default=_default, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider Flask yang memakai dumps_bytes (orjson jika ada)"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
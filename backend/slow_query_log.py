@@ -0,0 +1,217 @@
+"""Log query lambat dengan EXPLAIN otomatis.
+
+Statement yang melewati threshold dicatat (SQL dinormalisasi, parameter yang
+sudah disensor, route, durasi) ke file JSON-lines yang di-rotate, dan
+disimpan sebagian di memori untuk GET /api/admin/slow-queries.
+
+EXPLAIN dijalankan oleh satu thread latar belakang dengan koneksi sendiri,
+karena koneksi request bisa saja masih membaca hasil unbuffered atau sedang
+di tengah transaksi. Koneksinya dipinjam dari pool yang melayani query
+aslinya (primary atau replica, dicatat di field role), karena index dan
+statistik di replica bisa berbeda. Bentuk query yang sama hanya di-EXPLAIN
+sekali per explain_interval detik.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+
+from metrics import normalize_sql
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'slow_queries.log')
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+MAX_LOGGED_PARAMS = 20
+
+_literals = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_placeholder_lists = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_repeated_tuples = re.compile(r'(\(\?\+\)|\(\?\))(?:\s*,\s*\1)+')
+
+
+def fingerprint(sql):
+    """Bentuk query tanpa nilai: literal dan %s jadi ?, daftar IN (...) diringkas"""
+    sql = normalize_sql(sql, limit=100000)
+    sql = _literals.sub('?', sql).replace('%s', '?')
+    sql = _placeholder_lists.sub('(?+)', sql)
+    return _repeated_tuples.sub(r'\1, ...', sql)
+
+
+def redact(value):
+    """Angka & tanggal dipertahankan (berguna untuk membaca EXPLAIN), teks disensor"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (str, bytes, bytearray)):
+        return f'<redacted len={len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def redact_params(params, many=False):
+    if params is None:
+        return None
+    if many:
+        return {'rows': len(params)}
+    if isinstance(params, dict):
+        return {key: redact(value) for key, value in params.items()}
+    params = list(params)
+    logged = [redact(value) for value in params[:MAX_LOGGED_PARAMS]]
+    if len(params) > MAX_LOGGED_PARAMS:
+        logged.append(f'... {len(params) - MAX_LOGGED_PARAMS} more')
+    return logged
+
+
+class SlowQueryLog:
+    def __init__(self, connection_factory, threshold=0.2, sample_rate=1.0, explain_interval=60,
+                 path=DEFAULT_PATH, max_bytes=5 * 1024 * 1024, backup_count=5,
+                 keep_recent=200, queue_size=100):
+        self.connection_factory = connection_factory
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._recent = deque(maxlen=keep_recent)
+        self._explained = {}   # fingerprint -> waktu EXPLAIN terakhir
+        self._lock = threading.Lock()
+        self._thread = None
+        self._logger = None
+        self._recorded = 0
+        self._dropped = 0
+        self._explain_errors = 0
+
+    def record(self, sql, params, seconds, route=None, many=False, role=None, pool=None):
+        """Dipanggil dari thread request; hanya memasukkan ke antrian.
+
+        role/pool: yang melayani query; pool=None berarti EXPLAIN lewat connection_factory.
+        """
+        if seconds < self.threshold or threading.current_thread() is self._thread:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        entry = {
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'route': route,
+            'role': role,
+            'duration_ms': round(seconds * 1000, 3),
+            'sql': normalize_sql(sql, limit=2000),
+            'fingerprint': fingerprint(sql),
+            'params': redact_params(params, many),
+        }
+        # Parameter asli hanya dibawa sampai EXPLAIN, tidak pernah ditulis
+        explain_params = (params[0] if params else None) if many else params
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((entry, sql, explain_params, pool))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def recent(self, limit=50):
+        with self._lock:
+            entries = list(self._recent)
+        return entries[-limit:][::-1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold_ms': self.threshold * 1000,
+                'recorded': self._recorded,
+                'dropped': self._dropped,
+                'explain_errors': self._explain_errors,
+                'pending': self._queue.qsize(),
+                'path': self.path,
+            }
+
+    # Thread latar belakang
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name='slow-query-log', daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            entry, sql, params, pool = self._queue.get()
+            try:
+                self._process(entry, sql, params, pool)
+            except Exception as e:
+                print(f"❌ Slow query log error: {e}")
+
+    def _process(self, entry, sql, params, pool=None):
+        now = time.monotonic()
+        last = self._explained.get(entry['fingerprint'])
+        if last is not None and now - last < self.explain_interval:
+            entry['explain'] = None
+            entry['explain_note'] = f'explained within the last {self.explain_interval}s'
+        elif entry['sql'].split(' ', 1)[0].upper() in EXPLAINABLE:
+            self._explained[entry['fingerprint']] = now
+            entry['explain'] = self._explain(sql, params, entry, pool)
+        else:
+            entry['explain'] = None
+
+        self._write(entry)
+        with self._lock:
+            self._recent.append(entry)
+            self._recorded += 1
+
+    def _explain(self, sql, params, entry, pool=None):
+        try:
+            with self._explain_connection(pool) as conn:
+                if not conn:
+                    raise RuntimeError('Database connection failed')
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    cursor.execute('EXPLAIN ' + sql, params)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+                    conn.rollback()
+            return [{key: value.decode('utf-8', 'replace') if isinstance(value, (bytes, bytearray)) else value
+                     for key, value in row.items()} for row in rows]
+        except Exception as e:
+            with self._lock:
+                self._explain_errors += 1
+            entry['explain_error'] = str(e)
+            return None
+
+    @contextmanager
+    def _explain_connection(self, pool):
+        if pool is None:
+            with self.connection_factory() as conn:
+                yield conn
+            return
+        conn = pool.acquire()
+        try:
+            yield conn
+        finally:
+            pool.release(conn)
+
+    def _write(self, entry):
+        if self._logger is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes,
+                                          backupCount=self.backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger = logging.getLogger('bakery.slow_queries')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            self._logger = logger
+        self._logger.info(json.dumps(entry, default=str))
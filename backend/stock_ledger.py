@@ -0,0 +1,328 @@
+"""Ledger stok append-only dengan counter shard untuk produk terlaris.
+
+Stok tidak lagi diubah dengan UPDATE products per transaksi. Setiap
+pergerakan (sale, delivery, adjustment, import, opening) dicatat sebagai
+baris baru di stock_movements, dan jumlahnya ditambahkan ke salah satu
+dari SHARDS baris stock_deltas milik produk itu. Kasir paralel yang menjual
+produk yang sama memilih shard acak, jadi tidak lagi antre di satu baris.
+
+Stok saat ini = products.stock (snapshot) + SUM(stock_deltas.delta), dibaca
+lewat view products_current. Compactor melipat delta ke snapshot tiap
+beberapa detik lalu menghapus baris shard-nya (di transaksi yang sama,
+dengan lock), jadi stock_deltas hanya berisi produk yang terjual sejak
+compaction terakhir, maks. SHARDS baris per produk.
+
+Urutan lock selalu products -> stock_deltas, masing-masing urut product_id
+(insert sale_items, juga diurutkan per product_id, mengambil shared lock
+products lewat foreign key), sehingga sale, compaction, dan
+set_stock_levels/adjust_stock_levels tidak saling deadlock. Hanya sale yang
+tanpa lock; perubahan yang di-clamp ke 0 mengunci baris produknya.
+
+Invariant: SUM(stock_movements.quantity) per produk = stok saat ini. Cek dengan
+
+    python stock_ledger.py --verify
+    python stock_ledger.py --compact    # lipat semua delta sekarang
+"""
+import random
+import sys
+import threading
+import time
+
+SHARDS = 8
+KINDS = ('opening', 'sale', 'delivery', 'adjustment', 'import')
+
+# Stok saat ini untuk alias products "p" (lihat juga view products_current)
+CURRENT_STOCK = ("p.stock + COALESCE((SELECT SUM(d.delta) FROM stock_deltas d "
+                 "WHERE d.product_id = p.id), 0)")
+
+
+def append_movements(cursor, movements):
+    """Catat pergerakan di ledger saja (tanpa delta), mis. saldo awal produk baru.
+
+    movements: tuple (product_id, quantity, kind, reason, user_id, sale_id);
+    quantity positif = stok masuk.
+    """
+    if not movements:
+        return
+    cursor.execute(
+        "INSERT INTO stock_movements (product_id, quantity, kind, reason, user_id, sale_id) "
+        f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(movements))}",
+        [value for movement in movements for value in movement]
+    )
+
+
+def record_movements(cursor, movements):
+    """Catat pergerakan dan tambahkan ke counter shard (dalam transaksi pemanggil)"""
+    append_movements(cursor, movements)
+    totals = {}
+    for product_id, quantity, *_ in movements:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    rows = sorted((product_id, total) for product_id, total in totals.items() if total)
+    if not rows:
+        return
+    # Satu shard per transaksi, baris urut product_id: urutan lock selalu sama
+    shard = random.randrange(SHARDS)
+    cursor.execute(
+        "INSERT INTO stock_deltas (product_id, shard, delta) "
+        f"VALUES {', '.join(['(%s, %s, %s)'] * len(rows))} "
+        "ON DUPLICATE KEY UPDATE delta = delta + VALUES(delta)",
+        [value for product_id, total in rows for value in (product_id, shard, total)]
+    )
+
+
+def _clear_deltas(cursor, rows):
+    """Hapus baris shard yang sudah dibaca dengan lock (baris shard baru tidak tersentuh)"""
+    if rows:
+        cursor.execute(
+            f"DELETE FROM stock_deltas WHERE (product_id, shard) IN "
+            f"({', '.join(['(%s, %s)'] * len(rows))})",
+            [value for product_id, shard, _ in rows for value in (product_id, shard)]
+        )
+
+
+def current_stock(cursor, product_ids):
+    """{product_id: stok saat ini} tanpa lock; produk yang tidak ada tidak ikut"""
+    ids = sorted(set(product_ids))
+    if not ids:
+        return {}
+    cursor.execute(
+        f"SELECT p.id, {CURRENT_STOCK} FROM products p WHERE p.id IN ({', '.join(['%s'] * len(ids))})",
+        ids
+    )
+    return {product_id: int(stock) for product_id, stock in cursor.fetchall()}
+
+
+def _lock_levels(cursor, ids):
+    """Kunci produk & delta-nya (urut id), return ({product_id: stok saat ini}, baris delta)"""
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(
+        f"SELECT id, stock FROM products WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE", ids
+    )
+    levels = {product_id: int(stock) for product_id, stock in cursor.fetchall()}
+    cursor.execute(
+        f"SELECT product_id, shard, delta FROM stock_deltas WHERE product_id IN ({placeholders}) "
+        "ORDER BY product_id, shard FOR UPDATE", ids
+    )
+    deltas = cursor.fetchall()
+    for product_id, _, delta in deltas:
+        levels[product_id] += int(delta)
+    return levels, deltas
+
+
+def _write_levels(cursor, levels, deltas):
+    """Tulis stok absolut ke snapshot dan nol-kan delta yang sudah dilipat"""
+    found = sorted(levels)
+    if not found:
+        return
+    cases = ' '.join(['WHEN %s THEN %s'] * len(found))
+    cursor.execute(
+        f"UPDATE products SET stock = CASE id {cases} END, updated_at = NOW() "
+        f"WHERE id IN ({', '.join(['%s'] * len(found))})",
+        [value for product_id in found for value in (product_id, levels[product_id])] + found
+    )
+    _clear_deltas(cursor, deltas)
+
+
+def set_stock_levels(cursor, levels, kind='adjustment', reason=None, user_id=None):
+    """Set stok absolut (edit produk, import): catat selisihnya di ledger.
+
+    Mengunci produk & delta-nya lalu melipat delta ke snapshot. Return
+    {product_id: stok sebelum}; produk yang tidak ada dilewati.
+    """
+    ids = sorted(levels)
+    if not ids:
+        return {}
+    before, deltas = _lock_levels(cursor, ids)
+    append_movements(cursor, [(product_id, levels[product_id] - stock, kind, reason, user_id, None)
+                              for product_id, stock in sorted(before.items())
+                              if levels[product_id] != stock])
+    _write_levels(cursor, {product_id: levels[product_id] for product_id in before}, deltas)
+    return before
+
+
+def adjust_stock_levels(cursor, adjustments, kind=None, reason=None, user_id=None):
+    """Tambah/kurangi stok dengan clamp di 0 (update-stock, penerimaan barang).
+
+    adjustments: pasangan (product_id, stock_change) sesuai urutan request;
+    tiap perubahan di-clamp ke 0 berurutan. Clamp butuh stok yang pasti,
+    jadi produk dikunci seperti set_stock_levels (berbeda dari sale yang
+    cukup menambah counter shard). kind None = delivery/adjustment menurut
+    tanda selisih. Return (levels, missing): levels = {product_id: stok baru}.
+    """
+    ids = sorted({product_id for product_id, _ in adjustments})
+    if not ids:
+        return {}, []
+    before, deltas = _lock_levels(cursor, ids)
+    missing = [product_id for product_id in ids if product_id not in before]
+    if missing:
+        return None, missing
+
+    levels = dict(before)
+    for product_id, stock_change in adjustments:
+        levels[product_id] = max(levels[product_id] + stock_change, 0)
+
+    append_movements(cursor, [
+        (product_id, levels[product_id] - stock,
+         kind or ('delivery' if levels[product_id] > stock else 'adjustment'), reason, user_id, None)
+        for product_id, stock in sorted(before.items()) if levels[product_id] != stock
+    ])
+    _write_levels(cursor, levels, deltas)
+    return levels, []
+
+
+def compact(conn, batch_size=500):
+    """Lipat delta yang menunggu ke products.stock, return jumlah produk yang dilipat"""
+    cursor = conn.cursor()
+    try:
+        # Baca tanpa lock dulu untuk tahu produk mana yang perlu dikunci; semua
+        # baris di tabel ini belum dilipat (termasuk yang jumlahnya kebetulan 0)
+        cursor.execute(
+            "SELECT DISTINCT product_id FROM stock_deltas ORDER BY product_id LIMIT %s",
+            (batch_size,)
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()   # Akhiri transaksi baca implisit sebelum start_transaction
+        if not ids:
+            return 0
+        placeholders = ', '.join(['%s'] * len(ids))
+
+        conn.start_transaction(isolation_level='READ COMMITTED')
+        cursor.execute(f"SELECT id FROM products WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE", ids)
+        cursor.fetchall()
+        cursor.execute(
+            f"SELECT product_id, shard, delta FROM stock_deltas WHERE product_id IN ({placeholders}) "
+            "ORDER BY product_id, shard FOR UPDATE", ids
+        )
+        rows = cursor.fetchall()
+        totals = {}
+        for product_id, _, delta in rows:
+            totals[product_id] = totals.get(product_id, 0) + int(delta)
+        changed = {product_id: total for product_id, total in totals.items() if total}
+        if changed:
+            found = sorted(changed)
+            cases = ' '.join(['WHEN %s THEN %s'] * len(found))
+            cursor.execute(
+                f"UPDATE products SET stock = stock + CASE id {cases} END "
+                f"WHERE id IN ({', '.join(['%s'] * len(found))})",
+                [value for product_id in found for value in (product_id, changed[product_id])] + found
+            )
+        _clear_deltas(cursor, rows)
+        conn.commit()
+        return len(totals)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def list_movements(cursor, product_id, limit=50, before_id=None):
+    """Riwayat pergerakan satu produk, terbaru dulu (keyset lewat before_id)"""
+    sql = ("SELECT id, quantity, kind, reason, user_id, sale_id, created_at "
+           "FROM stock_movements WHERE product_id = %s")
+    params = [product_id]
+    if before_id is not None:
+        sql += " AND id < %s"
+        params.append(before_id)
+    cursor.execute(sql + " ORDER BY id DESC LIMIT %s", params + [limit])
+    return cursor.fetchall()
+
+
+def verify(conn):
+    """Produk yang stoknya tidak sama dengan jumlah ledger: [(id, stok, ledger)]"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT p.id, {CURRENT_STOCK} AS stock,
+                   COALESCE((SELECT SUM(m.quantity) FROM stock_movements m WHERE m.product_id = p.id), 0)
+            FROM products p
+        """)
+        return [(product_id, int(stock), int(ledger))
+                for product_id, stock, ledger in cursor.fetchall() if int(stock) != int(ledger)]
+    finally:
+        cursor.close()
+
+
+class StockCompactor:
+    """Thread latar yang menjalankan compact() tiap interval detik"""
+
+    def __init__(self, connection_factory, interval=5.0, batch_size=500):
+        self._connection_factory = connection_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._thread = None
+        self._runs = 0
+        self._compacted = 0
+        self._last_error = None
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='stock-compactor', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.run_once()
+
+    def run_once(self):
+        try:
+            with self._connection_factory() as conn:
+                if not conn:
+                    raise RuntimeError('Database connection failed')
+                compacted = compact(conn, self.batch_size)
+        except Exception as e:
+            with self._lock:
+                self._last_error = str(e)
+            print(f"⚠️ Stock compaction failed: {e}")
+            return 0
+        with self._lock:
+            self._runs += 1
+            self._compacted += compacted
+            self._last_error = None
+        return compacted
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'runs': self._runs,
+                'products_compacted': self._compacted,
+                'last_error': self._last_error,
+            }
+
+
+def main(argv):
+    import mysql.connector
+    from app import get_db_config
+
+    conn = mysql.connector.connect(**get_db_config())
+    try:
+        if '--compact' in argv:
+            total = 0
+            while True:
+                compacted = compact(conn)
+                if not compacted:
+                    break
+                total += compacted
+            print(f"✅ Stock deltas compacted ({total} products)")
+            return 0
+        if '--verify' in argv:
+            mismatches = verify(conn)
+            for product_id, stock, ledger in mismatches:
+                print(f"❌ Product {product_id}: stock {stock}, ledger {ledger}")
+            if not mismatches:
+                print("✅ Stock ledger matches current stock")
+            return 1 if mismatches else 0
+        print(__doc__)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,253 @@
+"""Kecepatan jual (velocity) stok, days-of-cover dan saran reorder dengan NumPy.
+
+Penjualan harian per produk dimuat dari rollup product_sales_daily (lihat
+rollups.py, sudah dijumlahkan dari sale_items) ke matriks produk x hari.
+Semua angka untuk seluruh katalog dihitung dalam satu lintasan vektor:
+
+- velocity: rata-rata unit/hari pada window pendek dan panjang (hari penuh,
+  hari ini belum dihitung); dipakai yang lebih besar agar tren naik tidak
+  terlambat terbaca
+- days_of_cover: stok / velocity
+- reorder_point: velocity * lead_time + safety stock (z * std harian * sqrt(lead_time))
+- suggested_order: jumlah untuk kembali ke velocity * (lead_time + cover_days)
+  + safety stock, hanya jika stok sudah di bawah reorder_point
+
+Sale baru dan perubahan stok langsung ditambahkan ke matriks (record_sale,
+set_product_stock); pergantian hari menggeser kolom tanpa query ulang.
+Matriks dimuat ulang penuh tiap refresh_interval detik untuk menangkap
+perubahan dari worker lain.
+"""
+import math
+import threading
+import time
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - opsional
+    np = None
+
+
+class VelocityUnavailable(Exception):
+    """NumPy tidak terpasang atau data belum bisa dimuat"""
+
+
+class StockVelocity:
+    def __init__(self, connection_factory, history_days=365, short_window=7, long_window=28,
+                 lead_time_days=2, cover_days=7, service_z=1.65, refresh_interval=300):
+        self._connection_factory = connection_factory
+        self.history_days = history_days
+        self.short_window = short_window
+        self.long_window = long_window
+        self.lead_time_days = lead_time_days
+        self.cover_days = cover_days
+        self.service_z = service_z
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._day = None             # Tanggal kolom terakhir matriks (hari ini)
+
+        self._ids = None             # int64[P], urut
+        self._names = []
+        self._index = {}             # product_id -> baris
+        self._stock = None           # float64[P]
+        self._sales = None           # float32[P, history_days], kolom terakhir = hari ini
+        self._result = None          # cache hasil compute(), None jika basi
+
+    @property
+    def available(self):
+        return np is not None
+
+    # Muat
+
+    def load(self, blocking=True):
+        """Muat ulang stok & riwayat penjualan dari database"""
+        if np is None:
+            raise VelocityUnavailable('numpy is not installed')
+        if not self._load_lock.acquire(blocking=blocking):
+            return
+        try:
+            today = date.today()
+            since = today - timedelta(days=self.history_days - 1)
+            with self._connection_factory() as conn:
+                if not conn:
+                    raise VelocityUnavailable('Database connection failed')
+                cursor = conn.cursor()
+                cursor.execute("SELECT id, name, stock FROM products_current ORDER BY id")
+                products = cursor.fetchall()
+                cursor.execute(
+                    "SELECT product_id, day, quantity FROM product_sales_daily WHERE day >= %s",
+                    (since,)
+                )
+                history = cursor.fetchall()
+                cursor.close()
+
+            ids = np.fromiter((row[0] for row in products), dtype=np.int64, count=len(products))
+            stock = np.fromiter((row[2] for row in products), dtype=np.float64, count=len(products))
+            sales = np.zeros((len(products), self.history_days), dtype=np.float32)
+            if history and len(ids):
+                product_ids = np.fromiter((row[0] for row in history), dtype=np.int64, count=len(history))
+                offsets = np.fromiter(((row[1] - since).days for row in history), dtype=np.int64,
+                                      count=len(history))
+                quantities = np.fromiter((row[2] for row in history), dtype=np.float32, count=len(history))
+                rows = np.searchsorted(ids, product_ids)
+                rows = np.minimum(rows, len(ids) - 1)
+                # Produk yang sudah dihapus tidak punya baris
+                known = ids[rows] == product_ids
+                np.add.at(sales, (rows[known], offsets[known]), quantities[known])
+
+            with self._lock:
+                self._ids = ids
+                self._names = [row[1] for row in products]
+                self._index = {int(product_id): row for row, product_id in enumerate(ids)}
+                self._stock = stock
+                self._sales = sales
+                self._day = today
+                self._result = None
+                self._loaded_at = time.monotonic()
+        finally:
+            self._load_lock.release()
+
+    # Update incremental (dipanggil setelah commit)
+
+    def record_sale(self, items, sale_date=None):
+        """items: pasangan (product_id, quantity)"""
+        with self._lock:
+            if self._sales is None:
+                return
+            self._roll_day_locked()
+            offset = self.history_days - 1
+            if sale_date is not None:
+                offset -= (self._day - sale_date.date()).days
+            for product_id, quantity in items:
+                row = self._index.get(int(product_id))
+                if row is None:
+                    continue
+                self._stock[row] -= quantity
+                if 0 <= offset < self.history_days:
+                    self._sales[row, offset] += quantity
+            self._result = None
+
+    def set_product_stock(self, product_id, stock):
+        with self._lock:
+            if self._sales is None:
+                return
+            row = self._index.get(int(product_id))
+            if row is None:
+                self._loaded_at = 0.0     # Produk baru: muat ulang saat dibaca
+            else:
+                self._stock[row] = stock
+            self._result = None
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _roll_day_locked(self):
+        today = date.today()
+        if self._day is None or today == self._day:
+            return
+        shift = (today - self._day).days
+        if shift >= self.history_days:
+            self._sales[:] = 0
+        else:
+            self._sales[:, :-shift] = self._sales[:, shift:]
+            self._sales[:, -shift:] = 0
+        self._day = today
+        self._result = None
+
+    # Hitung
+
+    def compute(self):
+        """Array hasil untuk seluruh katalog (di-cache sampai ada perubahan)"""
+        if np is None:
+            raise VelocityUnavailable('numpy is not installed')
+        if self._sales is None or time.monotonic() - self._loaded_at >= self.refresh_interval:
+            try:
+                self.load(blocking=self._sales is None)
+            except VelocityUnavailable:
+                if self._sales is None:
+                    raise
+                print("⚠️ Stock velocity refresh failed, serving cached data")
+
+        with self._lock:
+            self._roll_day_locked()
+            if self._result is None:
+                self._result = self._compute_locked()
+            return self._result
+
+    def _compute_locked(self):
+        sales = self._sales
+        stock = self._stock
+        days = sales.shape[1]
+        short = min(self.short_window, days - 1)
+        long = min(self.long_window, days - 1)
+
+        # Hari penuh terakhir: kolom [-1 - window, -1)
+        totals = np.cumsum(sales[:, ::-1][:, 1:long + 1], axis=1, dtype=np.float64)
+        velocity_short = totals[:, short - 1] / short
+        velocity_long = totals[:, long - 1] / long
+        velocity = np.maximum(velocity_short, velocity_long)
+
+        deviation = sales[:, -1 - long:-1].std(axis=1, dtype=np.float64)
+        safety_stock = self.service_z * deviation * math.sqrt(self.lead_time_days)
+        reorder_point = velocity * self.lead_time_days + safety_stock
+        target = velocity * (self.lead_time_days + self.cover_days) + safety_stock
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cover = np.where(velocity > 0, np.maximum(stock, 0) / velocity, np.inf)
+        needs_order = (stock <= reorder_point) & (velocity > 0)
+        suggested = np.where(needs_order, np.ceil(np.maximum(target - stock, 0)), 0)
+
+        return {
+            'ids': self._ids,
+            'names': self._names,
+            'stock': stock.copy(),
+            'velocity_short': velocity_short,
+            'velocity_long': velocity_long,
+            'velocity': velocity,
+            'days_of_cover': cover,
+            'reorder_point': reorder_point,
+            'suggested_order': suggested,
+            'out_of_stock': stock <= 0,
+            'needs_order': needs_order,
+        }
+
+    def suggestions(self, status='reorder', limit=50):
+        """Produk urut days_of_cover terkecil.
+
+        status: 'reorder' (perlu dipesan atau habis) atau 'all'.
+        """
+        result = self.compute()
+        if status == 'reorder':
+            selected = np.flatnonzero(result['needs_order'] | result['out_of_stock'])
+        elif status == 'all':
+            selected = np.arange(len(result['ids']))
+        else:
+            raise ValueError('status must be one of reorder, all')
+        order = selected[np.argsort(result['days_of_cover'][selected], kind='stable')][:limit]
+
+        cover = result['days_of_cover']
+        return [{
+            'product_id': int(result['ids'][row]),
+            'name': result['names'][row],
+            'stock': int(result['stock'][row]),
+            'velocity_per_day': round(float(result['velocity'][row]), 2),
+            'velocity_short': round(float(result['velocity_short'][row]), 2),
+            'velocity_long': round(float(result['velocity_long'][row]), 2),
+            'days_of_cover': None if math.isinf(cover[row]) else round(float(cover[row]), 1),
+            'reorder_point': round(float(result['reorder_point'][row]), 1),
+            'suggested_order': int(result['suggested_order'][row]),
+            'out_of_stock': bool(result['out_of_stock'][row]),
+        } for row in order]
+
+    def settings(self):
+        return {
+            'short_window_days': self.short_window,
+            'long_window_days': self.long_window,
+            'lead_time_days': self.lead_time_days,
+            'cover_days': self.cover_days,
+            'service_z': self.service_z,
+        }
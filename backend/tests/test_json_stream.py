@@ -0,0 +1,30 @@
+"""iter_json_array harus sama dengan json.load, berapa pun ukuran potongannya."""
+import io
+import json
+
+import pytest
+
+from json_stream import iter_json_array
+
+ROWS = [{'id': i, 'name': f'Roti "{i}" ,]', 'price': 1500.5 * i} for i in range(200)] + [1234567890]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_reads_array_and_wrapper(chunk_size):
+    assert list(iter_json_array(io.StringIO(json.dumps(ROWS)), chunk_size=chunk_size)) == ROWS
+    wrapped = io.StringIO(json.dumps({'products': ROWS}))
+    assert list(iter_json_array(wrapped, key='products', chunk_size=chunk_size)) == ROWS
+    assert list(iter_json_array(io.StringIO(' [ ] '), chunk_size=chunk_size)) == []
+
+
+def test_broken_document_yields_rows_before_error():
+    rows = iter_json_array(io.StringIO('[{"id": 1}, {"id": '), chunk_size=4)
+    assert next(rows) == {'id': 1}
+    with pytest.raises(ValueError):
+        next(rows)
+
+
+@pytest.mark.parametrize('text', ['', '{"items": []}', '[1 2]', '"produk"'])
+def test_rejects_other_shapes(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), key='products'))
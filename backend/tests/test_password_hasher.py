@@ -0,0 +1,41 @@
+"""PasswordHasher harus pulih sendiri jika worker bcrypt mati."""
+import os
+import signal
+import time
+
+import pytest
+
+from password_hasher import HasherBusy, PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, max_pending=4, rounds=4, timeout=10)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify(hasher):
+    hashed = hasher.hash('roti-tawar')
+    assert hasher.verify('roti-tawar', hashed)
+    assert not hasher.verify('roti-manis', hashed)
+
+
+def test_recovers_after_worker_dies(hasher):
+    hasher.hash('roti-tawar')    # Pool & worker dibuat
+    executor = hasher._executor
+    for process in list(executor._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+        process.join(5)
+    deadline = time.monotonic() + 5
+    while not executor._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    # Request yang kena pool rusak dijawab 503, bukan 500 selamanya
+    with pytest.raises(HasherBusy):
+        hasher.hash('roti-tawar')
+
+    hashed = hasher.hash('roti-tawar')
+    assert hasher.verify('roti-tawar', hashed)
+    assert hasher._executor is not executor
+    assert hasher.stats()['in_flight'] == 0
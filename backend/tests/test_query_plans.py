@@ -0,0 +1,139 @@
+"""EXPLAIN setiap statement yang dijalankan route, gagal jika ada full scan.
+
+Statement tidak disalin manual: semua skenario benchmark (bench/run.py)
+dijalankan terhadap database MySQL berisi data datagen, dan setiap
+statement ditangkap lewat metrics.InstrumentedCursor. Setiap bentuk query
+(slow_query_log.fingerprint) lalu di-EXPLAIN dengan parameter aslinya.
+Statement yang memang membaca seluruh tabel harus terdaftar di
+WHOLE_TABLE_READS; selain itu full scan dianggap regresi.
+
+Butuh MySQL lokal (get_db_config) dan database terpisah yang boleh dihapus:
+
+    BAKERY_TEST_DATABASE=bakery_bench python -m pytest tests/test_query_plans.py
+
+Test dilewati jika MySQL tidak bisa dihubungi.
+"""
+import os
+import random
+import re
+
+import pytest
+
+from bench import datagen, run
+from metrics import NO_ROUTE
+from slow_query_log import fingerprint
+
+DATABASE = os.environ.get('BAKERY_TEST_DATABASE', 'bakery_bench')
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE', 'INSERT')
+# Tabel yang memang selalu kecil; full scan di sini lebih murah dari index
+SMALL_TABLES = {'schema_migrations', 'sales_monthly'}
+# (route, tabel FROM) statement tanpa WHERE yang memang membaca seluruh tabel.
+# Route = route pertama yang menjalankan bentuk query itu (urutan build_scenarios)
+WHOLE_TABLE_READS = {
+    ('/api/customers', 'customers'),                        # Daftar pelanggan lengkap
+    ('/api/customers/report', 'customer_stats'),            # Reconcile leaderboard
+    ('/api/events', 'products_current'),                    # Snapshot dashboard
+    ('/api/products', 'products_current'),                  # Katalog (di-cache)
+    ('/api/products/reorder-suggestions', 'products_current'),  # Muat stok untuk velocity
+    ('/api/search', 'products'),                            # Bangun index pencarian
+    ('/api/search', 'customers'),
+    (NO_ROUTE, 'sales'),    # Export penuh; stream berjalan setelah request selesai
+}
+
+_from_table = re.compile(r'\bFROM\s+`?(\w+)', re.IGNORECASE)
+
+
+class StatementCapture:
+    """Pengganti metrics.slow_log: threshold 0, simpan satu contoh per bentuk query"""
+    threshold = 0
+
+    def __init__(self):
+        self.statements = {}    # fingerprint -> (route, sql, params)
+
+    def record(self, sql, params, seconds, route=None, many=False, **_):
+        if isinstance(sql, (bytes, bytearray)):
+            sql = sql.decode()
+        if many:
+            params = params[0] if params else None
+        self.statements.setdefault(fingerprint(sql), (route, sql, params))
+
+
+def explainable(sql):
+    words = sql.split(None, 1)
+    verb = words[0].upper() if words else ''
+    # INSERT ... VALUES tidak membaca tabel; INSERT ... SELECT (backfill) ya
+    return verb in EXPLAINED and (verb != 'INSERT' or ' SELECT ' in ' '.join(sql.upper().split()))
+
+
+def whole_table_read(route, sql):
+    """True untuk statement tanpa WHERE yang ada di WHOLE_TABLE_READS"""
+    if ' WHERE ' in ' '.join(sql.upper().split()):
+        return False
+    match = _from_table.search(sql)
+    return match is not None and (route, match.group(1)) in WHOLE_TABLE_READS
+
+
+def full_scans(cursor, sql, params):
+    """Baris EXPLAIN type=ALL yang bukan tabel kecil/derived"""
+    cursor.execute('EXPLAIN ' + sql, params)
+    return [row for row in cursor.fetchall()
+            if row.get('type') == 'ALL'
+            and not str(row.get('table') or '').startswith('<')
+            and row.get('table') not in SMALL_TABLES]
+
+
+@pytest.fixture(scope='module')
+def captured():
+    connector = pytest.importorskip('mysql.connector')
+    from app import get_db_config
+
+    try:
+        connector.connect(**{key: value for key, value in get_db_config().items() if key != 'database'}).close()
+    except connector.Error as e:
+        pytest.skip(f'MySQL not available: {e}')
+
+    data = datagen.generate(42, 500, 2000, 20000)
+    connect = run.setup_mysql(data, DATABASE)
+    app = run.prepare_app(connect)
+
+    import app as bakery
+    capture = StatementCapture()
+    previous, bakery.metrics.slow_log = bakery.metrics.slow_log, capture
+    try:
+        client = app.test_client()
+        rng = random.Random(42)
+        failed = []
+        for name, _, fn in run.build_scenarios(data):
+            response = fn(client, rng)
+            response.get_data()
+            if response.status_code >= 400:
+                failed.append(f'{name}: {response.status_code}')
+            response.close()
+        assert not failed, failed
+    finally:
+        bakery.metrics.slow_log = previous
+    return connect, capture.statements
+
+
+def test_routes_ran_queries(captured):
+    _, statements = captured
+    assert statements
+
+
+def test_route_queries_use_indexes(captured):
+    connect, statements = captured
+    conn = connect()
+    cursor = conn.cursor(dictionary=True)
+    problems = []
+    try:
+        for shape, (route, sql, params) in sorted(statements.items()):
+            if not explainable(sql) or whole_table_read(route, sql):
+                continue
+            for row in full_scans(cursor, sql, params):
+                problems.append(f"{route}: full table scan on {row.get('table')} "
+                                f"(~{row.get('rows')} rows, possible_keys={row.get('possible_keys')}): {shape}")
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.close()
+    assert not problems, '\n'.join(problems)
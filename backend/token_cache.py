@@ -0,0 +1,177 @@
+"""Cache token JWT yang sudah diverifikasi (LRU + kedaluwarsa mengikuti exp).
+
+Kunci cache adalah digest SHA-256 token, jadi token asli tidak disimpan.
+
+Revocation: revoke() memasukkan token ke denylist sampai kedaluwarsa,
+revoke_user() mencabut semua token user yang diterbitkan sebelum saat itu
+(dibandingkan dengan klaim iat). check() dipanggil sebelum token di-decode
+atau diambil dari cache.
+
+Dengan connection_factory, setiap revocation juga ditulis ke tabel
+token_revocations dan dicek saat cache miss, jadi berlaku di semua worker.
+Token yang sudah ada di cache worker lain tetap diterima sampai entry-nya
+habis, maksimal max_ttl detik; tanpa connection_factory denylist hanya
+ada di memori proses ini (hanya aman untuk satu proses).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenRevoked(Exception):
+    pass
+
+
+class TokenCache:
+    def __init__(self, connection_factory=None, maxsize=10000, max_ttl=3600, token_lifetime=7 * 86400):
+        """token_lifetime: umur token terpanjang, selama itu entry denylist disimpan"""
+        self._connection_factory = connection_factory
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self.token_lifetime = token_lifetime
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # digest -> (current_user, expires_at)
+        self._revoked_tokens = {}        # digest -> expires_at
+        self._revoked_users = {}         # user id -> revoked_at
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        """current_user untuk token ini, atau None jika belum/tidak lagi di cache"""
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, token, current_user, exp, issued_at=0):
+        """Simpan hasil verifikasi sampai exp (dibatasi max_ttl)"""
+        expires_at = min(float(exp), time.time() + self.max_ttl)
+        key = self.digest(token)
+        with self._lock:
+            revoked_at = self._revoked_users.get(current_user.get('id'))
+            if revoked_at is not None and issued_at <= revoked_at:
+                return    # revoke_user() jalan di tengah verifikasi
+            self._entries[key] = (current_user, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def check(self, token, claims=None):
+        """Raise TokenRevoked jika token dicabut; claims (hasil decode) untuk cek per user"""
+        now = time.time()
+        key = self.digest(token)
+        with self._lock:
+            expires_at = self._revoked_tokens.get(key)
+            if expires_at is not None and expires_at > now:
+                raise TokenRevoked('Token has been revoked')
+            if claims is not None:
+                revoked_at = self._revoked_users.get(claims['user'].get('id'))
+                if revoked_at is not None and claims.get('iat', 0) <= revoked_at:
+                    raise TokenRevoked('Token has been revoked')
+        if claims is not None and self._connection_factory is not None:
+            self._check_shared(key, claims['user'].get('id'), claims.get('iat', 0), now)
+
+    def _check_shared(self, key, user_id, issued_at, now):
+        """Revocation dari worker lain (cache miss saja, jadi tidak di jalur cepat)"""
+        with self._connection_factory() as conn:
+            if not conn:
+                raise RuntimeError('Database connection failed')
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT 1 FROM token_revocations WHERE token_digest = %s AND expires_at > %s
+                UNION ALL
+                SELECT 1 FROM token_revocations WHERE user_id = %s AND revoked_at >= %s
+                LIMIT 1
+            """, (key.hex(), now, user_id, issued_at))
+            revoked = cursor.fetchone() is not None
+            cursor.close()
+        if revoked:
+            raise TokenRevoked('Token has been revoked')
+
+    def revoke(self, token, exp=None):
+        """Cabut satu token (mis. logout) sampai exp-nya lewat"""
+        now = time.time()
+        expires_at = float(exp) if exp is not None else now + self.token_lifetime
+        key = self.digest(token)
+        with self._lock:
+            self._prune(now)
+            self._revoked_tokens[key] = expires_at
+            self._entries.pop(key, None)
+        self._store(None, key.hex(), None, now, expires_at)
+
+    def revoke_user(self, user_id, cursor=None):
+        """Cabut semua token user yang sudah terbit (mis. ganti password/role).
+
+        cursor: transaksi yang mengubah kredensial, supaya revocation ikut
+        commit/rollback bersamanya; tanpa cursor ditulis dengan koneksi sendiri.
+        """
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._revoked_users[user_id] = now
+            keys = [key for key, (user, _) in self._entries.items() if user.get('id') == user_id]
+            for key in keys:
+                del self._entries[key]
+        self._store(cursor, None, user_id, now, now + self.token_lifetime)
+        return len(keys)
+
+    def _store(self, cursor, token_digest, user_id, revoked_at, expires_at):
+        if self._connection_factory is None:
+            return
+        if cursor is not None:
+            self._insert(cursor, token_digest, user_id, revoked_at, expires_at)
+            return
+        with self._connection_factory() as conn:
+            if not conn:
+                raise RuntimeError('Database connection failed')
+            cursor = conn.cursor()
+            self._insert(cursor, token_digest, user_id, revoked_at, expires_at)
+            conn.commit()
+            cursor.close()
+
+    @staticmethod
+    def _insert(cursor, token_digest, user_id, revoked_at, expires_at):
+        # Baris yang sudah kedaluwarsa tidak berguna lagi (token-nya sudah ditolak jwt)
+        cursor.execute("DELETE FROM token_revocations WHERE expires_at <= %s", (revoked_at,))
+        cursor.execute(
+            "INSERT INTO token_revocations (token_digest, user_id, revoked_at, expires_at) "
+            "VALUES (%s, %s, %s, %s)",
+            (token_digest, user_id, revoked_at, expires_at)
+        )
+
+    def _prune(self, now):
+        self._revoked_tokens = {key: expires_at for key, expires_at in self._revoked_tokens.items()
+                                if expires_at > now}
+        self._revoked_users = {user_id: revoked_at for user_id, revoked_at in self._revoked_users.items()
+                               if revoked_at + self.token_lifetime > now}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'revoked_tokens': len(self._revoked_tokens),
+                'revoked_users': len(self._revoked_users)
+            }